@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Batch runner with multi-process pre- and post-processing
+Runs a JSONL file of records through /api/generate. Prompt templating,
+token-budget trimming and payload encoding happen in a process pool before
+each request, and response parsing, schema validation and scoring after it,
+so the Python work around each call is spread across cores instead of
+serializing on the GIL. Requests are sent from a single asyncio event loop.
+
+Only bytes cross the process boundary. Workers receive raw input lines and
+raw response bodies in chunks and return encoded request bodies and
+finished output lines. The template, schema and budget settings are handed
+to each worker once by the pool initializer.
+
+Usage: python batch_runner.py INPUT.jsonl OUTPUT.jsonl [--template FILE] [--workers N] [--score METHOD]
+"""
+
+import argparse
+import asyncio
+import difflib
+import functools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from string import Template
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import config_loader
+from chat_with_default_model import AsyncOllamaChatClient, build_generate_payload
+from structured_output import validate
+from token_budget import TokenBudget, context_lengths
+
+SCORERS = ("none", "exact", "contains", "similarity", "json")
+
+# Per-process state set once by init_worker
+_worker = {}
+
+
+@dataclass(slots=True)
+class BatchStats:
+    """Totals of one batch run"""
+    records: int = 0
+    errors: int = 0
+    output_tokens: int = 0
+    scored: int = 0
+    score_total: float = 0.0
+    elapsed: float = 0.0
+
+    @property
+    def records_per_sec(self) -> float:
+        return self.records / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def mean_score(self) -> Optional[float]:
+        return self.score_total / self.scored if self.scored else None
+
+
+def init_worker(model: str, template: Optional[str], schema: Optional[Dict], scoring: str,
+                budget_settings: Dict, context_length: int, num_predict: Optional[int]):
+    """Pool initializer: everything shared by all records is sent once per process"""
+    _worker.update(
+        model=model,
+        template=Template(template) if template else None,
+        schema=schema,
+        scoring=scoring,
+        budget=TokenBudget(lambda: budget_settings),
+        context_length=context_length,
+        num_predict=num_predict,
+    )
+
+
+def _render(record: Dict) -> str:
+    template = _worker["template"]
+    if template is None:
+        return record.get("prompt") or ""
+    variables = record.get("vars", record)
+    return template.safe_substitute({key: value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+                                     for key, value in variables.items()})
+
+
+def preprocess_chunk(lines: List[Tuple[int, bytes]]
+                     ) -> List[Tuple[str, Optional[bytes], Optional[bytes], Optional[str]]]:
+    """(line number, input line) -> (record id, encoded request body, encoded expected answer, error)
+
+    A line that is not a JSON object gets no request body, only the error.
+    """
+    prepared = []
+    for number, line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            prepared.append((str(number), None, None, f"invalid input record: {e}"))
+            continue
+        if not isinstance(record, dict):
+            prepared.append((str(number), None, None, "invalid input record: not a JSON object"))
+            continue
+        payload = build_generate_payload(_worker["model"], _render(record))
+        if _worker["num_predict"]:
+            payload["options"] = {"num_predict": _worker["num_predict"]}
+        if _worker["schema"] is not None:
+            payload["format"] = _worker["schema"]
+        _worker["budget"].apply(payload, _worker["context_length"])
+        expected = record.get("expected")
+        prepared.append((str(record.get("id", number)), json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+                         None if expected is None else json.dumps(expected, ensure_ascii=False).encode("utf-8"),
+                         None))
+    return prepared
+
+
+def score(text: str, expected, scoring: str, value=None) -> Optional[float]:
+    if expected is None or scoring == "none":
+        return None
+    if scoring == "json":
+        if value is None or not isinstance(expected, dict):
+            return float(value is not None)
+        # Share of the expected fields reproduced exactly
+        return sum(1 for key, want in expected.items() if isinstance(value, dict) and value.get(key) == want) / \
+            max(len(expected), 1)
+    want = expected if isinstance(expected, str) else json.dumps(expected, ensure_ascii=False)
+    got, want = " ".join(text.split()).lower(), " ".join(want.split()).lower()
+    if scoring == "exact":
+        return float(got == want)
+    if scoring == "contains":
+        return float(want in got)
+    return difflib.SequenceMatcher(None, got, want).ratio()
+
+
+def postprocess_chunk(items: List[Tuple[str, Optional[bytes], Optional[str], Optional[bytes], float]]
+                      ) -> List[Tuple[bytes, Optional[float], int, bool]]:
+    """(id, response body, error, expected, seconds) -> (output line, score, output tokens, ok)"""
+    finished = []
+    for record_id, body, error, expected, seconds in items:
+        row = {"id": record_id, "latency_ms": round(seconds * 1000, 1)}
+        tokens, value, row_score, result = 0, None, None, None
+        if body is not None:
+            try:
+                result = json.loads(body)
+            except ValueError as e:
+                error = f"invalid response: {e}"
+        if result is not None:
+            text = result.get("response", "")
+            tokens = result.get("eval_count", 0)
+            row.update(response=text, eval_count=tokens)
+            if _worker["schema"] is not None:
+                error = validate(text, _worker["schema"])
+                if error is None:
+                    value = json.loads(text)
+                    row["value"] = value
+            row_score = score(text, None if expected is None else json.loads(expected), _worker["scoring"], value)
+            if row_score is not None:
+                row["score"] = round(row_score, 4)
+        if error:
+            row["error"] = error
+        finished.append((json.dumps(row, ensure_ascii=False).encode("utf-8") + b"\n", row_score, tokens,
+                         error is None))
+    return finished
+
+
+def read_records(path: str) -> Iterator[Tuple[int, bytes]]:
+    """(line number, raw line) for every non-empty line"""
+    with open(path, 'rb') as f:
+        for number, line in enumerate(f, 1):
+            if line.strip():
+                yield number, line
+
+
+def _chunks(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+async def run_batch(records: Iterable[Tuple[int, bytes]], out, model: str = None, template: str = None,
+                    schema: Dict = None, scoring: str = "none", workers: Optional[int] = None,
+                    concurrency: int = 8, chunk_size: int = 32, num_predict: int = None,
+                    api_base: str = None, progress=None) -> BatchStats:
+    """Run records through the model, writing one JSON line per record to ``out`` (binary)
+
+    ``workers`` 0 runs the pre/post stages on the event loop thread, None uses
+    one process per core.
+    """
+    workers = os.cpu_count() if workers is None else workers
+    stats = BatchStats()
+    client = AsyncOllamaChatClient(model)
+    if api_base:
+        client.api_base = api_base
+    model = client.model_name
+    context_length = await context_lengths.aget(client.api_base, model, client.client)
+    initargs = (model, template, schema, scoring, config_loader.get_config()["token_budget"],
+                context_length, num_predict)
+
+    loop = asyncio.get_running_loop()
+    pool = None
+    if workers > 0:
+        pool = ProcessPoolExecutor(workers, initializer=init_worker, initargs=initargs)
+    else:
+        init_worker(*initargs)
+
+    async def stage(function, chunk):
+        if pool is None:
+            return function(chunk)
+        return await loop.run_in_executor(pool, function, chunk)
+
+    requests_slots = asyncio.Semaphore(concurrency)
+
+    async def send(body: Optional[bytes], error: Optional[str]):
+        if body is None:
+            # The record could not be prepared, so there is nothing to send
+            return None, error, 0.0
+        async with requests_slots:
+            start = time.perf_counter()
+            try:
+                return await client.post_raw("/generate", body), None, time.perf_counter() - start
+            except Exception as e:
+                return None, str(e) or type(e).__name__, time.perf_counter() - start
+
+    async def handle(chunk):
+        prepared = await stage(preprocess_chunk, chunk)
+        responses = await asyncio.gather(*(send(body, error) for _, body, _, error in prepared))
+        items = [(record_id, body, error, expected, seconds)
+                 for (record_id, _, expected, _), (body, error, seconds) in zip(prepared, responses)]
+        for line, row_score, tokens, ok in await stage(postprocess_chunk, items):
+            out.write(line)
+            stats.records += 1
+            stats.errors += not ok
+            stats.output_tokens += tokens
+            if row_score is not None:
+                stats.scored += 1
+                stats.score_total += row_score
+        if progress:
+            progress(stats)
+
+    # Enough chunks in flight to keep both the request slots and the workers busy
+    max_chunks = max(2 * max(workers, 1), -(-concurrency // chunk_size) + 1)
+    start = time.perf_counter()
+    pending = set()
+    try:
+        for chunk in _chunks(records, chunk_size):
+            if len(pending) >= max_chunks:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+            pending.add(asyncio.ensure_future(handle(chunk)))
+        if pending:
+            for task in (await asyncio.wait(pending))[0]:
+                task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+        if pool is not None:
+            # Waiting for the workers to exit would block the event loop
+            await loop.run_in_executor(None, functools.partial(pool.shutdown, cancel_futures=True))
+        await client.aclose()
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a JSONL batch through Ollama with multi-process pre/post-processing')
+    parser.add_argument('input', help='JSONL records ("prompt", or template variables; optional "id" and "expected")')
+    parser.add_argument('output', help='JSONL results')
+    parser.add_argument('--template', help='Prompt template file using $variable placeholders')
+    parser.add_argument('--schema', help='JSON Schema file; responses are requested and validated as JSON')
+    parser.add_argument('--score', choices=SCORERS, default='none', help='Compare responses with "expected"')
+    parser.add_argument('--model', help='Model (default: default_model from config)')
+    parser.add_argument('--host', default=None, help='Ollama host (default: OLLAMA_HOST)')
+    parser.add_argument('--workers', type=int, default=None, help='Processes for pre/post-processing '
+                        '(default: one per core, 0: event loop thread)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Requests in flight')
+    parser.add_argument('--chunk-size', type=int, default=32, help='Records per worker task')
+    parser.add_argument('--num-predict', type=int, help='Cap output tokens per request')
+    args = parser.parse_args(sys.argv[1:])
+
+    template = schema = None
+    if args.template:
+        with open(args.template, 'r', encoding='utf-8') as f:
+            template = f.read()
+    if args.schema:
+        with open(args.schema, 'r', encoding='utf-8') as f:
+            schema = json.load(f)
+        if args.score == 'none':
+            args.score = 'json'
+
+    def progress(stats: BatchStats):
+        print(f"\r{stats.records} records, {stats.errors} errors", end="", flush=True)
+
+    with open(args.output, 'wb') as out:
+        try:
+            stats = asyncio.run(run_batch(read_records(args.input), out, args.model, template, schema, args.score,
+                                          args.workers, args.concurrency, args.chunk_size, args.num_predict,
+                                          f"{args.host}/api" if args.host else None, progress))
+        except KeyboardInterrupt:
+            print("\nBatch interrupted")
+            sys.exit(1)
+
+    print()
+    print(f"Processed {stats.records} records in {stats.elapsed:.1f}s ({stats.records_per_sec:.1f}/s), "
+          f"{stats.errors} errors, {stats.output_tokens} output tokens")
+    if stats.mean_score is not None:
+        print(f"Mean score ({args.score}): {stats.mean_score:.3f} over {stats.scored} records")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
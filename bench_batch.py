@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark for the batch runner
+Runs the same synthetic batch (long templated documents, similarity
+scoring) through batch_runner with an increasing number of worker
+processes against a stub server running in its own process, and reports
+throughput and speedup over pre/post-processing on the event loop thread.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import requests
+
+from batch_runner import run_batch
+
+TEMPLATE = "Summarize the following document in one paragraph.\n\n$title\n\n$document\n\nSummary:"
+WORDS = ("latency throughput model token prompt cache queue worker process thread batch score "
+         "schema request response context window budget stream decode prefill").split()
+
+
+def build_records(count: int, document_chars: int, seed: int = 1) -> list:
+    """(line number, JSONL line) pairs with documents long enough to be trimmed by the token budget"""
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        words = []
+        size = 0
+        while size < document_chars:
+            word = rng.choice(WORDS)
+            words.append(word)
+            size += len(word) + 1
+        expected = " ".join(f"tok{j}" for j in range(0, 64, 2))
+        line = json.dumps({"id": i, "vars": {"title": f"Report {i}", "document": " ".join(words)},
+                           "expected": expected})
+        records.append((i + 1, line.encode("utf-8")))
+    return records
+
+
+def start_stub(output_tokens: int) -> tuple:
+    """Stub server in a separate process so it does not compete for this one's GIL"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    process = subprocess.Popen([sys.executable, "stub_server.py", "--port", str(port), "--ttft-ms", "0",
+                                "--tokens-per-sec", "0", "--output-tokens", str(output_tokens), "--parallel", "64"],
+                               cwd=os.path.dirname(os.path.abspath(__file__)),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            requests.get(f"{url}/api/version", timeout=1)
+            return process, url
+        except requests.exceptions.RequestException:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("stub server did not start")
+
+
+def measure(records: list, workers: int, url: str, concurrency: int, chunk_size: int):
+    stats = asyncio.run(run_batch(iter(records), io.BytesIO(), "qwen3:0.6b", TEMPLATE, scoring="similarity",
+                                  workers=workers, concurrency=concurrency, chunk_size=chunk_size,
+                                  api_base=f"{url}/api"))
+    if stats.errors:
+        print(f"  warning: {stats.errors} errors")
+    return stats
+
+
+def main():
+    cores = os.cpu_count() or 1
+    default_workers = sorted({0, 1} | {n for n in (2, 4, 8, 16, 32) if n <= cores} | {cores})
+    parser = argparse.ArgumentParser(description='Batch runner scaling benchmark')
+    parser.add_argument('--records', type=int, default=400, help='Records per run')
+    parser.add_argument('--document-chars', type=int, default=40000, help='Document size per record')
+    parser.add_argument('--output-tokens', type=int, default=64, help='Stub tokens per response')
+    parser.add_argument('--workers', type=int, nargs='+', default=default_workers, help='Worker counts to run')
+    parser.add_argument('--concurrency', type=int, default=32, help='Requests in flight')
+    parser.add_argument('--chunk-size', type=int, default=16, help='Records per worker task')
+    args = parser.parse_args()
+
+    records = build_records(args.records, args.document_chars)
+    size = sum(len(line) for _, line in records)
+    process, url = start_stub(args.output_tokens)
+    print(f"{args.records} records ({size / 1e6:.1f} MB), {cores} cores, stub at {url}")
+    print("=" * 70)
+    print(f"{'workers':>8} {'seconds':>9} {'records/s':>11} {'speedup':>9} {'efficiency':>11}")
+    try:
+        # Warm up connections, imports and the context length cache
+        measure(records[:args.chunk_size], 0, url, args.concurrency, args.chunk_size)
+        baseline = None
+        for workers in args.workers:
+            stats = measure(records, workers, url, args.concurrency, args.chunk_size)
+            baseline = baseline or stats.records_per_sec
+            speedup = stats.records_per_sec / baseline
+            print(f"{workers:>8d} {stats.elapsed:>9.2f} {stats.records_per_sec:>11.1f} {speedup:>8.2f}x "
+                  f"{speedup / max(workers, 1) * 100:>10.0f}%")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+if __name__ == "__main__":
+    main()
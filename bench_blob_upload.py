@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark for local blob hashing and upload
+Creates a large test file and measures SHA-256 throughput for mmap-based
+hashing against buffered reads, then upload throughput of BlobUploader
+against a local sink server that discards the body
+"""
+
+import argparse
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from blob_upload import CHUNK_SIZE, BlobUploader, sha256_file
+
+
+class BlobSinkHandler(BaseHTTPRequestHandler):
+    """Accepts /api/blobs uploads and throws the data away"""
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        remaining = int(self.headers.get("Content-Length", 0))
+        buffer = bytearray(1024 * 1024)
+        view = memoryview(buffer)
+        while remaining > 0:
+            read = self.rfile.readinto(view[:min(remaining, len(buffer))])
+            if not read:
+                break
+            remaining -= read
+        self.send_response(201)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def create_test_file(path: str, size: int):
+    block = os.urandom(1024 * 1024)
+    with open(path, 'wb') as f:
+        written = 0
+        while written < size:
+            f.write(block[:min(len(block), size - written)])
+            written += len(block)
+
+
+def sha256_buffered(path: str, chunk_size: int = CHUNK_SIZE) -> str:
+    digest = hashlib.sha256()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            digest.update(view[:read])
+    return f"sha256:{digest.hexdigest()}"
+
+
+def report(name: str, size: int, seconds: float):
+    print(f"{name:<22} {seconds:7.2f}s  {size / seconds / 1e6:9.1f} MB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Blob hashing and upload benchmark')
+    parser.add_argument('--size-gb', type=float, default=2.0, help='Test file size in GB')
+    parser.add_argument('--file', help='Use an existing file instead of creating one')
+    args = parser.parse_args()
+
+    if args.file:
+        path, cleanup = args.file, False
+    else:
+        fd, path = tempfile.mkstemp(suffix='.gguf')
+        os.close(fd)
+        cleanup = True
+        print(f"Creating {args.size_gb:.1f} GB test file...")
+        create_test_file(path, int(args.size_gb * 1e9))
+    size = os.path.getsize(path)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), BlobSinkHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        print(f"File: {path} ({size / 1e9:.2f} GB)")
+        print("=" * 60)
+        start = time.perf_counter()
+        digest = sha256_file(path)
+        report("hash (mmap)", size, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        assert sha256_buffered(path) == digest
+        report("hash (readinto)", size, time.perf_counter() - start)
+
+        uploader = BlobUploader(f"http://127.0.0.1:{server.server_port}")
+        start = time.perf_counter()
+        assert uploader.push_blob(path, digest)
+        report("upload (mmap body)", size, time.perf_counter() - start)
+    finally:
+        server.shutdown()
+        if cleanup:
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
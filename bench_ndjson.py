@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the incremental NDJSON reader
+Compares throughput and peak allocations of ndjson_reader.iter_response
+against the requests iter_lines + json.loads loop on a synthetic stream
+"""
+
+import argparse
+import io
+import json
+import time
+import tracemalloc
+
+import requests
+
+from ndjson_reader import DEFAULT_CHUNK_SIZE, iter_response
+
+
+def build_stream(records: int) -> bytes:
+    """Build an NDJSON body shaped like /api/pull and /api/generate output"""
+    lines = []
+    for i in range(records):
+        if i % 2:
+            lines.append(json.dumps({"status": "pulling sha256:" + "ab" * 32,
+                                     "digest": "sha256:" + "cd" * 32,
+                                     "total": 522653184, "completed": i * 4096}))
+        else:
+            lines.append(json.dumps({"model": "qwen3:0.6b", "created_at": "2025-01-01T00:00:00Z",
+                                     "response": "token ", "done": False}))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def make_response(body: bytes) -> requests.Response:
+    """Wrap a byte string in a streamed requests.Response"""
+    response = requests.Response()
+    response.status_code = 200
+    response.raw = io.BytesIO(body)
+    return response
+
+
+def consume_iter_lines(response: requests.Response) -> int:
+    count = 0
+    for line in response.iter_lines(chunk_size=DEFAULT_CHUNK_SIZE):
+        if line:
+            try:
+                json.loads(line.decode('utf-8'))
+                count += 1
+            except json.JSONDecodeError:
+                continue
+    return count
+
+
+def consume_ndjson_reader(response: requests.Response) -> int:
+    count = 0
+    for _ in iter_response(response, DEFAULT_CHUNK_SIZE):
+        count += 1
+    return count
+
+
+def measure(name: str, consume, body: bytes, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        response = make_response(body)
+        start = time.perf_counter()
+        count = consume(response)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    consume(make_response(body))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    mb = len(body) / 1e6
+    print(f"{name:<16} {count:>9d} records  {mb / best:8.1f} MB/s  "
+          f"{count / best:12.0f} rec/s  peak alloc {peak / 1024:9.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='NDJSON reader benchmark')
+    parser.add_argument('--records', type=int, default=200000, help='Number of records in the stream')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing repetitions (best is reported)')
+    args = parser.parse_args()
+
+    body = build_stream(args.records)
+    print(f"Stream size: {len(body) / 1e6:.1f} MB, chunk size: {DEFAULT_CHUNK_SIZE} bytes")
+    print("=" * 80)
+    measure("iter_lines", consume_iter_lines, body, args.repeat)
+    measure("NDJSONReader", consume_ndjson_reader, body, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for typed result objects
+Holds a large number of chat results as plain dicts and as slotted
+ChatResult instances, and reports retained memory and full GC pause time
+"""
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from result_types import ChatResult
+
+
+def make_payload(i: int) -> dict:
+    """A /api/chat response as returned by response.json()"""
+    return {
+        "model": "qwen3:0.6b",
+        "created_at": "2025-01-01T00:00:00.000000Z",
+        "message": {"role": "assistant", "content": f"answer {i}"},
+        "done_reason": "stop",
+        "done": True,
+        "total_duration": 1000000 + i,
+        "load_duration": 20000 + i,
+        "prompt_eval_count": 12,
+        "prompt_eval_duration": 30000,
+        "eval_count": 40,
+        "eval_duration": 900000,
+    }
+
+
+def build_dicts(count: int) -> list:
+    """The ad-hoc dict shape previously returned by OllamaChatClient.chat"""
+    results = []
+    for i in range(count):
+        result = make_payload(i)
+        results.append({
+            "response": result.get("message", {}).get("content", ""),
+            "context": result.get("context", []),
+            "total_duration": result.get("total_duration", 0),
+            "load_duration": result.get("load_duration", 0)
+        })
+    return results
+
+
+def build_results(count: int) -> list:
+    return [ChatResult.from_payload(make_payload(i)) for i in range(count)]
+
+
+def build_results_with_raw(count: int) -> list:
+    results = []
+    for i in range(count):
+        payload = make_payload(i)
+        results.append(ChatResult.from_payload(payload, raw=json.dumps(payload).encode('utf-8')))
+    return results
+
+
+def measure(name: str, build, count: int):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    results = build(count)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    gc_start = time.perf_counter()
+    gc.collect()
+    gc_pause = time.perf_counter() - gc_start
+
+    print(f"{name:<22} {current / 2**20:9.1f} MiB  {current / count:7.1f} B/result  "
+          f"build {elapsed:6.2f}s  full gc {gc_pause * 1000:8.1f} ms")
+    del results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Result object memory benchmark')
+    parser.add_argument('--count', type=int, default=1_000_000, help='Number of results to hold')
+    args = parser.parse_args()
+
+    print(f"Holding {args.count:,} chat results")
+    print("=" * 80)
+    measure("dict", build_dicts, args.count)
+    measure("ChatResult", build_results, args.count)
+    measure("ChatResult + raw bytes", build_results_with_raw, args.count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for main.py subcommands
+Runs a fresh interpreter with -X importtime for every command, importing
+the command's module through main.load_command without running it, and
+reports wall time, total import time and the heaviest top-level imports
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import main as cli
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_importtime(stderr: str):
+    """Return (total self time in us, {top-level package: cumulative us})"""
+    total = 0
+    top_level = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3:
+            continue
+        self_us, cumulative_us, name = int(fields[0]), int(fields[1]), fields[2]
+        total += self_us
+        # Top-level imports are the ones without indentation in the tree
+        if name.startswith(" ") and not name.startswith("  "):
+            top_level[name.strip()] = cumulative_us
+    return total, top_level
+
+
+def run_once(code: str):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=BASE_DIR, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return elapsed, parse_importtime(result.stderr)
+
+
+def measure(label: str, code: str, repeat: int, top: int):
+    best = None
+    for _ in range(repeat):
+        try:
+            sample = run_once(code)
+        except RuntimeError as e:
+            print(f"{label:<12s} failed: {e}")
+            return
+        if best is None or sample[0] < best[0]:
+            best = sample
+    elapsed, (total_us, top_level) = best
+    heaviest = sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:top]
+    summary = ", ".join(f"{name} {us / 1000:.1f}ms" for name, us in heaviest)
+    print(f"{label:<12s} wall {elapsed * 1000:7.1f} ms  imports {total_us / 1000:7.1f} ms  [{summary}]")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CLI cold-start benchmark')
+    parser.add_argument('commands', nargs='*', default=list(cli.COMMANDS),
+                        help='Commands to measure (default: all)')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per command (best is reported)')
+    parser.add_argument('--top', type=int, default=3, help='Heaviest imports to list')
+    args = parser.parse_args()
+
+    print("Cold start per subcommand (python -X importtime, best of "
+          f"{args.repeat})")
+    print("=" * 80)
+    # Baselines: a bare interpreter, and main.py up to argument dispatch
+    measure("interpreter", "pass", args.repeat, args.top)
+    measure("help", "import main", args.repeat, args.top)
+    for command in args.commands:
+        measure(command, f"import main; main.load_command({command!r})", args.repeat, args.top)
+
+
+if __name__ == "__main__":
+    main()
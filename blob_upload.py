@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Local model upload for Ollama
+Creates a model from local GGUF files: hashes each file with memory-mapped
+reads, uploads missing blobs to /api/blobs/:digest and then calls /api/create.
+Blobs the server already has are skipped, so an interrupted push picks up
+where it stopped when rerun.
+
+Usage: python blob_upload.py <model_name> <file.gguf> [file ...] [options]
+"""
+
+import argparse
+import hashlib
+import mmap
+import os
+import sys
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+
+import requests
+
+import config_loader
+from ndjson_reader import iter_response
+from result_types import PullProgress
+
+OLLAMA_HOST = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
+
+# Slice size for hashing and for handing mapped pages to the socket
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# Attempts per blob before the push is abandoned
+UPLOAD_ATTEMPTS = 3
+
+ProgressCallback = Callable[[int, int], None]
+
+
+def _map_file(f) -> Optional[mmap.mmap]:
+    size = os.fstat(f.fileno()).st_size
+    if size == 0:
+        return None
+    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mapped, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+        mapped.madvise(mmap.MADV_SEQUENTIAL)
+    return mapped
+
+
+def iter_file_chunks(path: str, chunk_size: int = CHUNK_SIZE,
+                     progress: ProgressCallback = None) -> Iterator[memoryview]:
+    """Yield read-only memoryview slices of a memory-mapped file"""
+    with open(path, 'rb') as f:
+        mapped = _map_file(f)
+        if mapped is None:
+            return
+        size = len(mapped)
+        view = memoryview(mapped)
+        try:
+            for offset in range(0, size, chunk_size):
+                chunk = view[offset:offset + chunk_size]
+                try:
+                    yield chunk
+                finally:
+                    chunk.release()
+                if progress:
+                    progress(min(offset + chunk_size, size), size)
+        finally:
+            view.release()
+            mapped.close()
+
+
+def sha256_file(path: str, chunk_size: int = CHUNK_SIZE, progress: ProgressCallback = None) -> str:
+    """Return the Ollama blob digest ("sha256:<hex>") of a file"""
+    digest = hashlib.sha256()
+    for chunk in iter_file_chunks(path, chunk_size, progress):
+        digest.update(chunk)
+    return f"sha256:{digest.hexdigest()}"
+
+
+class MappedFileBody:
+    """Request body streaming a memory-mapped file with a known length
+
+    requests sends a Content-Length header from __len__ and hands each
+    memoryview slice straight to the socket without copying it.
+    """
+
+    def __init__(self, path: str, chunk_size: int = CHUNK_SIZE, progress: ProgressCallback = None):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.size = os.path.getsize(path)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return iter_file_chunks(self.path, self.chunk_size, self.progress)
+
+
+class _ProgressPrinter:
+    """Prints progress in the same format as pull_model, every 5%"""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.next_percent = 0
+        self.done = 0
+
+    def __call__(self, done: int, total: int):
+        if done < self.done:
+            # A retried upload starts over
+            self.next_percent = 0
+        self.done = done
+        percent = (done / total) * 100 if total > 0 else 100
+        if percent >= self.next_percent:
+            print(f"{self.label}: {percent:.1f}%")
+            self.next_percent = int(percent // 5) * 5 + 5
+
+
+class BlobUploader:
+    def __init__(self, host: str = None):
+        self.host = host or OLLAMA_HOST
+        self.api_base = f"{self.host}/api"
+        self.session = requests.Session()
+
+    def _timeout(self):
+        settings = config_loader.get_config()
+        return settings["client_settings"]["connect_timeout"], settings["download_settings"]["timeout"]
+
+    def has_blob(self, digest: str) -> bool:
+        """Check whether the server already stores a blob"""
+        response = self.session.head(f"{self.api_base}/blobs/{digest}", timeout=self._timeout())
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+        return True
+
+    def push_blob(self, path: str, digest: str, progress: ProgressCallback = None) -> bool:
+        """Upload a file as a blob, retrying the whole blob on connection errors"""
+        for attempt in range(1, UPLOAD_ATTEMPTS + 1):
+            body = MappedFileBody(path, progress=progress)
+            if progress:
+                # Every attempt sends the whole file again
+                progress(0, body.size)
+            try:
+                response = self.session.post(f"{self.api_base}/blobs/{digest}", data=body,
+                                             timeout=self._timeout())
+                response.raise_for_status()
+                return True
+            except requests.exceptions.RequestException as e:
+                print(f"Upload of {os.path.basename(path)} failed (attempt {attempt}/{UPLOAD_ATTEMPTS}): {e}")
+                if attempt < UPLOAD_ATTEMPTS:
+                    time.sleep(2 ** attempt)
+        return False
+
+    def ensure_blob(self, path: str) -> Optional[str]:
+        """Hash a file and upload it unless the server has it; returns the digest"""
+        name = os.path.basename(path)
+        print(f"Hashing {name}...")
+        digest = sha256_file(path, progress=_ProgressPrinter(f"Hashing {name}"))
+        print(f"Digest: {digest}")
+
+        try:
+            if self.has_blob(digest):
+                print(f"Blob for {name} already exists on server, skipping upload")
+                return digest
+        except requests.exceptions.RequestException as e:
+            print(f"Error checking blob {digest}: {e}")
+            return None
+
+        print(f"Uploading {name}...")
+        if not self.push_blob(path, digest, progress=_ProgressPrinter(f"Uploading {name}")):
+            return None
+        return digest
+
+    def create_model(self, model_name: str, files: Dict[str, str], template: str = None,
+                     system: str = None, parameters: Dict = None, quantize: str = None) -> bool:
+        """Create a model from uploaded blobs via /api/create"""
+        data = {"model": model_name, "files": files, "stream": True}
+        if template:
+            data["template"] = template
+        if system:
+            data["system"] = system
+        if parameters:
+            data["parameters"] = parameters
+        if quantize:
+            data["quantize"] = quantize
+
+        try:
+            response = self.session.post(f"{self.api_base}/create", json=data, stream=True,
+                                         timeout=self._timeout())
+            response.raise_for_status()
+            for record in iter_response(response):
+                if "error" in record:
+                    print(f"Failed to create model {model_name}: {record['error']}")
+                    return False
+                progress = PullProgress.from_payload(record)
+                if progress.status:
+                    print(f"Status: {progress.status}")
+            return True
+        except requests.exceptions.RequestException as e:
+            print(f"Failed to create model {model_name}: {e}")
+            return False
+
+    def push_local(self, model_name: str, paths: List[str], **create_options) -> bool:
+        """Upload local model files and create a model from them"""
+        files = {}
+        for path in paths:
+            digest = self.ensure_blob(path)
+            if digest is None:
+                return False
+            files[os.path.basename(path)] = digest
+        return self.create_model(model_name, files, **create_options)
+
+
+def _parse_parameters(values: List[str]) -> Dict:
+    parameters = {}
+    for value in values:
+        key, _, raw = value.partition('=')
+        for cast in (int, float):
+            try:
+                raw = cast(raw)
+                break
+            except ValueError:
+                continue
+        parameters[key] = raw
+    return parameters
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create an Ollama model from local GGUF files')
+    parser.add_argument('model_name', help='Name of the model to create (e.g. my-model:q4)')
+    parser.add_argument('files', nargs='+', help='Local GGUF files (model and optional projector)')
+    parser.add_argument('--template', help='Prompt template')
+    parser.add_argument('--system', help='System prompt')
+    parser.add_argument('--parameter', action='append', default=[], metavar='KEY=VALUE',
+                        help='Model parameter, may be repeated (e.g. num_ctx=8192)')
+    parser.add_argument('--quantize', help='Quantize on create (e.g. q4_K_M)')
+    parser.add_argument('--host', default=OLLAMA_HOST, help='Ollama host')
+    args = parser.parse_args(sys.argv[1:])
+
+    for path in args.files:
+        if not os.path.isfile(path):
+            print(f"File not found: {path}")
+            sys.exit(1)
+
+    uploader = BlobUploader(args.host)
+    success = uploader.push_local(args.model_name, args.files, template=args.template,
+                                  system=args.system, parameters=_parse_parameters(args.parameter),
+                                  quantize=args.quantize)
+    if success:
+        print(f"Successfully created model: {args.model_name}")
+    else:
+        print(f"Failed to create model: {args.model_name}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,91 +1,559 @@
 #!/usr/bin/env python3
 """
-Example script to use the default qwen3:0.6b model for chat interactions
+Example script to use the default model (qwen3:0.6b unless configured otherwise) for chat interactions
 """
 import requests
 import json
 import os
+from contextlib import aclosing, closing
+
+import config_loader
+import request_timing
+import traffic_recorder
+from ndjson_reader import DEFAULT_CHUNK_SIZE, aiter_response, iter_response
+from request_timing import RequestTimer
+from result_types import ChatResult, GenerateResult, ModelInfo, StructuredResult
+from structured_output import IncrementalValidator
+from token_budget import TokenBudget, context_lengths
 
 OLLAMA_HOST = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
 OLLAMA_API_BASE = f"{OLLAMA_HOST}/api"
 
-class OllamaChatClient:
-    def __init__(self, model_name="qwen3:0.6b"):
-        self.model_name = model_name
+# Retries after a structured response is aborted for going off-schema
+STRUCTURED_RETRIES = 2
+
+def build_chat_payload(model_name, message, context=None, stream=False, history=None):
+    """Build the request body for /api/chat; ``history`` holds earlier messages"""
+    payload = {
+        "model": model_name,
+        "messages": list(history or []) + [
+            {
+                "role": "user",
+                "content": message
+            }
+        ],
+        "stream": stream
+    }
+    
+    if context:
+        payload["context"] = context
+    return payload
+
+def build_generate_payload(model_name, prompt, stream=False):
+    """Build the request body for /api/generate"""
+    return {
+        "model": model_name,
+        "prompt": prompt,
+        "stream": stream
+    }
+
+def record_text(record):
+    """Text carried by one /api/chat or /api/generate record"""
+    if "message" in record:
+        return record["message"].get("content") or ""
+    return record.get("response") or ""
+
+class _ChatClientBase:
+    """Model and timeout resolution shared by the sync and async clients"""
+    
+    def __init__(self, model_name=None):
+        self._model_name = model_name
         self.api_base = OLLAMA_API_BASE
+        # Timing breakdown of the most recently completed streamed request
+        self.last_timings = None
+        self.budget = TokenBudget()
+        # How the most recent prompt was fitted into the context window
+        self.last_budget = None
     
-    def chat(self, message, context=None):
-        """Send a chat message to the model and get response"""
-        payload = {
-            "model": self.model_name,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": message
-                }
-            ],
-            "stream": False
-        }
-        
-        if context:
-            payload["context"] = context
-        
-        try:
-            response = requests.post(f"{self.api_base}/chat", json=payload)
+    @property
+    def model_name(self):
+        """Explicit model, or the default model from the live config"""
+        return self._model_name or config_loader.get_default_model()
+    
+    @model_name.setter
+    def model_name(self, value):
+        self._model_name = value
+    
+    def _timeout(self):
+        """(connect, read) timeouts from the live config"""
+        settings = config_loader.get_client_settings()
+        return settings["connect_timeout"], settings["request_timeout"]
+    
+    def _finish_capture(self, capture, error=None):
+        """Write a recorded exchange, with the context length the replay server should report"""
+        capture.finish(error, self.last_budget.context_length if self.last_budget else None)
+    
+    def _structured_result(self, endpoint, payload, attempts, final, text, error):
+        """Summarize the attempts of a structured request
+        
+        ``attempts`` holds (tokens generated, aborted) per attempt and ``final``
+        the done record of the last attempt, if it ran to completion. An
+        aborted attempt would otherwise have run about as long as a complete
+        answer, so the tokens it saved are estimated from the valid attempt's
+        eval_count (or num_predict, or the output reserve when none succeeded).
+        """
+        valid = final is not None and error is None
+        if valid:
+            expected = final.get("eval_count") or attempts[-1][0]
+        else:
+            expected = (payload.get("options") or {}).get("num_predict") or \
+                self.budget.settings["reserve_output_tokens"]
+        result = None
+        if final is not None:
+            if endpoint == "/chat":
+                result = ChatResult.from_payload(dict(final, message={"role": "assistant", "content": text}),
+                                                 timings=self.last_timings)
+            else:
+                result = GenerateResult.from_payload(dict(final, response=text), timings=self.last_timings)
+        return StructuredResult(
+            value=json.loads(text) if valid else None,
+            valid=valid,
+            attempts=len(attempts),
+            aborted=sum(1 for _, aborted in attempts if aborted),
+            generated_tokens=sum(tokens for tokens, _ in attempts),
+            saved_tokens=sum(max(expected - tokens, 0) for tokens, aborted in attempts if aborted),
+            error=error,
+            result=result,
+        )
+
+class OllamaChatClient(_ChatClientBase):
+    
+    def __init__(self, model_name=None):
+        super().__init__(model_name)
+        self._session = None
+    
+    @property
+    def session(self):
+        """Keep-alive session that records connect and pool wait times"""
+        if self._session is None:
+            self._session = request_timing.timed_session()
+        return self._session
+    
+    def _fit(self, payload):
+        """Trim the payload to the model's context window and set num_ctx"""
+        context_length = context_lengths.get(self.api_base, payload["model"])
+        self.last_budget = self.budget.apply(payload, context_length)
+    
+    def _post(self, endpoint, payload):
+        """POST a non-streaming request; returns (parsed payload, raw body, timings)"""
+        session = self.session
+        timer = RequestTimer(endpoint)
+        capture = traffic_recorder.capture(endpoint, payload, stream=False)
+        try:
+            response = session.post(f"{self.api_base}{endpoint}", json=payload, timeout=self._timeout())
+            timer.mark_headers(response)
+            if capture:
+                capture.headers(response.status_code)
             response.raise_for_status()
-            
             result = response.json()
-            return {
-                "response": result.get("message", {}).get("content", ""),
-                "context": result.get("context", []),
-                "total_duration": result.get("total_duration", 0),
-                "load_duration": result.get("load_duration", 0)
-            }
+            if capture:
+                capture.chunk(result)
+        except Exception as e:
+            if capture:
+                self._finish_capture(capture, e)
+            raise
+        if capture:
+            self._finish_capture(capture)
+        return result, response.content, request_timing.record(timer.finish(result))
+    
+    def chat(self, message, context=None, history=None):
+        """Send a chat message to the model and get response"""
+        payload = build_chat_payload(self.model_name, message, context, history=history)
+        
+        try:
+            self._fit(payload)
+            result, raw, timings = self._post("/chat", payload)
+            return ChatResult.from_payload(result, raw=raw, timings=timings)
         except Exception as e:
             print(f"Error in chat: {e}")
             return None
     
     def generate(self, prompt):
         """Generate text from a prompt using the default model"""
-        payload = {
-            "model": self.model_name,
-            "prompt": prompt,
-            "stream": False
-        }
+        payload = build_generate_payload(self.model_name, prompt)
         
         try:
-            response = requests.post(f"{self.api_base}/generate", json=payload)
+            self._fit(payload)
+            result, raw, timings = self._post("/generate", payload)
+            return GenerateResult.from_payload(result, raw=raw, timings=timings)
+        except Exception as e:
+            print(f"Error in generation: {e}")
+            return None
+    
+    def _stream(self, endpoint, payload):
+        """POST a streaming request and yield the parsed NDJSON records"""
+        session = self.session
+        timer = RequestTimer(endpoint)
+        capture = traffic_recorder.capture(endpoint, payload)
+        error = None
+        finished = False
+        try:
+            with session.post(f"{self.api_base}{endpoint}", json=payload, stream=True,
+                              timeout=self._timeout()) as response:
+                timer.mark_headers(response)
+                if capture:
+                    capture.headers(response.status_code)
+                response.raise_for_status()
+                for record in iter_response(response, DEFAULT_CHUNK_SIZE):
+                    if capture:
+                        capture.chunk(record)
+                    if record.get("done"):
+                        finished = True
+                        self.last_timings = request_timing.record(timer.finish(record))
+                    else:
+                        timer.mark_first_token()
+                    yield record
+        except BaseException as e:
+            # Includes GeneratorExit when the caller stops reading early, which
+            # is no error once the done record has arrived
+            if not finished:
+                error = e
+            raise
+        finally:
+            if capture:
+                self._finish_capture(capture, error)
+    
+    def stream_chat(self, message, context=None, history=None):
+        """Send a chat message and yield response records as they arrive"""
+        payload = build_chat_payload(self.model_name, message, context, stream=True, history=history)
+        
+        try:
+            self._fit(payload)
+            yield from self._stream("/chat", payload)
+        except Exception as e:
+            print(f"Error in chat stream: {e}")
+    
+    def stream_generate(self, prompt):
+        """Generate text from a prompt and yield response records as they arrive"""
+        payload = build_generate_payload(self.model_name, prompt, stream=True)
+        
+        try:
+            self._fit(payload)
+            yield from self._stream("/generate", payload)
+        except Exception as e:
+            print(f"Error in generation stream: {e}")
+    
+    def send_payload(self, endpoint, payload):
+        """Fit a caller-built /chat or /generate payload and send it without streaming
+        
+        Returns a ChatResult or GenerateResult; unlike chat and generate,
+        errors are raised to the caller.
+        """
+        self._fit(payload)
+        result, raw, timings = self._post(endpoint, payload)
+        result_type = ChatResult if endpoint == "/chat" else GenerateResult
+        return result_type.from_payload(result, raw=raw, timings=timings)
+    
+    def stream_payload(self, endpoint, payload, fit=True):
+        """Fit a caller-built payload and yield its response records; errors are raised
+        
+        With fit=False the payload is sent exactly as given.
+        """
+        if fit:
+            self._fit(payload)
+        yield from self._stream(endpoint, payload)
+    
+    def _structured(self, endpoint, payload, schema, max_retries):
+        """Stream with incremental validation; abort on the first off-schema token and retry"""
+        attempts = []
+        for _ in range(max_retries + 1):
+            validator = IncrementalValidator(schema)
+            pieces, final = [], None
+            # Closing the generator closes the response, which stops generation server-side
+            with closing(self._stream(endpoint, payload)) as records:
+                for record in records:
+                    if record.get("done"):
+                        final = record
+                        break
+                    pieces.append(record_text(record))
+                    if not validator.feed(pieces[-1]):
+                        break
+            ok = final is not None and validator.finish()
+            attempts.append((len(pieces), final is None))
+            if ok:
+                break
+        return self._structured_result(endpoint, payload, attempts, final, "".join(pieces),
+                                       None if ok else validator.error)
+    
+    def generate_structured(self, prompt, schema=None, max_retries=STRUCTURED_RETRIES):
+        """Generate JSON matching ``schema`` (any JSON if None) via the ``format`` parameter
+        
+        The streamed output is validated as it arrives; once it can no longer
+        match, the request is cancelled and retried.
+        """
+        payload = build_generate_payload(self.model_name, prompt, stream=True)
+        payload["format"] = schema or "json"
+        
+        try:
+            self._fit(payload)
+            return self._structured("/generate", payload, schema, max_retries)
+        except Exception as e:
+            print(f"Error in structured generation: {e}")
+            return None
+    
+    def chat_structured(self, message, schema=None, history=None, max_retries=STRUCTURED_RETRIES):
+        """Chat counterpart of generate_structured"""
+        payload = build_chat_payload(self.model_name, message, stream=True, history=history)
+        payload["format"] = schema or "json"
+        
+        try:
+            self._fit(payload)
+            return self._structured("/chat", payload, schema, max_retries)
+        except Exception as e:
+            print(f"Error in structured chat: {e}")
+            return None
+
+class AsyncOllamaChatClient(_ChatClientBase):
+    """asyncio counterpart of OllamaChatClient backed by httpx"""
+    
+    def __init__(self, model_name=None, client=None):
+        super().__init__(model_name)
+        self._client = client
+        self._owns_client = client is None
+    
+    def _timeout(self):
+        import httpx
+        connect, request = super()._timeout()
+        return httpx.Timeout(request, connect=connect)
+    
+    @property
+    def client(self):
+        if self._client is None:
+            # httpx is only needed by async callers, so it is imported on first use
+            import httpx
+            self._client = httpx.AsyncClient(timeout=None)
+        return self._client
+    
+    async def aclose(self):
+        """Close the underlying HTTP client if this instance created it"""
+        if self._owns_client and self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+    
+    async def _fit(self, payload):
+        """Trim the payload to the model's context window and set num_ctx"""
+        context_length = await context_lengths.aget(self.api_base, payload["model"], self.client)
+        self.last_budget = self.budget.apply(payload, context_length)
+    
+    async def _post(self, endpoint, payload):
+        """POST a non-streaming request; returns (parsed payload, raw body, timings)"""
+        client = self.client
+        timer = RequestTimer(endpoint)
+        capture = traffic_recorder.capture(endpoint, payload, stream=False)
+        try:
+            response = await client.post(f"{self.api_base}{endpoint}", json=payload, timeout=self._timeout(),
+                                         extensions={"trace": timer.trace})
+            timer.mark_headers()
+            if capture:
+                capture.headers(response.status_code)
             response.raise_for_status()
-            
             result = response.json()
-            return {
-                "response": result.get("response", ""),
-                "total_duration": result.get("total_duration", 0),
-                "load_duration": result.get("load_duration", 0)
-            }
+            if capture:
+                capture.chunk(result)
+        except Exception as e:
+            if capture:
+                self._finish_capture(capture, e)
+            raise
+        if capture:
+            self._finish_capture(capture)
+        return result, response.content, request_timing.record(timer.finish(result))
+    
+    async def post_raw(self, endpoint, body):
+        """POST an already encoded JSON body and return the undecoded response body
+        
+        Used by bulk callers that build and parse payloads off the event loop.
+        """
+        capture = traffic_recorder.capture(endpoint, body, stream=False)
+        try:
+            response = await self.client.post(f"{self.api_base}{endpoint}", content=body, timeout=self._timeout(),
+                                              headers={"Content-Type": "application/json"})
+            if capture:
+                capture.headers(response.status_code)
+            response.raise_for_status()
+        except Exception as e:
+            if capture:
+                capture.finish(e)
+            raise
+        if capture:
+            try:
+                capture.chunk(json.loads(response.content))
+            except ValueError:
+                pass
+            # Bulk callers fit payloads themselves, so there is no context length to record
+            capture.finish()
+        return response.content
+    
+    async def chat(self, message, context=None, history=None):
+        """Send a chat message to the model and get response"""
+        payload = build_chat_payload(self.model_name, message, context, history=history)
+        
+        try:
+            await self._fit(payload)
+            result, raw, timings = await self._post("/chat", payload)
+            return ChatResult.from_payload(result, raw=raw, timings=timings)
+        except Exception as e:
+            print(f"Error in chat: {e}")
+            return None
+    
+    async def generate(self, prompt):
+        """Generate text from a prompt using the default model"""
+        payload = build_generate_payload(self.model_name, prompt)
+        
+        try:
+            await self._fit(payload)
+            result, raw, timings = await self._post("/generate", payload)
+            return GenerateResult.from_payload(result, raw=raw, timings=timings)
         except Exception as e:
             print(f"Error in generation: {e}")
             return None
+    
+    async def _stream(self, endpoint, payload):
+        """POST a streaming request and yield the parsed NDJSON records"""
+        client = self.client
+        timer = RequestTimer(endpoint)
+        capture = traffic_recorder.capture(endpoint, payload)
+        error = None
+        finished = False
+        try:
+            async with client.stream("POST", f"{self.api_base}{endpoint}", json=payload, timeout=self._timeout(),
+                                     extensions={"trace": timer.trace}) as response:
+                timer.mark_headers()
+                if capture:
+                    capture.headers(response.status_code)
+                response.raise_for_status()
+                async for record in aiter_response(response):
+                    if capture:
+                        capture.chunk(record)
+                    if record.get("done"):
+                        finished = True
+                        self.last_timings = request_timing.record(timer.finish(record))
+                    else:
+                        timer.mark_first_token()
+                    yield record
+        except BaseException as e:
+            # Includes GeneratorExit when the caller stops reading early, which
+            # is no error once the done record has arrived
+            if not finished:
+                error = e
+            raise
+        finally:
+            if capture:
+                self._finish_capture(capture, error)
+    
+    async def stream_chat(self, message, context=None, history=None):
+        """Send a chat message and yield response records as they arrive"""
+        payload = build_chat_payload(self.model_name, message, context, stream=True, history=history)
+        
+        try:
+            await self._fit(payload)
+            async for record in self._stream("/chat", payload):
+                yield record
+        except Exception as e:
+            print(f"Error in chat stream: {e}")
+    
+    async def stream_generate(self, prompt):
+        """Generate text from a prompt and yield response records as they arrive"""
+        payload = build_generate_payload(self.model_name, prompt, stream=True)
+        
+        try:
+            await self._fit(payload)
+            async for record in self._stream("/generate", payload):
+                yield record
+        except Exception as e:
+            print(f"Error in generation stream: {e}")
+    
+    async def send_payload(self, endpoint, payload):
+        """Fit a caller-built /chat or /generate payload and send it without streaming
+        
+        Returns a ChatResult or GenerateResult; unlike chat and generate,
+        errors are raised to the caller.
+        """
+        await self._fit(payload)
+        result, raw, timings = await self._post(endpoint, payload)
+        result_type = ChatResult if endpoint == "/chat" else GenerateResult
+        return result_type.from_payload(result, raw=raw, timings=timings)
+    
+    async def stream_payload(self, endpoint, payload, fit=True):
+        """Fit a caller-built payload and yield its response records; errors are raised
+        
+        With fit=False the payload is sent exactly as given.
+        """
+        if fit:
+            await self._fit(payload)
+        async for record in self._stream(endpoint, payload):
+            yield record
+    
+    async def _structured(self, endpoint, payload, schema, max_retries):
+        """Stream with incremental validation; abort on the first off-schema token and retry"""
+        attempts = []
+        for _ in range(max_retries + 1):
+            validator = IncrementalValidator(schema)
+            pieces, final = [], None
+            async with aclosing(self._stream(endpoint, payload)) as records:
+                async for record in records:
+                    if record.get("done"):
+                        final = record
+                        break
+                    pieces.append(record_text(record))
+                    if not validator.feed(pieces[-1]):
+                        break
+            ok = final is not None and validator.finish()
+            attempts.append((len(pieces), final is None))
+            if ok:
+                break
+        return self._structured_result(endpoint, payload, attempts, final, "".join(pieces),
+                                       None if ok else validator.error)
+    
+    async def generate_structured(self, prompt, schema=None, max_retries=STRUCTURED_RETRIES):
+        """Generate JSON matching ``schema``, aborting and retrying as soon as it goes off-schema"""
+        payload = build_generate_payload(self.model_name, prompt, stream=True)
+        payload["format"] = schema or "json"
+        
+        try:
+            await self._fit(payload)
+            return await self._structured("/generate", payload, schema, max_retries)
+        except Exception as e:
+            print(f"Error in structured generation: {e}")
+            return None
+    
+    async def chat_structured(self, message, schema=None, history=None, max_retries=STRUCTURED_RETRIES):
+        """Chat counterpart of generate_structured"""
+        payload = build_chat_payload(self.model_name, message, stream=True, history=history)
+        payload["format"] = schema or "json"
+        
+        try:
+            await self._fit(payload)
+            return await self._structured("/chat", payload, schema, max_retries)
+        except Exception as e:
+            print(f"Error in structured chat: {e}")
+            return None
 
 def main():
-    # Initialize the client with the default model
-    client = OllamaChatClient(model_name="qwen3:0.6b")
+    # Initialize the client with the default model from models/model_config.json
+    client = OllamaChatClient()
+    model_name = client.model_name
 
-    print("Ollama Chat Client with qwen3:0.6b (Default Model)")
+    print(f"Ollama Chat Client with {model_name} (Default Model)")
     print("=" * 50)
 
     # Test if the default model is available
     try:
-        response = requests.get(f"{OLLAMA_API_BASE}/tags")
+        response = requests.get(f"{OLLAMA_API_BASE}/tags", timeout=client._timeout())
         response.raise_for_status()
         models_data = response.json()
 
-        available_models = [model.get('name') for model in models_data.get('models', [])]
+        available_models = [ModelInfo.from_payload(model).name for model in models_data.get('models', [])]
 
-        if "qwen3:0.6b" in available_models:
-            print("✓ qwen3:0.6b model is available")
+        if model_name in available_models:
+            print(f"✓ {model_name} model is available")
         else:
-            print("✗ qwen3:0.6b model is NOT available")
+            print(f"✗ {model_name} model is NOT available")
             print(f"Available models: {available_models}")
             return
     except Exception as e:
@@ -97,12 +565,17 @@ def main():
     result = client.chat("你好，请简单介绍一下你自己。")
 
     if result:
-        print(f"Response: {result['response'][:200]}...")
-        print(f"Total duration: {result['total_duration']/1e9:.2f}s")
+        print(f"Response: {result.response[:200]}...")
+        print(f"Total duration: {result.total_duration/1e9:.2f}s")
+        print(f"Timing: {result.timings.summary_line()}")
+        budget = client.last_budget
+        if budget:
+            print(f"Prompt: {budget.prompt_tokens} tokens of {budget.limit} (num_ctx {budget.num_ctx}, "
+                  f"model context {budget.context_length})")
     else:
         print("Failed to get response from model")
 
-    print("\nYou can now use qwen3:0.6b as the default model in your applications!")
+    print(f"\nYou can now use {model_name} as the default model in your applications!")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Circuit breaker and shared health state for Ollama hosts
+After a run of connection failures, timeouts or 5xx answers a host is
+marked down and callers fail immediately instead of each waiting out their
+own timeout. A background prober checks down hosts and closes the circuit
+once one answers again; without it, the first request after the reset
+timeout is let through as a half-open trial.
+
+Usage: python circuit_breaker.py [HOST]
+"""
+
+import sys
+import threading
+import time
+from typing import Callable, Dict
+
+import requests
+
+import config_loader
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of sending a request to a host that is known to be down"""
+
+
+def is_backend_failure(error: Exception) -> bool:
+    """Connection errors, timeouts and 5xx count against a host; 4xx answers mean it is up"""
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code >= 500
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+class CircuitBreaker:
+    """Closed -> open after ``failure_threshold`` consecutive failures -> half-open after ``reset_timeout``"""
+
+    def __init__(self, host: str, settings_source: Callable[[], Dict] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.host = host
+        self._settings_source = settings_source or (lambda: config_loader.get_config()["circuit_breaker"])
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.last_error = None
+        self._trial = False
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now; in half-open state only one trial is let through"""
+        if self.state == CLOSED:
+            return True
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self._clock() - self.opened_at >= self._settings_source()["reset_timeout"]:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        if self.state == CLOSED and not self.failures:
+            return
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.last_error = None
+            self._trial = False
+
+    def record_failure(self, error: Exception = None) -> bool:
+        """Count a failure; returns True if this opened the circuit"""
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error) if error is not None else self.last_error
+            self._trial = False
+            if self.state == HALF_OPEN or (self.state == CLOSED
+                                           and self.failures >= self._settings_source()["failure_threshold"]):
+                self.state = OPEN
+                self.opened_at = self._clock()
+                return True
+            if self.state == OPEN:
+                self.opened_at = self._clock()
+            return False
+
+    def retry_in(self) -> float:
+        """Seconds until the next half-open trial"""
+        if self.state != OPEN:
+            return 0.0
+        return max(self.opened_at + self._settings_source()["reset_timeout"] - self._clock(), 0.0)
+
+    def to_dict(self) -> Dict:
+        return {"host": self.host, "state": self.state, "failures": self.failures,
+                "retry_in": round(self.retry_in(), 3), "last_error": self.last_error}
+
+
+class HealthRegistry:
+    """Process-wide circuit breakers by host, with a prober for the open ones"""
+
+    def __init__(self, settings_source: Callable[[], Dict] = None):
+        self._settings_source = settings_source or (lambda: config_loader.get_config()["circuit_breaker"])
+        self._breakers = {}
+        self._lock = threading.Lock()
+        self._prober = None
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(host, CircuitBreaker(host, self._settings_source))
+        return breaker
+
+    def is_healthy(self, host: str) -> bool:
+        return self.breaker(host).state == CLOSED
+
+    def record_failure(self, host: str, error: Exception = None):
+        if self.breaker(host).record_failure(error):
+            print(f"Circuit opened for {host}: {error}")
+            self._start_prober()
+
+    def record_success(self, host: str):
+        self.breaker(host).record_success()
+
+    def status(self) -> Dict[str, Dict]:
+        return {host: breaker.to_dict() for host, breaker in list(self._breakers.items())}
+
+    def reset(self):
+        with self._lock:
+            self._breakers.clear()
+
+    def _start_prober(self):
+        with self._lock:
+            if self._prober is not None and self._prober.is_alive():
+                return
+            self._prober = threading.Thread(target=self._probe_loop, name="health-prober", daemon=True)
+            self._prober.start()
+
+    def _probe_loop(self):
+        """Probe down hosts until every circuit is closed again"""
+        while True:
+            settings = self._settings_source()
+            time.sleep(settings["probe_interval"])
+            down = [breaker for breaker in list(self._breakers.values()) if breaker.state != CLOSED]
+            if not down:
+                return
+            for breaker in down:
+                if probe(breaker.host, settings["probe_timeout"]):
+                    breaker.record_success()
+                    print(f"Circuit closed for {breaker.host}: host is answering again")
+
+
+def probe(host: str, timeout: float) -> bool:
+    """Cheap liveness check against /api/version"""
+    try:
+        return requests.get(f"{host}/api/version", timeout=timeout).status_code == 200
+    except requests.exceptions.RequestException:
+        return False
+
+
+health = HealthRegistry()
+
+
+def main():
+    from model_manager import OLLAMA_HOST
+    host = sys.argv[1] if len(sys.argv) > 1 else OLLAMA_HOST
+    settings = config_loader.get_config()["circuit_breaker"]
+    start = time.perf_counter()
+    up = probe(host, settings["probe_timeout"])
+    print(f"{host}: {'up' if up else 'down'} ({(time.perf_counter() - start) * 1000:.1f} ms)")
+    print(f"Opens after {settings['failure_threshold']} failures, half-open after {settings['reset_timeout']}s, "
+          f"probed every {settings['probe_interval']}s")
+    sys.exit(0 if up else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+Model configuration loader
+Single source of truth for models/model_config.json: validates the schema,
+caches the parsed config and reloads it when the file changes on disk, so
+long-running processes pick up edits without a restart.
+
+Usage: python config_loader.py [get <key>|validate] [--path PATH]
+"""
+
+import argparse
+import copy
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+MODEL_CONFIG_PATH = os.getenv(
+    'OLLAMA_MODEL_CONFIG',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'model_config.json')
+)
+
+# How often (seconds) the config file is stat()ed for changes
+POLL_INTERVAL = 1.0
+
+DEFAULT_CONFIG = {
+    "default_model": "qwen3:0.6b",
+    "available_models": ["qwen3:0.6b"],
+    "quick_models": ["qwen3:0.6b", "qwen2.5:0.5b", "llama3:8b"],
+    "model_sources": {},
+    "download_settings": {
+        "use_mirror": True,
+        "mirror_url": "https://registry.ollama.ai",
+        "timeout": 3600
+    },
+    "client_settings": {
+        "connect_timeout": 5,
+        "request_timeout": 300
+    },
+    "registry_cache": {
+        "host": "0.0.0.0",
+        "port": 5000,
+        "cache_dir": "~/.cache/ollama-service/registry",
+        "max_size_gb": 200,
+        "manifest_ttl": 300,
+        "upstream": "https://registry.ollama.ai"
+    },
+    "slow_request_log": {
+        "path": "~/.cache/ollama-service/slow_requests.jsonl",
+        "threshold_ms": 5000,
+        "sample_rate": 1.0,
+        "baseline_sample_rate": 0.01
+    },
+    "token_budget": {
+        "enabled": True,
+        "num_ctx": 8192,
+        "reserve_output_tokens": 1024,
+        "safety_margin": 0.1,
+        "summarize_history": True,
+        "summary_tokens": 256
+    },
+    "benchmark": {
+        "store": "~/.cache/ollama-service/benchmarks.sqlite3",
+        "num_predict": 128,
+        "target_ttft_ms": 1000,
+        "min_tokens_per_sec": 10,
+        "min_quality": 0.6
+    },
+    "job_manager": {
+        "db": "~/.cache/ollama-service/jobs.sqlite3",
+        "host": "127.0.0.1",
+        "port": 11500,
+        "workers": 2,
+        "poll_interval": 1.0
+    },
+    "circuit_breaker": {
+        "failure_threshold": 3,
+        "reset_timeout": 10,
+        "probe_interval": 2,
+        "probe_timeout": 1
+    },
+    # Read timeout in seconds per Ollama API endpoint; "default" covers the rest
+    "endpoint_timeouts": {
+        "default": 30,
+        "/tags": 5,
+        "/ps": 5,
+        "/version": 2,
+        "/show": 10,
+        "/copy": 60,
+        "/delete": 60
+    },
+    # Rolling statistics over the Ollama server log (log_aggregator.py)
+    "server_log": {
+        "path": "/var/log/ollama.log",
+        "window_seconds": 60,
+        "windows": 15,
+        "max_routes": 16,
+        "poll_interval": 1.0
+    },
+    # Managed default_model switch (model_swap.py)
+    "model_swap": {
+        "warm_timeout": 600,
+        "drain_timeout": 60,
+        "probe_interval": 1.0,
+        "observe_seconds": 5
+    }
+}
+
+# Expected type of every known key; nested dicts describe sections
+CONFIG_SCHEMA = {
+    "default_model": str,
+    "available_models": [str],
+    "quick_models": [str],
+    "model_sources": {str: str},
+    "download_settings": {
+        "use_mirror": bool,
+        "mirror_url": str,
+        "timeout": (int, float),
+    },
+    "client_settings": {
+        "connect_timeout": (int, float),
+        "request_timeout": (int, float),
+    },
+    "registry_cache": {
+        "host": str,
+        "port": int,
+        "cache_dir": str,
+        "max_size_gb": (int, float),
+        "manifest_ttl": (int, float),
+        "upstream": str,
+    },
+    "slow_request_log": {
+        "path": str,
+        "threshold_ms": (int, float),
+        "sample_rate": (int, float),
+        "baseline_sample_rate": (int, float),
+    },
+    "token_budget": {
+        "enabled": bool,
+        "num_ctx": int,
+        "reserve_output_tokens": int,
+        "safety_margin": (int, float),
+        "summarize_history": bool,
+        "summary_tokens": int,
+    },
+    "benchmark": {
+        "store": str,
+        "num_predict": int,
+        "target_ttft_ms": (int, float),
+        "min_tokens_per_sec": (int, float),
+        "min_quality": (int, float),
+    },
+    "job_manager": {
+        "db": str,
+        "host": str,
+        "port": int,
+        "workers": int,
+        "poll_interval": (int, float),
+    },
+    "circuit_breaker": {
+        "failure_threshold": int,
+        "reset_timeout": (int, float),
+        "probe_interval": (int, float),
+        "probe_timeout": (int, float),
+    },
+    "endpoint_timeouts": {str: (int, float)},
+    "server_log": {
+        "path": str,
+        "window_seconds": (int, float),
+        "windows": int,
+        "max_routes": int,
+        "poll_interval": (int, float),
+    },
+    "model_swap": {
+        "warm_timeout": (int, float),
+        "drain_timeout": (int, float),
+        "probe_interval": (int, float),
+        "observe_seconds": (int, float),
+    },
+}
+
+
+class ConfigError(ValueError):
+    """Raised when the model configuration does not match the schema"""
+
+
+def _type_name(expected) -> str:
+    if isinstance(expected, tuple):
+        return " or ".join(t.__name__ for t in expected)
+    return expected.__name__
+
+
+def _check(value: Any, expected: Any, key: str):
+    if isinstance(expected, list):
+        if not isinstance(value, list):
+            raise ConfigError(f"'{key}' must be a list")
+        for i, item in enumerate(value):
+            _check(item, expected[0], f"{key}[{i}]")
+    elif isinstance(expected, dict) and str in expected:
+        if not isinstance(value, dict):
+            raise ConfigError(f"'{key}' must be an object")
+        for name, item in value.items():
+            _check(item, expected[str], f"{key}.{name}")
+    elif isinstance(expected, dict):
+        if not isinstance(value, dict):
+            raise ConfigError(f"'{key}' must be an object")
+        for name, item in value.items():
+            if name in expected:
+                _check(item, expected[name], f"{key}.{name}")
+    # bool is a subclass of int, so numeric fields must reject it explicitly
+    elif isinstance(value, bool) and expected is not bool:
+        raise ConfigError(f"'{key}' must be {_type_name(expected)}")
+    elif not isinstance(value, expected):
+        raise ConfigError(f"'{key}' must be {_type_name(expected)}")
+
+
+def _merge(defaults: Dict, overrides: Dict) -> Dict:
+    merged = copy.deepcopy(defaults)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def validate_config(config: Any) -> Dict:
+    """Validate a parsed config and return it merged over the defaults"""
+    if not isinstance(config, dict):
+        raise ConfigError("Configuration must be a JSON object")
+    for key, value in config.items():
+        if key in CONFIG_SCHEMA:
+            _check(value, CONFIG_SCHEMA[key], key)
+
+    merged = _merge(DEFAULT_CONFIG, config)
+    if not merged["default_model"].strip():
+        raise ConfigError("'default_model' must not be empty")
+    for section in ("download_settings", "client_settings", "registry_cache", "token_budget", "benchmark",
+                    "job_manager", "circuit_breaker", "endpoint_timeouts", "server_log", "model_swap"):
+        for name, value in merged[section].items():
+            # Fractions where 0 is meaningful; range-checked below
+            if (section, name) in (("benchmark", "min_quality"), ("token_budget", "safety_margin")):
+                continue
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and value <= 0:
+                raise ConfigError(f"'{section}.{name}' must be positive")
+    slow_log = merged["slow_request_log"]
+    if slow_log["threshold_ms"] <= 0:
+        raise ConfigError("'slow_request_log.threshold_ms' must be positive")
+    for name in ("sample_rate", "baseline_sample_rate"):
+        if not 0 <= slow_log[name] <= 1:
+            raise ConfigError(f"'slow_request_log.{name}' must be between 0 and 1")
+    if not 0 <= merged["token_budget"]["safety_margin"] < 1:
+        raise ConfigError("'token_budget.safety_margin' must be at least 0 and below 1")
+    if not 0 <= merged["benchmark"]["min_quality"] <= 1:
+        raise ConfigError("'benchmark.min_quality' must be between 0 and 1")
+    return merged
+
+
+def load_config_file(path: str) -> Dict:
+    """Read and validate a config file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        try:
+            config = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ConfigError(f"Invalid JSON in {path}: {e}") from e
+    return validate_config(config)
+
+
+def update_config_file(updates: Dict, path: str = MODEL_CONFIG_PATH) -> Dict:
+    """Merge ``updates`` into the config file and replace it atomically
+
+    The result is validated before anything is written; running loaders see
+    the new inode on their next poll.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        config = {}
+    config = _merge(config, updates)
+    merged = validate_config(config)
+
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o644
+    # A unique temp file per writer, so concurrent updates never write into the same one
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=os.path.dirname(path) or ".",
+                                     prefix=f".{os.path.basename(path)}.", delete=False) as f:
+        json.dump(config, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    try:
+        # NamedTemporaryFile creates the file 0600
+        os.chmod(f.name, mode)
+        os.replace(f.name, path)
+    except BaseException:
+        os.unlink(f.name)
+        raise
+    return merged
+
+
+class ConfigLoader:
+    """Caches the validated config and reloads it when the file changes"""
+
+    def __init__(self, path: str = MODEL_CONFIG_PATH, poll_interval: float = POLL_INTERVAL):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.version = 0
+        self._config = None
+        self._signature = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def _stat_signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _load(self, signature):
+        if signature is None:
+            # Default config if file doesn't exist
+            config = copy.deepcopy(DEFAULT_CONFIG)
+        else:
+            try:
+                config = load_config_file(self.path)
+            except (OSError, ConfigError) as e:
+                print(f"Error loading model config {self.path}: {e}")
+                if self._config is not None:
+                    # Keep serving the last good config until the file is fixed
+                    self._signature = signature
+                    return
+                config = copy.deepcopy(DEFAULT_CONFIG)
+        self._config = config
+        self._signature = signature
+        self.version += 1
+
+    def get(self) -> Dict:
+        """Return the current config, reloading it if the file has changed
+
+        The returned dict is shared and must be treated as read-only.
+        """
+        now = time.monotonic()
+        if self._config is not None and now < self._next_check:
+            return self._config
+        with self._lock:
+            if self._config is None or now >= self._next_check:
+                signature = self._stat_signature()
+                if self._config is None or signature != self._signature:
+                    self._load(signature)
+                self._next_check = now + self.poll_interval
+            return self._config
+
+    def reload(self) -> Dict:
+        """Force a reload on the next access and return the fresh config"""
+        with self._lock:
+            self._signature = object()
+            self._next_check = 0.0
+        return self.get()
+
+
+_loader = None
+_loader_lock = threading.Lock()
+
+
+def get_loader() -> ConfigLoader:
+    """Return the process-wide config loader"""
+    global _loader
+    if _loader is None:
+        with _loader_lock:
+            if _loader is None:
+                _loader = ConfigLoader()
+    return _loader
+
+
+def get_config() -> Dict:
+    return get_loader().get()
+
+
+def get_default_model() -> str:
+    return get_config()["default_model"]
+
+
+def get_available_models() -> List[str]:
+    return get_config()["available_models"]
+
+
+def get_quick_models() -> List[str]:
+    return get_config()["quick_models"]
+
+
+def get_download_settings() -> Dict:
+    return get_config()["download_settings"]
+
+
+def get_client_settings() -> Dict:
+    return get_config()["client_settings"]
+
+
+def lookup(config: Dict, key: str) -> Optional[Any]:
+    """Resolve a dotted key such as 'download_settings.timeout'"""
+    value = config
+    for part in key.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Model configuration helper')
+    parser.add_argument('command', choices=['get', 'validate'], help='Command to run')
+    parser.add_argument('key', nargs='?', help="Dotted key for 'get' (e.g. default_model)")
+    parser.add_argument('--path', default=MODEL_CONFIG_PATH, help='Config file path')
+    args = parser.parse_args()
+
+    try:
+        config = load_config_file(args.path)
+    except FileNotFoundError:
+        if args.command == 'validate':
+            print(f"Config file not found: {args.path}")
+            sys.exit(1)
+        config = copy.deepcopy(DEFAULT_CONFIG)
+    except ConfigError as e:
+        print(f"Invalid config: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.command == 'validate':
+        print(f"{args.path} is valid")
+        return
+
+    if not args.key:
+        parser.error("'get' requires a key")
+    value = lookup(config, args.key)
+    if value is None:
+        sys.exit(1)
+    print(value if isinstance(value, str) else json.dumps(value))
+
+
+if __name__ == "__main__":
+    main()
@@ -51,12 +51,57 @@ model_exists() {
     ollama list | grep -q "$model_name"
 }
 
+# Keep the server log under OLLAMA_LOG_MAX_MB (default 50) with one rotated copy.
+# ollama serve keeps its descriptor open, so the log is copied and truncated in place;
+# the server appends, so its next write lands at the new end of the file
+rotate_ollama_log() {
+    local log_file=$1
+    local max_bytes=$(( ${OLLAMA_LOG_MAX_MB:-50} * 1024 * 1024 ))
+    while true; do
+        sleep 60
+        if [ -f "$log_file" ] && [ "$(stat -c %s "$log_file" 2>/dev/null || echo 0)" -gt "$max_bytes" ]; then
+            cp "$log_file" "$log_file.1" && : > "$log_file"
+        fi
+    done
+}
+
+# Start the job manager so pulls run in the background and can be polled
+start_job_manager() {
+    if ! command -v python3 > /dev/null 2>&1 || [ ! -f "/job_manager.py" ]; then
+        return 1
+    fi
+    local port
+    port=$(python3 /config_loader.py get job_manager.port 2>/dev/null || echo 11500)
+    python3 /job_manager.py serve > /var/log/job_manager.log 2>&1 &
+    
+    local attempt=1
+    while [ $attempt -le 10 ]; do
+        if curl -sf "http://127.0.0.1:$port/health" > /dev/null 2>&1; then
+            print_info "Job manager is ready on port $port"
+            return 0
+        fi
+        sleep 1
+        ((attempt++))
+    done
+    print_warn "Job manager did not start, pulling in the foreground"
+    return 1
+}
+
 # Pull a model with progress
 pull_model() {
     local model_name=$1
     print_info "Pulling model: $model_name"
     
-    if ollama pull "$model_name"; then
+    if [ "$JOB_MANAGER" = "1" ]; then
+        # Joins the job queued earlier and polls it until it finishes
+        python3 /job_manager.py pull "$model_name" --wait
+        local status=$?
+    else
+        ollama pull "$model_name"
+        local status=$?
+    fi
+    
+    if [ $status -eq 0 ]; then
         print_info "Successfully pulled model: $model_name"
         return 0
     else
@@ -65,9 +110,10 @@ pull_model() {
     fi
 }
 
-# Start Ollama service in background
+# Start Ollama service in background; the log feeds log_aggregator.py
 print_info "Starting Ollama service..."
-ollama serve > /dev/null 2>&1 &
+ollama serve >> /var/log/ollama.log 2>&1 &
+rotate_ollama_log /var/log/ollama.log &
 
 # Wait for the service to be available
 if ! wait_for_ollama; then
@@ -75,20 +121,39 @@ if ! wait_for_ollama; then
     exit 1
 fi
 
+JOB_MANAGER=0
+if start_job_manager; then
+    JOB_MANAGER=1
+fi
+
 # Define default models to ensure are available
 # Try to read from models config if available, otherwise default to qwen3:0.6b
-if [ -f "/models/model_config.json" ]; then
-    # Extract default model from config using grep and sed
-    DEFAULT_MODEL=$(grep -o '"default_model": *"[^"]*"' /models/model_config.json | sed 's/.*"default_model": *"\(.*\)".*/\1/')
-    if [ -z "$DEFAULT_MODEL" ]; then
-        DEFAULT_MODEL="qwen3:0.6b"
+MODEL_CONFIG="${OLLAMA_MODEL_CONFIG:-/models/model_config.json}"
+DEFAULT_MODEL=""
+if [ -f "$MODEL_CONFIG" ]; then
+    if command -v python3 > /dev/null 2>&1 && [ -f "/config_loader.py" ]; then
+        # Validated lookup through the shared config loader
+        DEFAULT_MODEL=$(python3 /config_loader.py get default_model --path "$MODEL_CONFIG" 2>/dev/null)
+    else
+        # No Python in the image: extract default model using grep and sed
+        DEFAULT_MODEL=$(grep -o '"default_model": *"[^"]*"' "$MODEL_CONFIG" | sed 's/.*"default_model": *"\(.*\)".*/\1/')
     fi
-else
+fi
+if [ -z "$DEFAULT_MODEL" ]; then
     DEFAULT_MODEL="qwen3:0.6b"
 fi
 
 DEFAULT_MODELS=("$DEFAULT_MODEL")
 
+# Queue every missing model first so the job manager can download them concurrently
+if [ "$JOB_MANAGER" = "1" ]; then
+    for model in "${DEFAULT_MODELS[@]}"; do
+        if ! model_exists "$model"; then
+            python3 /job_manager.py pull "$model"
+        fi
+    done
+fi
+
 # Process each default model
 for model in "${DEFAULT_MODELS[@]}"; do
     if model_exists "$model"; then
@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+"""
+Background job manager for model pulls and deletes
+Keeps a persistent SQLite queue of `pull`/`delete` jobs and runs them on a
+small worker pool, so callers enqueue a job and poll its status and
+progress over HTTP instead of blocking on a multi-gigabyte download. Jobs
+interrupted by a restart are picked up again; two jobs for the same model
+never run at once.
+
+Usage: python job_manager.py [serve|pull MODEL|delete MODEL|status [ID]|cancel ID] [--wait]
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+import config_loader
+from model_manager import OllamaModelManager
+from result_types import Job, PullProgress
+
+JOB_KINDS = ("pull", "delete")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    model TEXT NOT NULL,
+    status TEXT NOT NULL,
+    message TEXT NOT NULL DEFAULT '',
+    completed INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+"""
+
+JOB_COLUMNS = ("id, kind, model, status, message, completed, total, error, attempts, "
+               "created_at, started_at, finished_at")
+
+# Progress records arrive many times a second; the database is written at most this often per job
+PROGRESS_INTERVAL = 1.0
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class JobCancelled(Exception):
+    """Raised from the progress callback to abort a running job"""
+
+
+class JobStore:
+    """SQLite-backed job queue"""
+
+    def __init__(self, path: str = None):
+        path = path or config_loader.get_config()["job_manager"]["db"]
+        self.path = os.path.expanduser(path)
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def _fetch(self, where: str = "", params: tuple = ()) -> List[Job]:
+        rows = self._conn.execute(f"SELECT {JOB_COLUMNS} FROM jobs {where}", params).fetchall()
+        return [Job(*row) for row in rows]
+
+    def enqueue(self, kind: str, model: str) -> Tuple[Job, bool]:
+        """Queue a job unless the same one is already queued or running; returns (job, created)"""
+        with self._lock, self._conn:
+            existing = self._fetch("WHERE kind = ? AND model = ? AND status IN ('queued', 'running') "
+                                   "ORDER BY id LIMIT 1", (kind, model))
+            if existing:
+                return existing[0], False
+            cursor = self._conn.execute("INSERT INTO jobs (kind, model, status, created_at) "
+                                        "VALUES (?, ?, 'queued', ?)", (kind, model, _now()))
+            return self._fetch("WHERE id = ?", (cursor.lastrowid,))[0], True
+
+    def claim(self) -> Optional[Job]:
+        """Mark the oldest runnable job as running; jobs for a model that is busy wait their turn"""
+        with self._lock, self._conn:
+            jobs = self._fetch("WHERE status = 'queued' AND model NOT IN "
+                               "(SELECT model FROM jobs WHERE status = 'running') ORDER BY id LIMIT 1")
+            if not jobs:
+                return None
+            self._conn.execute("UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1, "
+                               "message = '', error = NULL WHERE id = ?", (_now(), jobs[0].id))
+            return self._fetch("WHERE id = ?", (jobs[0].id,))[0]
+
+    def update_progress(self, job_id: int, message: str, completed: int, total: int):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET message = ?, completed = ?, total = ? "
+                               "WHERE id = ? AND status = 'running'", (message, completed, total, job_id))
+
+    def finish(self, job_id: int, status: str, error: Optional[str] = None):
+        with self._lock, self._conn:
+            # Progress writes are throttled, so the last one may be stale
+            self._conn.execute("UPDATE jobs SET status = ?, error = ?, finished_at = ?, completed = "
+                               "CASE WHEN ? = 'succeeded' THEN total ELSE completed END WHERE id = ?",
+                               (status, error, _now(), status, job_id))
+
+    def cancel_queued(self, job_id: int) -> bool:
+        """Cancel a job that has not started; returns False if it is not queued"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute("UPDATE jobs SET status = 'cancelled', finished_at = ? "
+                                        "WHERE id = ? AND status = 'queued'", (_now(), job_id))
+            return cursor.rowcount > 0
+
+    def requeue_interrupted(self) -> int:
+        """Put jobs left running by a previous process back on the queue"""
+        with self._lock, self._conn:
+            return self._conn.execute("UPDATE jobs SET status = 'queued', message = 'requeued after restart' "
+                                      "WHERE status = 'running'").rowcount
+
+    def get(self, job_id: int) -> Optional[Job]:
+        with self._lock:
+            jobs = self._fetch("WHERE id = ?", (job_id,))
+        return jobs[0] if jobs else None
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Job]:
+        """Most recent jobs first"""
+        with self._lock:
+            if status:
+                return self._fetch("WHERE status = ? ORDER BY id DESC LIMIT ?", (status, limit))
+            return self._fetch("ORDER BY id DESC LIMIT ?", (limit,))
+
+    def close(self):
+        self._conn.close()
+
+
+class JobManager:
+    """Worker pool draining a JobStore"""
+
+    def __init__(self, store: JobStore, workers: int = 2, poll_interval: float = 1.0,
+                 manager_factory: Callable[[], OllamaModelManager] = OllamaModelManager):
+        self.store = store
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._manager_factory = manager_factory
+        self._wakeup = threading.Condition()
+        self._cancelled = set()
+        self._stopping = False
+        self._threads = []
+
+    def start(self):
+        requeued = self.store.requeue_interrupted()
+        if requeued:
+            print(f"Requeued {requeued} interrupted job(s)")
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = None):
+        """Stop taking new jobs and wait for the workers
+
+        Running pulls stop at their next progress record and stay marked as
+        running, so the next start requeues them. Deletes finish first.
+        """
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, kind: str, model: str) -> Tuple[Job, bool]:
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if not model:
+            raise ValueError("A model name is required")
+        job, created = self.store.enqueue(kind, model)
+        if created:
+            with self._wakeup:
+                self._wakeup.notify()
+        return job, created
+
+    def cancel(self, job_id: int) -> Optional[Job]:
+        """Cancel a queued job now, or a running one at its next progress record"""
+        job = self.store.get(job_id)
+        if job is None or job.done:
+            return job
+        if not self.store.cancel_queued(job_id):
+            with self._wakeup:
+                self._cancelled.add(job_id)
+        return self.store.get(job_id)
+
+    def _work(self):
+        while True:
+            with self._wakeup:
+                if self._stopping:
+                    return
+                job = self.store.claim()
+                if job is None:
+                    # The timeout also catches jobs unblocked by another model finishing
+                    self._wakeup.wait(self.poll_interval)
+                    continue
+            self._run(job)
+            with self._wakeup:
+                self._cancelled.discard(job.id)
+                # A finished job may unblock a queued one for the same model
+                self._wakeup.notify_all()
+
+    def _run(self, job: Job):
+        print(f"Job #{job.id}: {job.kind} {job.model}")
+        manager = self._manager_factory()
+        last_write = 0.0
+
+        def on_progress(progress: PullProgress):
+            nonlocal last_write
+            if job.id in self._cancelled or self._stopping:
+                raise JobCancelled()
+            now = time.monotonic()
+            if now - last_write >= PROGRESS_INTERVAL:
+                last_write = now
+                self.store.update_progress(job.id, progress.status, progress.completed, progress.total)
+
+        try:
+            if job.kind == "pull":
+                success = manager.pull_model(job.model, on_progress=on_progress)
+            else:
+                success = manager.delete_model(job.model)
+        except JobCancelled:
+            if job.id not in self._cancelled:
+                print(f"Job #{job.id} interrupted, requeued on the next start")
+                return
+            print(f"Job #{job.id} cancelled")
+            self.store.finish(job.id, "cancelled")
+            return
+        except Exception as e:
+            print(f"Job #{job.id} failed: {e}")
+            self.store.finish(job.id, "failed", str(e))
+            return
+
+        if success:
+            self.store.finish(job.id, "succeeded")
+        else:
+            self.store.finish(job.id, "failed", f"{job.kind} of {job.model} failed")
+        print(f"Job #{job.id} {'succeeded' if success else 'failed'}")
+
+
+class JobHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    jobs = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status: int = 200):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _job_id(self, path: str) -> Optional[int]:
+        match = re.fullmatch(r"/jobs/(\d+)", path)
+        return int(match.group(1)) if match else None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/health":
+            self._send_json({"status": "ok", "workers": self.jobs.workers})
+        elif url.path == "/jobs":
+            query = parse_qs(url.query)
+            status = query.get("status", [None])[0]
+            try:
+                limit = int(query.get("limit", ["50"])[0])
+            except ValueError:
+                self._send_json({"error": "limit must be an integer"}, 400)
+                return
+            self._send_json({"jobs": [job.to_dict() for job in self.jobs.store.list(status, limit)]})
+        elif self._job_id(url.path) is not None:
+            job = self.jobs.store.get(self._job_id(url.path))
+            if job is None:
+                self._send_json({"error": "job not found"}, 404)
+            else:
+                self._send_json(job.to_dict())
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/jobs":
+            self._send_json({"error": "not found"}, 404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            job, created = self.jobs.submit(payload.get("kind"), payload.get("model"))
+        except (ValueError, AttributeError) as e:
+            self._send_json({"error": str(e)}, 400)
+            return
+        self._send_json(dict(job.to_dict(), created=created), 202 if created else 200)
+
+    def do_DELETE(self):
+        job_id = self._job_id(urlparse(self.path).path)
+        job = self.jobs.cancel(job_id) if job_id is not None else None
+        if job is None:
+            self._send_json({"error": "job not found"}, 404)
+        elif job.done and job.status != "cancelled":
+            self._send_json(dict(job.to_dict(), error=f"job already {job.status}"), 409)
+        else:
+            self._send_json(job.to_dict())
+
+
+def create_server(jobs: JobManager, host: str = "127.0.0.1", port: int = 11500) -> ThreadingHTTPServer:
+    handler = type("BoundJobHandler", (JobHandler,), {"jobs": jobs})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def default_url() -> str:
+    settings = config_loader.get_config()["job_manager"]
+    # A server listening on all interfaces is reached through loopback
+    host = "127.0.0.1" if settings["host"] in ("0.0.0.0", "") else settings["host"]
+    return os.getenv("JOB_MANAGER_URL", f"http://{host}:{settings['port']}")
+
+
+class JobClient:
+    """Client for the job manager HTTP API"""
+
+    def __init__(self, base_url: str = None):
+        self.base_url = (base_url or default_url()).rstrip("/")
+
+    def _request(self, method: str, path: str, payload: dict = None, timeout: float = 10) -> Optional[dict]:
+        try:
+            response = requests.request(method, f"{self.base_url}{path}", json=payload, timeout=timeout)
+            if response.status_code == 404:
+                return None
+            if response.status_code >= 400:
+                print(f"Job manager error: {response.json().get('error', response.status_code)}")
+                return None
+            return response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"Error contacting job manager at {self.base_url}: {e}")
+            return None
+
+    def available(self) -> bool:
+        try:
+            return requests.get(f"{self.base_url}/health", timeout=2).status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    def enqueue(self, kind: str, model: str) -> Optional[Job]:
+        result = self._request("POST", "/jobs", {"kind": kind, "model": model})
+        return Job.from_payload(result) if result else None
+
+    def get(self, job_id: int) -> Optional[Job]:
+        result = self._request("GET", f"/jobs/{job_id}")
+        return Job.from_payload(result) if result else None
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Job]:
+        query = f"?limit={limit}" + (f"&status={status}" if status else "")
+        result = self._request("GET", f"/jobs{query}")
+        return [Job.from_payload(job) for job in result["jobs"]] if result else []
+
+    def cancel(self, job_id: int) -> Optional[Job]:
+        result = self._request("DELETE", f"/jobs/{job_id}")
+        return Job.from_payload(result) if result else None
+
+    def wait(self, job_id: int, on_update: Callable[[Job], None] = None,
+             interval: float = None) -> Optional[Job]:
+        """Poll a job until it finishes; ``on_update`` sees every change"""
+        interval = interval or config_loader.get_config()["job_manager"]["poll_interval"]
+        last = None
+        while True:
+            job = self.get(job_id)
+            if job is None:
+                return None
+            if job != last and on_update is not None:
+                on_update(job)
+            if job.done:
+                return job
+            last = job
+            time.sleep(interval)
+
+
+def format_job(job: Job) -> str:
+    line = f"#{job.id:<5d} {job.kind:<6s} {job.model:<20s} {job.status:<9s}"
+    if job.total:
+        line += f" {job.percent:5.1f}%"
+    if job.message and not job.done:
+        line += f"  {job.message}"
+    if job.error:
+        line += f"  {job.error}"
+    return line
+
+
+def serve(args):
+    settings = config_loader.get_config()["job_manager"]
+    store = JobStore(args.db)
+    jobs = JobManager(store, args.workers, settings["poll_interval"])
+    server = create_server(jobs, args.host, args.port)
+    jobs.start()
+    print(f"Job manager listening on http://{args.host}:{args.port} with {args.workers} worker(s)")
+    print(f"Queue: {store.path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping job manager")
+    finally:
+        server.server_close()
+        # Running jobs are requeued on the next start
+        jobs.stop()
+        store.close()
+
+
+def main():
+    settings = config_loader.get_config()["job_manager"]
+    parser = argparse.ArgumentParser(description='Background job manager for model pulls and deletes')
+    parser.add_argument('command', choices=['serve', 'pull', 'delete', 'status', 'cancel'])
+    parser.add_argument('target', nargs='?', help='Model name, or job ID for status/cancel')
+    parser.add_argument('--wait', action='store_true', help='Poll until the job finishes')
+    parser.add_argument('--url', help='Job manager URL (default: from config)')
+    parser.add_argument('--db', default=settings["db"], help='Queue database (serve)')
+    parser.add_argument('--host', default=settings["host"], help='Listen address (serve)')
+    parser.add_argument('--port', type=int, default=settings["port"], help='Listen port (serve)')
+    parser.add_argument('--workers', type=int, default=settings["workers"], help='Worker threads (serve)')
+    args = parser.parse_args(sys.argv[1:])
+
+    if args.command == 'serve':
+        serve(args)
+        return
+
+    client = JobClient(args.url)
+    if args.command == 'status' and args.target is None:
+        for job in client.list():
+            print(format_job(job))
+        return
+    if args.target is None:
+        parser.error(f"{args.command} needs a {'model name' if args.command in JOB_KINDS else 'job ID'}")
+
+    if args.command in JOB_KINDS:
+        job = client.enqueue(args.command, args.target)
+    elif not args.target.isdigit():
+        parser.error("job ID must be a number")
+    elif args.command == 'cancel':
+        job = client.cancel(int(args.target))
+    else:
+        job = client.get(int(args.target))
+    if job is None:
+        print({'status': f"No such job: {args.target}", 'cancel': f"Could not cancel job {args.target}"}
+              .get(args.command, "Failed to queue job"))
+        sys.exit(1)
+
+    if not args.wait:
+        print(format_job(job))
+        return
+    try:
+        job = client.wait(job.id, on_update=lambda update: print(format_job(update)))
+    except KeyboardInterrupt:
+        print(f"\nStopped waiting; job #{job.id} keeps running in the background")
+        sys.exit(130)
+    sys.exit(0 if job is not None and job.status == "succeeded" else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Fixed-memory latency histogram
+Log-linear buckets in the style of HdrHistogram: values below 128 are exact
+and larger values are recorded with a relative error below 1/64, in a
+bucket array whose size never grows with the number of samples.
+"""
+
+import math
+from itertools import accumulate
+from typing import Iterator, List, Tuple
+
+SUB_BUCKET_BITS = 7
+_SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+_HALF = _SUB_BUCKETS >> 1
+
+# Highest power of two tracked; larger values land in the last bucket
+MAX_VALUE_BITS = 42
+
+
+def _index(value: int) -> int:
+    if value < _SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return _SUB_BUCKETS + (shift - 1) * _HALF + (value >> shift) - _HALF
+
+
+def _highest_equivalent(index: int) -> int:
+    if index < _SUB_BUCKETS:
+        return index
+    shift = (index - _SUB_BUCKETS) // _HALF + 1
+    sub = (index - _SUB_BUCKETS) % _HALF + _HALF
+    return ((sub + 1) << shift) - 1
+
+
+_BUCKETS = _index((1 << MAX_VALUE_BITS) - 1) + 1
+
+
+class LatencyHistogram:
+    """Records non-negative integer values (e.g. microseconds)"""
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * _BUCKETS
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def record(self, value: int, count: int = 1):
+        value = max(int(value), 0)
+        self.counts[min(_index(value), _BUCKETS - 1)] += count
+        if not self.count or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += count
+        self.total += value * count
+
+    def merge(self, other: 'LatencyHistogram'):
+        if not other.count:
+            return
+        counts = self.counts
+        for i, n in enumerate(other.counts):
+            if n:
+                counts[i] += n
+        if not self.count or other.min < self.min:
+            self.min = other.min
+        self.max = max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+
+    def reset(self):
+        self.counts = [0] * _BUCKETS
+        self.count = self.total = self.min = self.max = 0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percentile: float) -> int:
+        """Highest value equivalent to the given percentile (0-100)"""
+        if not self.count:
+            return 0
+        target = max(1, -(-self.count * percentile // 100))
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return min(_highest_equivalent(i), self.max)
+        return self.max
+
+    def percentiles(self, percentiles=(50, 90, 95, 99, 99.9)) -> List[Tuple[float, int]]:
+        return [(p, self.percentile(p)) for p in percentiles]
+
+    def iter_distribution(self, ticks_per_half: int = 5) -> Iterator[Tuple[int, float, int]]:
+        """Yield (value, percentile, cumulative count) rows like HdrHistogram's
+        percentile output: the step halves each time the remaining distance
+        to 100% halves"""
+        if not self.count:
+            return
+        cumulative = list(accumulate(self.counts))
+        percentile = 0.0
+        while percentile < 100.0:
+            value = self.percentile(percentile)
+            seen = cumulative[min(_index(value), _BUCKETS - 1)]
+            if seen >= self.count:
+                break
+            yield value, percentile, seen
+            half_distance = 2 ** (int(math.log2(100.0 / (100.0 - percentile))) + 1)
+            percentile += 100.0 / (ticks_per_half * half_distance)
+        yield self.max, 100.0, self.count
+
+    def write_hgrm(self, path: str, unit_divisor: float = 1000.0):
+        """Write the percentile distribution in HdrHistogram's .hgrm text format"""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"{'Value':>12} {'Percentile':>14} {'TotalCount':>10} {'1/(1-Percentile)':>14}\n\n")
+            for value, percentile, seen in self.iter_distribution():
+                fraction = percentile / 100.0
+                inverse = f"{1 / (1 - fraction):14.2f}" if fraction < 1 else f"{'inf':>14}"
+                f.write(f"{value / unit_divisor:12.3f} {fraction:14.12f} {seen:10d} {inverse}\n")
+            f.write(f"#[Mean    = {self.mean / unit_divisor:12.3f}, Max     = {self.max / unit_divisor:12.3f}]\n")
+            f.write(f"#[Min     = {self.min / unit_divisor:12.3f}, Count   = {self.count:12d}]\n")
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Open-loop load generator for Ollama
+Replays a prompt corpus against a real host or the bundled stub server with
+Poisson or trace-driven arrivals. Requests are started on schedule whether
+or not earlier ones have finished, so queueing shows up as latency instead
+of silently lowering the offered rate.
+
+Reports TTFT, end-to-end latency, output tokens/sec and errors per time
+window (CSV) plus HdrHistogram-style percentile distributions for the run.
+
+Usage: python loadtest.py (--host URL | --stub) [--rate R --duration S | --trace FILE]
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from chat_with_default_model import AsyncOllamaChatClient, build_chat_payload, build_generate_payload
+from latency_histogram import LatencyHistogram
+
+DEFAULT_PROMPTS = [
+    "Hello, how are you? Please keep your response short.",
+    "Summarize the benefits of unit testing in three sentences.",
+    "Write a haiku about distributed systems.",
+    "Explain the difference between a process and a thread.",
+    "你好，请简单介绍一下你自己。",
+    "List five common HTTP status codes and what they mean.",
+]
+
+
+@dataclass(slots=True)
+class RequestSample:
+    """Outcome of one request; times are seconds relative to the run start"""
+    scheduled: float
+    started: float
+    finished: float
+    ttft: Optional[float] = None
+    tokens: int = 0
+    decode_seconds: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def latency(self) -> float:
+        return self.finished - self.started
+
+    @property
+    def tokens_per_sec(self) -> float:
+        return self.tokens / self.decode_seconds if self.decode_seconds > 0 else 0.0
+
+
+def load_prompts(path: Optional[str]) -> List[str]:
+    """Read a prompt corpus: JSONL with a "prompt" field, or one prompt per line"""
+    if not path:
+        return list(DEFAULT_PROMPTS)
+    prompts = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                prompts.append(json.loads(line)["prompt"])
+            else:
+                prompts.append(line)
+    if not prompts:
+        raise ValueError(f"No prompts found in {path}")
+    return prompts
+
+
+def poisson_arrivals(rate: float, duration: float, rng: random.Random) -> Iterator[float]:
+    """Arrival offsets of a Poisson process with the given mean rate (req/s)"""
+    offset = rng.expovariate(rate)
+    while offset < duration:
+        yield offset
+        offset += rng.expovariate(rate)
+
+
+def load_trace(path: str, speedup: float = 1.0) -> List[Tuple[float, Optional[str]]]:
+    """Read arrivals from a CSV (timestamp[,prompt]) or JSONL trace
+
+    Timestamps are seconds (absolute or relative); the first arrival is
+    moved to zero and the trace is compressed by ``speedup``.
+    """
+    arrivals = []
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.endswith('.jsonl'):
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    arrivals.append((float(entry["timestamp"]), entry.get("prompt")))
+        else:
+            for row in csv.reader(f):
+                if not row or row[0].strip().lower() == "timestamp":
+                    continue
+                arrivals.append((float(row[0]), row[1] if len(row) > 1 and row[1] else None))
+    arrivals.sort(key=lambda item: item[0])
+    if not arrivals:
+        return []
+    first = arrivals[0][0]
+    return [((ts - first) / speedup, prompt) for ts, prompt in arrivals]
+
+
+def _percentile(sorted_values: List[float], percentile: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(percentile / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class LoadTestReport:
+    """Aggregates samples into time windows and run-wide histograms"""
+
+    def __init__(self, window: float):
+        self.window = window
+        self.arrivals: Dict[int, int] = {}
+        self.samples: Dict[int, List[RequestSample]] = {}
+        self.ttft = LatencyHistogram()
+        self.latency = LatencyHistogram()
+        self.tokens_per_sec = LatencyHistogram()
+        self.completed = 0
+        self.errors = 0
+        self.dropped = 0
+        self.output_tokens = 0
+        self.end = 0.0
+
+    def arrival(self, offset: float):
+        index = int(offset // self.window)
+        self.arrivals[index] = self.arrivals.get(index, 0) + 1
+
+    def add(self, sample: RequestSample):
+        index = int(sample.finished // self.window)
+        self.samples.setdefault(index, []).append(sample)
+        self.end = max(self.end, sample.finished)
+        if sample.error:
+            self.errors += 1
+            return
+        self.completed += 1
+        self.output_tokens += sample.tokens
+        self.latency.record(sample.latency * 1e6)
+        if sample.ttft is not None:
+            self.ttft.record(sample.ttft * 1e6)
+        if sample.tokens_per_sec:
+            # Stored in milli-tokens/sec to keep precision in an integer histogram
+            self.tokens_per_sec.record(sample.tokens_per_sec * 1000)
+
+    def window_rows(self) -> Iterable[Dict]:
+        last = max(list(self.arrivals) + list(self.samples) + [0])
+        for index in range(last + 1):
+            samples = self.samples.get(index, [])
+            ok = [s for s in samples if not s.error]
+            ttfts = sorted(s.ttft for s in ok if s.ttft is not None)
+            latencies = sorted(s.latency for s in ok)
+            errors = len(samples) - len(ok)
+            yield {
+                "window_start_s": round(index * self.window, 3),
+                "arrivals": self.arrivals.get(index, 0),
+                "completed": len(ok),
+                "errors": errors,
+                "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+                "throughput_rps": round(len(ok) / self.window, 3),
+                "ttft_p50_ms": round(_percentile(ttfts, 50) * 1000, 2),
+                "ttft_p99_ms": round(_percentile(ttfts, 99) * 1000, 2),
+                "latency_p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+                "latency_p95_ms": round(_percentile(latencies, 95) * 1000, 2),
+                "latency_p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+                "output_tokens_per_sec": round(sum(s.tokens for s in ok) / self.window, 2),
+            }
+
+    def error_counts(self) -> Dict[str, int]:
+        counts = {}
+        for samples in self.samples.values():
+            for sample in samples:
+                if sample.error:
+                    counts[sample.error] = counts.get(sample.error, 0) + 1
+        return counts
+
+    def summary(self) -> Dict:
+        total = self.completed + self.errors
+        duration = self.end or 1.0
+
+        def ms(histogram):
+            return {f"p{p:g}": round(v / 1000, 2) for p, v in histogram.percentiles()} | {
+                "mean": round(histogram.mean / 1000, 2), "max": round(histogram.max / 1000, 2)}
+
+        return {
+            "requests": total + self.dropped,
+            "completed": self.completed,
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "error_rate": round((self.errors + self.dropped) / (total + self.dropped), 4) if total + self.dropped else 0.0,
+            "duration_s": round(duration, 2),
+            "throughput_rps": round(self.completed / duration, 3),
+            "output_tokens_per_sec": round(self.output_tokens / duration, 2),
+            "ttft_ms": ms(self.ttft),
+            "latency_ms": ms(self.latency),
+            "per_request_tokens_per_sec": {f"p{p:g}": round(v / 1000, 2)
+                                           for p, v in self.tokens_per_sec.percentiles((50, 10, 1))},
+            "error_counts": self.error_counts(),
+        }
+
+    def write(self, output_dir: str):
+        os.makedirs(output_dir, exist_ok=True)
+        with open(os.path.join(output_dir, "timeseries.csv"), 'w', encoding='utf-8', newline='') as f:
+            writer = None
+            for row in self.window_rows():
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=list(row))
+                    writer.writeheader()
+                writer.writerow(row)
+        self.ttft.write_hgrm(os.path.join(output_dir, "ttft.hgrm"))
+        self.latency.write_hgrm(os.path.join(output_dir, "latency.hgrm"))
+        with open(os.path.join(output_dir, "summary.json"), 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, indent=2, ensure_ascii=False)
+
+
+async def run_request(client: AsyncOllamaChatClient, endpoint: str, payload: Dict,
+                      scheduled: float, t0: float) -> RequestSample:
+    started = time.perf_counter() - t0
+    sample = RequestSample(scheduled=scheduled, started=started, finished=started)
+    first_token = None
+    final = None
+    try:
+        # Trace payloads are replayed as recorded, without fitting
+        async for record in client.stream_payload(endpoint, payload, fit=False):
+            if "error" in record:
+                raise RuntimeError(record["error"])
+            content = record.get("response") or (record.get("message") or {}).get("content")
+            if content:
+                sample.tokens += 1
+                if first_token is None:
+                    first_token = time.perf_counter() - t0
+            if record.get("done"):
+                final = record
+    except Exception as e:
+        sample.error = type(e).__name__ if not isinstance(e, RuntimeError) else str(e)[:80]
+    sample.finished = time.perf_counter() - t0
+    if sample.error is None:
+        if first_token is not None:
+            sample.ttft = first_token - started
+        if final and final.get("eval_count") and final.get("eval_duration"):
+            # Prefer the server's own decode accounting when it is available
+            sample.tokens = final["eval_count"]
+            sample.decode_seconds = final["eval_duration"] / 1e9
+        elif first_token is not None:
+            sample.decode_seconds = sample.finished - first_token
+    return sample
+
+
+async def run_load(base_url: str, arrivals: Iterable[Tuple[float, Optional[str]]], prompts: List[str],
+                   endpoint: str, model: Optional[str], max_inflight: int, window: float,
+                   num_predict: Optional[int] = None, progress: bool = True) -> LoadTestReport:
+    import httpx
+    report = LoadTestReport(window)
+    limits = httpx.Limits(max_connections=max_inflight, max_keepalive_connections=max_inflight)
+    http = httpx.AsyncClient(timeout=None, limits=limits)
+    client = AsyncOllamaChatClient(model, client=http)
+    client.api_base = f"{base_url.rstrip('/')}/api"
+    inflight = set()
+    last_window = 0
+    prompt_cycle = 0
+
+    def done(task):
+        inflight.discard(task)
+        report.add(task.result())
+
+    t0 = time.perf_counter()
+    try:
+        for offset, prompt in arrivals:
+            delay = offset - (time.perf_counter() - t0)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            report.arrival(offset)
+            if len(inflight) >= max_inflight:
+                report.dropped += 1
+                continue
+            if prompt is None:
+                prompt = prompts[prompt_cycle % len(prompts)]
+                prompt_cycle += 1
+            if endpoint == "/chat":
+                payload = build_chat_payload(client.model_name, prompt, stream=True)
+            else:
+                payload = build_generate_payload(client.model_name, prompt, stream=True)
+            if num_predict:
+                payload["options"] = {"num_predict": num_predict}
+            task = asyncio.create_task(run_request(client, endpoint, payload, offset, t0))
+            task.add_done_callback(done)
+            inflight.add(task)
+
+            current_window = int(offset // window)
+            if progress and current_window > last_window:
+                _print_window(report, last_window, len(inflight))
+                last_window = current_window
+        if inflight:
+            await asyncio.gather(*list(inflight))
+    finally:
+        await http.aclose()
+    return report
+
+
+def _print_window(report: LoadTestReport, index: int, inflight: int):
+    samples = report.samples.get(index, [])
+    ok = sorted(s.latency for s in samples if not s.error)
+    errors = len(samples) - len(ok)
+    print(f"[{index * report.window:7.1f}s] arrivals {report.arrivals.get(index, 0):5d}  "
+          f"done {len(ok):5d}  errors {errors:4d}  inflight {inflight:4d}  "
+          f"p50 {_percentile(ok, 50) * 1000:8.1f} ms  p99 {_percentile(ok, 99) * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Open-loop load generator for Ollama')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--host', default=os.getenv('OLLAMA_HOST', 'http://localhost:11434'),
+                        help='Ollama host to test')
+    target.add_argument('--stub', action='store_true', help='Run against the bundled stub server')
+    parser.add_argument('--model', help='Model to use (default: default_model from config)')
+    parser.add_argument('--endpoint', choices=['generate', 'chat'], default='generate', help='API to exercise')
+    parser.add_argument('--rate', type=float, default=2.0, help='Mean arrival rate (req/s) for Poisson arrivals')
+    parser.add_argument('--duration', type=float, default=60.0, help='Test duration in seconds')
+    parser.add_argument('--trace', help='Replay arrivals from a CSV/JSONL trace instead of Poisson')
+    parser.add_argument('--speedup', type=float, default=1.0, help='Compress trace time by this factor')
+    parser.add_argument('--prompts', help='Prompt corpus (JSONL with "prompt" or one prompt per line)')
+    parser.add_argument('--num-predict', type=int, help='Cap output tokens per request')
+    parser.add_argument('--max-inflight', type=int, default=512,
+                        help='Arrivals beyond this many outstanding requests are dropped and counted')
+    parser.add_argument('--window', type=float, default=5.0, help='Time series window in seconds')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for arrivals')
+    parser.add_argument('--output-dir', default=os.path.join('loadtest_results', time.strftime('%Y%m%d-%H%M%S')),
+                        help='Where to write timeseries.csv, *.hgrm and summary.json')
+    from stub_server import add_behavior_arguments, behavior_from_args, start_stub_server
+    add_behavior_arguments(parser)
+    args = parser.parse_args(sys.argv[1:])
+
+    prompts = load_prompts(args.prompts)
+    if args.trace:
+        arrivals = load_trace(args.trace, args.speedup)
+        mode = f"trace {args.trace} ({len(arrivals)} arrivals, speedup {args.speedup:g}x)"
+    else:
+        arrivals = ((offset, None) for offset in poisson_arrivals(args.rate, args.duration, random.Random(args.seed)))
+        mode = f"Poisson {args.rate:g} req/s for {args.duration:g}s"
+
+    server = None
+    base_url = args.host
+    if args.stub:
+        server, base_url = start_stub_server(behavior_from_args(args))
+
+    print(f"Load test against {base_url}{' (stub)' if args.stub else ''}: {mode}")
+    print("=" * 100)
+    try:
+        report = asyncio.run(run_load(base_url, arrivals, prompts, f"/{args.endpoint}", args.model,
+                                      args.max_inflight, args.window, args.num_predict))
+    except KeyboardInterrupt:
+        print("\nLoad test interrupted")
+        sys.exit(1)
+    finally:
+        if server:
+            server.shutdown()
+
+    report.write(args.output_dir)
+    summary = report.summary()
+    print("=" * 100)
+    print(f"Requests: {summary['requests']}  completed: {summary['completed']}  errors: {summary['errors']}  "
+          f"dropped: {summary['dropped']}  error rate: {summary['error_rate'] * 100:.2f}%")
+    print(f"Throughput: {summary['throughput_rps']} req/s, {summary['output_tokens_per_sec']} output tokens/s")
+    print(f"TTFT (ms):    {summary['ttft_ms']}")
+    print(f"Latency (ms): {summary['latency_ms']}")
+    print(f"Results written to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
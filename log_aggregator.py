@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Ollama server log aggregator
+Follows the `ollama serve` log incrementally and keeps rolling statistics
+of the request lines (GIN access log), model loads and errors. Reading
+resumes from the last offset on every poll, and a rotated (new inode) or
+truncated log is detected and read from the start. Statistics live in a
+fixed ring of time windows holding fixed-size latency histograms and
+bounded counters, so memory does not grow with uptime or traffic.
+
+Usage: python log_aggregator.py [LOG] [--follow] [--minutes N] [--json]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+import config_loader
+from latency_histogram import LatencyHistogram
+
+# [GIN] 2025/01/10 - 08:00:00 | 200 |  1.234567s |  127.0.0.1 | POST  "/api/chat"
+GIN_LINE = re.compile(r'\[GIN\] (\d{4}/\d{2}/\d{2} - \d{2}:\d{2}:\d{2}) \|\s*(\d{3})\s*\|\s*([^|]+?)\s*\|'
+                      r'\s*([^|]*?)\s*\|\s*(\w+)\s+"([^"]*)"')
+# time=2025-01-10T08:00:00.000Z level=INFO source=server.go:619 msg="llama runner started in 2.51 seconds"
+SLOG_LINE = re.compile(r'time=(\S+) level=(\w+) source=\S+ msg=("(?:[^"\\]|\\.)*"|\S+)')
+SLOG_ERROR = re.compile(r'\berror=("(?:[^"\\]|\\.)*"|\S+)')
+RUNNER_STARTED = re.compile(r'llama runner started in ([\d.]+) seconds')
+GO_DURATION = re.compile(r'([\d.]+)(h|ms|µs|us|ns|m|s)')
+_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 1e-3, "µs": 1e-6, "us": 1e-6, "ns": 1e-9}
+
+# Longest line kept; longer ones (e.g. a dumped prompt) are skipped
+MAX_LINE_BYTES = 64 * 1024
+# Distinct error messages kept per window
+MAX_ERROR_MESSAGES = 20
+
+
+@dataclass(slots=True)
+class LogEvent:
+    """One parsed log line: a request, a model load or an error"""
+    kind: str
+    ts: float
+    seconds: float = 0.0
+    status: int = 0
+    method: str = ""
+    path: str = ""
+    message: str = ""
+
+
+def parse_duration(text: str) -> Optional[float]:
+    """Seconds in a Go duration string such as "1m2.5s", "12.3ms" or "850µs\""""
+    parts = GO_DURATION.findall(text.strip())
+    if not parts or "".join(value + unit for value, unit in parts) != text.strip():
+        return None
+    return sum(float(value) * _UNITS[unit] for value, unit in parts)
+
+
+def _unquote(value: str) -> str:
+    """Value of a slog attribute, which is quoted when it contains spaces"""
+    if not value.startswith('"'):
+        return value
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value.strip('"')
+
+
+def parse_line(line: str) -> Optional[LogEvent]:
+    """LogEvent for a request, load or error line; None for anything else"""
+    if "[GIN]" in line:
+        match = GIN_LINE.search(line)
+        if not match:
+            return None
+        seconds = parse_duration(match.group(3))
+        if seconds is None:
+            return None
+        ts = time.mktime(time.strptime(match.group(1), "%Y/%m/%d - %H:%M:%S"))
+        return LogEvent("request", ts, seconds, int(match.group(2)), match.group(5), match.group(6).split("?")[0])
+    match = SLOG_LINE.search(line)
+    if not match:
+        return None
+    try:
+        ts = datetime.fromisoformat(match.group(1)).timestamp()
+    except ValueError:
+        ts = time.time()
+    message = _unquote(match.group(3))
+    level = match.group(2).upper()
+    if level == "ERROR":
+        # The msg is generic ("error loading llama server"); the cause is in the error attribute
+        error = SLOG_ERROR.search(line, match.end())
+        if error:
+            message = f"{message}: {_unquote(error.group(1))}"
+        return LogEvent("error", ts, message=message)
+    started = RUNNER_STARTED.search(message)
+    if started:
+        return LogEvent("load", ts, float(started.group(1)))
+    return None
+
+
+class LogTailer:
+    """Reads lines appended to a file since the previous poll, across rotation and truncation"""
+
+    def __init__(self, path: str, from_start: bool = False):
+        self.path = path
+        self._file = None
+        self._inode = None
+        self._partial = b""
+        self._skipping = False
+        self.rotations = 0
+        self._open(from_start)
+
+    def _open(self, from_start: bool) -> bool:
+        try:
+            f = open(self.path, "rb")
+        except OSError:
+            return False
+        stat = os.fstat(f.fileno())
+        if not from_start:
+            f.seek(stat.st_size)
+        self._file, self._inode = f, (stat.st_dev, stat.st_ino)
+        self._partial = b""
+        self._skipping = False
+        return True
+
+    def _read(self) -> Iterator[str]:
+        while True:
+            data = self._file.read(1 << 16)
+            if not data:
+                return
+            lines = (self._partial + data).split(b"\n")
+            self._partial = lines.pop()
+            for line in lines:
+                if self._skipping:
+                    # Tail end of an overlong line
+                    self._skipping = False
+                    continue
+                yield line.decode("utf-8", "replace")
+            if len(self._partial) > MAX_LINE_BYTES:
+                self._partial = b""
+                self._skipping = True
+
+    def poll(self) -> Iterator[str]:
+        """Complete lines written since the last poll"""
+        if self._file is None:
+            if not self._open(True):
+                return
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            stat = None
+        current = os.fstat(self._file.fileno())
+        if stat is not None and current.st_size < self._file.tell():
+            # Truncated in place (copytruncate)
+            self._file.seek(0)
+            self._partial = b""
+        yield from self._read()
+        if stat is not None and (stat.st_dev, stat.st_ino) != self._inode:
+            # Rotated: the old file is drained above, continue with the new one
+            self._file.close()
+            self.rotations += 1
+            if self._open(True):
+                yield from self._read()
+            else:
+                self._file = None
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class _Window:
+    __slots__ = ("index", "routes", "loads", "errors", "error_messages")
+
+    def __init__(self, index: int):
+        self.index = index
+        # route -> [histogram (µs), requests, 4xx, 5xx]
+        self.routes = {}
+        self.loads = LatencyHistogram()
+        self.errors = 0
+        self.error_messages = Counter()
+
+
+class WindowedStats:
+    """Ring of ``windows`` time windows of ``window_seconds`` each"""
+
+    def __init__(self, window_seconds: float, windows: int, max_routes: int = 16):
+        self.window_seconds = window_seconds
+        self.max_routes = max_routes
+        self._ring: List[Optional[_Window]] = [None] * windows
+        self.latest = 0.0
+        self.events = 0
+        self.dropped = 0
+
+    def _window(self, ts: float) -> Optional[_Window]:
+        index = int(ts // self.window_seconds)
+        newest = int(self.latest // self.window_seconds)
+        if self.latest and index <= newest - len(self._ring):
+            return None
+        slot = index % len(self._ring)
+        window = self._ring[slot]
+        if window is None or window.index != index:
+            if window is not None and window.index > index:
+                return None
+            window = self._ring[slot] = _Window(index)
+        self.latest = max(self.latest, ts)
+        return window
+
+    def add(self, event: LogEvent):
+        window = self._window(event.ts)
+        if window is None:
+            self.dropped += 1
+            return
+        self.events += 1
+        if event.kind == "request":
+            route = f"{event.method} {event.path}"
+            if route not in window.routes and len(window.routes) >= self.max_routes:
+                route = "other"
+            stats = window.routes.get(route)
+            if stats is None:
+                stats = window.routes[route] = [LatencyHistogram(), 0, 0, 0]
+            stats[0].record(int(event.seconds * 1e6))
+            stats[1] += 1
+            stats[2] += 400 <= event.status < 500
+            stats[3] += event.status >= 500
+        elif event.kind == "load":
+            window.loads.record(int(event.seconds * 1e6))
+        else:
+            window.errors += 1
+            message = event.message[:200]
+            if message in window.error_messages or len(window.error_messages) < MAX_ERROR_MESSAGES:
+                window.error_messages[message] += 1
+
+    def snapshot(self, seconds: float = None, now: float = None) -> Dict:
+        """Totals over the last ``seconds`` (default: the whole ring) before ``now`` (default: newest event)"""
+        now = now if now is not None else (self.latest or time.time())
+        span = min(seconds or float("inf"), self.window_seconds * len(self._ring))
+        first = int((now - span) // self.window_seconds) + 1
+        last = int(now // self.window_seconds)
+        routes, loads, messages, errors = {}, LatencyHistogram(), Counter(), 0
+        for window in self._ring:
+            if window is None or not first <= window.index <= last:
+                continue
+            for route, (histogram, count, client_errors, server_errors) in window.routes.items():
+                merged = routes.setdefault(route, [LatencyHistogram(), 0, 0, 0])
+                merged[0].merge(histogram)
+                merged[1] += count
+                merged[2] += client_errors
+                merged[3] += server_errors
+            loads.merge(window.loads)
+            errors += window.errors
+            messages.update(window.error_messages)
+        elapsed = (last - first + 1) * self.window_seconds
+
+        def ms(histogram, percentile):
+            return round(histogram.percentile(percentile) / 1000, 2)
+
+        return {
+            "span_seconds": elapsed,
+            "requests": sum(count for _, count, _, _ in routes.values()),
+            "routes": {route: {"requests": count, "rps": round(count / elapsed, 3),
+                               "4xx": client_errors, "5xx": server_errors,
+                               "p50_ms": ms(histogram, 50), "p90_ms": ms(histogram, 90),
+                               "p99_ms": ms(histogram, 99), "max_ms": round(histogram.max / 1000, 2)}
+                       for route, (histogram, count, client_errors, server_errors)
+                       in sorted(routes.items(), key=lambda item: -item[1][1])},
+            "loads": {"count": loads.count, "p50_s": round(loads.percentile(50) / 1e6, 2),
+                      "max_s": round(loads.max / 1e6, 2)},
+            "errors": errors,
+            "top_errors": messages.most_common(5),
+        }
+
+
+class LogAggregator:
+    """Tails a log into WindowedStats"""
+
+    def __init__(self, path: str = None, settings: Dict = None, from_start: bool = False):
+        settings = settings or config_loader.get_config()["server_log"]
+        self.tailer = LogTailer(path or settings["path"], from_start)
+        self.stats = WindowedStats(settings["window_seconds"], settings["windows"], settings["max_routes"])
+        self.lines = 0
+
+    def poll(self) -> int:
+        """Consume new lines; returns how many were read"""
+        count = 0
+        for line in self.tailer.poll():
+            count += 1
+            event = parse_line(line)
+            if event is not None:
+                self.stats.add(event)
+        self.lines += count
+        return count
+
+
+def format_snapshot(snapshot: Dict) -> str:
+    lines = [f"Last {snapshot['span_seconds'] / 60:g} min: {snapshot['requests']} requests, "
+             f"{snapshot['loads']['count']} model loads, {snapshot['errors']} errors"]
+    if snapshot["routes"]:
+        lines.append(f"{'route':<24} {'requests':>9} {'req/s':>7} {'4xx':>5} {'5xx':>5} "
+                     f"{'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+        for route, row in snapshot["routes"].items():
+            lines.append(f"{route:<24} {row['requests']:>9d} {row['rps']:>7.2f} {row['4xx']:>5d} {row['5xx']:>5d} "
+                         f"{row['p50_ms']:>9.1f} {row['p90_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['max_ms']:>9.1f}")
+    if snapshot["loads"]["count"]:
+        lines.append(f"Model loads: median {snapshot['loads']['p50_s']:.2f}s, max {snapshot['loads']['max_s']:.2f}s")
+    for message, count in snapshot["top_errors"]:
+        lines.append(f"  {count:>5d}x {message}")
+    return "\n".join(lines)
+
+
+def main():
+    settings = config_loader.get_config()["server_log"]
+    parser = argparse.ArgumentParser(description='Rolling request, load and error statistics from the Ollama log')
+    parser.add_argument('log', nargs='?', default=settings["path"], help='Ollama server log')
+    parser.add_argument('--follow', action='store_true', help='Keep tailing and print a summary every window')
+    parser.add_argument('--minutes', type=float, help='Summarize only the last N minutes')
+    parser.add_argument('--interval', type=float, default=None, help='Seconds between summaries with --follow')
+    parser.add_argument('--json', action='store_true', help='Print summaries as JSON')
+    args = parser.parse_args(sys.argv[1:])
+
+    if not os.path.exists(args.log):
+        print(f"Error: {args.log} does not exist")
+        sys.exit(1)
+    aggregator = LogAggregator(args.log, settings, from_start=True)
+    seconds = args.minutes * 60 if args.minutes else None
+
+    def report(now=None):
+        snapshot = aggregator.stats.snapshot(seconds, now)
+        print(json.dumps(snapshot) if args.json else format_snapshot(snapshot), flush=True)
+
+    aggregator.poll()
+    report()
+    if not args.follow:
+        return
+    interval = args.interval or settings["window_seconds"]
+    next_report = time.monotonic() + interval
+    try:
+        while True:
+            time.sleep(settings["poll_interval"])
+            aggregator.poll()
+            if time.monotonic() >= next_report:
+                next_report += interval
+                if not args.json:
+                    print()
+                report(time.time())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        aggregator.tailer.close()
+
+
+if __name__ == "__main__":
+    main()
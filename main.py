@@ -1,95 +1,203 @@
 #!/usr/bin/env python3
 """
 Main entry point for Ollama Service
-This script provides multiple ways to interact with the Ollama service
+This script provides multiple ways to interact with the Ollama service.
+Commands run in this process; each command's module (and with it heavy
+dependencies such as requests or streamlit) is only imported when that
+command is actually run.
 """
 
 import sys
-import subprocess
 import os
 import argparse
+import importlib
 
-def run_streamlit_app():
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def _run_module_main(module_name, args):
+    """Import a command module and run its main() with the given arguments"""
+    module = importlib.import_module(module_name)
+    sys.argv = [getattr(module, '__file__', module_name)] + list(args)
+    return module.main()
+
+def run_streamlit_app(args):
     """Run the Streamlit model selector app"""
     try:
         print("Starting Streamlit Model Selector...")
         print("Access the application at: http://localhost:8501")
-        subprocess.run([sys.executable, "-m", "streamlit", "run", "streamlit_model_selector.py", "--server.port=8501"])
+        from streamlit.web import cli as stcli
+        script = os.path.join(BASE_DIR, "streamlit_model_selector.py")
+        stcli.main(["run", script, "--server.port=8501"] + list(args), prog_name="streamlit")
+    except SystemExit:
+        raise
     except Exception as e:
         print(f"Error running Streamlit app: {e}")
         sys.exit(1)
 
-def run_interactive_selector():
+def run_interactive_selector(args):
     """Run the interactive model selector"""
     try:
         print("Starting Interactive Model Selector...")
-        subprocess.run([sys.executable, "model_selector.py"])
+        _run_module_main("model_selector", args)
     except Exception as e:
         print(f"Error running interactive selector: {e}")
         sys.exit(1)
 
-def run_chat_client():
+def run_chat_client(args):
     """Run the chat client with default model"""
     try:
-        print("Starting Chat Client with qwen3:0.6b...")
-        subprocess.run([sys.executable, "chat_with_default_model.py"])
+        print("Starting Chat Client with the default model...")
+        _run_module_main("chat_with_default_model", args)
     except Exception as e:
         print(f"Error running chat client: {e}")
         sys.exit(1)
 
-def run_model_manager():
+def run_model_manager(args):
     """Run the model manager"""
     try:
         print("Starting Model Manager...")
-        subprocess.run([sys.executable, "model_manager.py"])
+        _run_module_main("model_manager", args)
     except Exception as e:
         print(f"Error running model manager: {e}")
         sys.exit(1)
 
-def run_test():
+def run_push_local(args):
+    """Create a model from local GGUF files"""
+    try:
+        print("Pushing local model files...")
+        _run_module_main("blob_upload", args)
+    except Exception as e:
+        print(f"Error pushing local model: {e}")
+        sys.exit(1)
+
+def run_registry_cache(args):
+    """Run the pull-through registry cache"""
+    try:
+        print("Starting Registry Cache...")
+        _run_module_main("registry_cache", args)
+    except Exception as e:
+        print(f"Error running registry cache: {e}")
+        sys.exit(1)
+
+def run_benchmark(args):
+    """Benchmark and compare local models"""
+    try:
+        print("Starting Model Benchmark...")
+        _run_module_main("model_benchmark", args)
+    except Exception as e:
+        print(f"Error running benchmark: {e}")
+        sys.exit(1)
+
+def run_job_manager(args):
+    """Run or talk to the background job manager"""
+    try:
+        print("Starting Job Manager...")
+        _run_module_main("job_manager", args)
+    except Exception as e:
+        print(f"Error running job manager: {e}")
+        sys.exit(1)
+
+def run_batch(args):
+    """Run a JSONL batch through the model"""
+    try:
+        print("Starting Batch Runner...")
+        _run_module_main("batch_runner", args)
+    except Exception as e:
+        print(f"Error running batch: {e}")
+        sys.exit(1)
+
+def run_swap(args):
+    """Switch the default model without dropping requests"""
+    try:
+        print("Starting Model Swap...")
+        _run_module_main("model_swap", args)
+    except Exception as e:
+        print(f"Error swapping model: {e}")
+        sys.exit(1)
+
+def run_replay(args):
+    """Serve recorded traffic with its original timing"""
+    try:
+        print("Starting Replay Server...")
+        _run_module_main("replay_server", args)
+    except Exception as e:
+        print(f"Error running replay server: {e}")
+        sys.exit(1)
+
+def run_logstats(args):
+    """Summarize or follow the Ollama server log"""
+    try:
+        _run_module_main("log_aggregator", args)
+    except Exception as e:
+        print(f"Error reading server log: {e}")
+        sys.exit(1)
+
+def run_loadtest(args):
+    """Run the open-loop load generator"""
+    try:
+        print("Starting Load Test...")
+        _run_module_main("loadtest", args)
+    except Exception as e:
+        print(f"Error running load test: {e}")
+        sys.exit(1)
+
+def run_test(args):
     """Run the default model test"""
     try:
         print("Running Default Model Test...")
-        subprocess.run([sys.executable, "test_default_model.py"])
+        return _run_module_main("test_default_model", args)
     except Exception as e:
         print(f"Error running tests: {e}")
         sys.exit(1)
 
+# Command name -> (handler, module imported by the handler, description)
+COMMANDS = {
+    'streamlit': (run_streamlit_app, 'streamlit.web.cli', 'Run Streamlit model selector and chat playground (default)'),
+    'interactive': (run_interactive_selector, 'model_selector', 'Run interactive model selector'),
+    'chat': (run_chat_client, 'chat_with_default_model', 'Run chat client with default model'),
+    'manager': (run_model_manager, 'model_manager', 'Run model manager'),
+    'push-local': (run_push_local, 'blob_upload', 'Create a model from local GGUF files'),
+    'registry-cache': (run_registry_cache, 'registry_cache', 'Run pull-through registry cache for Ollama nodes'),
+    'benchmark': (run_benchmark, 'model_benchmark', 'Benchmark, compare and recommend local models'),
+    'jobs': (run_job_manager, 'job_manager', 'Run the background pull/delete job manager or query its jobs'),
+    'batch': (run_batch, 'batch_runner', 'Run a JSONL batch with multi-process pre/post-processing'),
+    'swap': (run_swap, 'model_swap', 'Switch default_model after pre-loading, then drain and unload the old one'),
+    'replay': (run_replay, 'replay_server', 'Replay traffic recorded with OLLAMA_RECORD'),
+    'logstats': (run_logstats, 'log_aggregator', 'Rolling request, load and error statistics from the Ollama log'),
+    'loadtest': (run_loadtest, 'loadtest', 'Run open-loop load test against Ollama or the stub server'),
+    'test': (run_test, 'test_default_model', 'Run default model test'),
+}
+
+def load_command(name):
+    """Import the module behind a command without running it"""
+    return importlib.import_module(COMMANDS[name][1])
+
 def main():
     parser = argparse.ArgumentParser(description='Ollama Service Manager')
     parser.add_argument('command', nargs='?', default='streamlit',
-                        choices=['streamlit', 'interactive', 'chat', 'manager', 'test', 'help'],
+                        choices=list(COMMANDS) + ['help'],
                         help='Command to run (default: streamlit)')
-    
+    parser.add_argument('args', nargs=argparse.REMAINDER,
+                        help='Arguments passed through to the command')
+
     args = parser.parse_args()
-    
+
     print("Ollama Service Manager")
     print("=" * 50)
     print("Available commands:")
-    print("  streamlit  - Run Streamlit model selector (default)")
-    print("  interactive - Run interactive model selector")
-    print("  chat      - Run chat client with default model")
-    print("  manager   - Run model manager")
-    print("  test      - Run default model test")
-    print("  help      - Show this help message")
+    for name, (_, _, description) in COMMANDS.items():
+        print(f"  {name:<14s} - {description}")
+    print(f"  {'help':<14s} - Show this help message")
     print("=" * 50)
-    
-    if args.command == 'streamlit':
-        run_streamlit_app()
-    elif args.command == 'interactive':
-        run_interactive_selector()
-    elif args.command == 'chat':
-        run_chat_client()
-    elif args.command == 'manager':
-        run_model_manager()
-    elif args.command == 'test':
-        run_test()
-    elif args.command == 'help':
-        parser.print_help()
-    else:
-        print(f"Unknown command: {args.command}")
+
+    if args.command == 'help':
         parser.print_help()
-        sys.exit(1)
+        return
+
+    handler = COMMANDS[args.command][0]
+    result = handler(args.args)
+    if isinstance(result, int) and result:
+        sys.exit(result)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Model benchmark and comparison
+Runs a standard prompt set against locally installed models, one after
+another or side by side, and records cold load time, TTFT, decode
+tokens/sec, peak memory from /api/ps and a simple answer-correctness
+score in a local SQLite store. The stored results drive a recommendation
+for ``default_model`` from the latency/quality targets in the config.
+
+Usage: python model_benchmark.py [run MODEL... [--concurrent] | compare | recommend [--set-default]]
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+import config_loader
+from chat_with_default_model import OllamaChatClient, build_generate_payload
+
+# (prompt, accepted answers) - a reply counts as correct if it contains any of them
+STANDARD_PROMPTS = [
+    ("What is 17 multiplied by 23? Answer with the number only.", ("391",)),
+    ("What is the capital of France? Answer in one word.", ("paris",)),
+    ("中国的首都是哪个城市？请只回答城市名。", ("北京", "beijing")),
+    ("Reverse the letters of the word 'stressed'. Answer with the word only.", ("desserts",)),
+    ("Name one of the three primary colors of light. Answer in one word.", ("red", "green", "blue")),
+    ("Write a Python expression that evaluates to the length of a list named items.", ("len(items)",)),
+]
+
+# How often /api/ps is sampled for memory while a model runs (seconds)
+PS_POLL_INTERVAL = 0.5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started_at TEXT NOT NULL,
+    host TEXT NOT NULL,
+    model TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    prompts INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    load_ms REAL,
+    ttft_p50_ms REAL,
+    ttft_p95_ms REAL,
+    tokens_per_sec REAL,
+    peak_rss_bytes INTEGER,
+    peak_vram_bytes INTEGER,
+    quality REAL
+);
+CREATE TABLE IF NOT EXISTS samples (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    prompt_index INTEGER NOT NULL,
+    ttft_ms REAL,
+    tokens_per_sec REAL,
+    eval_count INTEGER,
+    correct INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_model ON runs(model, id);
+"""
+
+
+@dataclass(slots=True)
+class BenchmarkRun:
+    """Aggregated results of one model over the prompt set"""
+    model: str
+    mode: str
+    prompts: int = 0
+    errors: int = 0
+    load_ms: float = 0.0
+    ttft_p50_ms: float = 0.0
+    ttft_p95_ms: float = 0.0
+    tokens_per_sec: float = 0.0
+    peak_rss_bytes: int = 0
+    peak_vram_bytes: int = 0
+    quality: float = 0.0
+    started_at: str = ""
+
+    def meets(self, settings: Dict) -> bool:
+        return (not self.errors and self.quality >= settings["min_quality"]
+                and self.ttft_p50_ms <= settings["target_ttft_ms"]
+                and self.tokens_per_sec >= settings["min_tokens_per_sec"])
+
+
+class MemoryPoller:
+    """Samples /api/ps in the background and keeps the peak size per model"""
+
+    def __init__(self, api_base: str, interval: float = PS_POLL_INTERVAL):
+        self.api_base = api_base
+        self.interval = interval
+        self.peak: Dict[str, tuple] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        try:
+            response = requests.get(f"{self.api_base}/ps", timeout=5)
+            response.raise_for_status()
+        except requests.exceptions.RequestException:
+            return
+        for entry in response.json().get("models", []):
+            name = entry.get("name") or entry.get("model")
+            size, vram = entry.get("size", 0), entry.get("size_vram", 0)
+            rss, peak_vram = self.peak.get(name, (0, 0))
+            self.peak[name] = (max(rss, size), max(peak_vram, vram))
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._sample()
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))]
+
+
+def unload_model(client: OllamaChatClient, model: str):
+    """Evict the model so the next request pays (and reports) a cold load"""
+    try:
+        client.session.post(f"{client.api_base}/generate", json={"model": model, "keep_alive": 0},
+                            timeout=client._timeout()).raise_for_status()
+    except requests.exceptions.RequestException as e:
+        print(f"Warning: could not unload {model}: {e}")
+
+
+def benchmark_model(model: str, prompts=STANDARD_PROMPTS, num_predict: int = 128, mode: str = "sequential",
+                    api_base: str = None, progress: Callable[[str], None] = print):
+    """Run the prompt set against one model; returns (BenchmarkRun, per-prompt samples)"""
+    client = OllamaChatClient(model)
+    if api_base:
+        client.api_base = api_base
+    run = BenchmarkRun(model=model, mode=mode, prompts=len(prompts),
+                       started_at=datetime.now(timezone.utc).isoformat())
+    unload_model(client, model)
+
+    samples, ttfts, rates, correct = [], [], [], 0
+    for index, (prompt, answers) in enumerate(prompts):
+        payload = build_generate_payload(model, prompt, stream=True)
+        # Deterministic, bounded answers keep runs comparable
+        payload["options"] = {"temperature": 0, "num_predict": num_predict}
+        client.last_timings = None
+        text = []
+        error = None
+        try:
+            # Fitted like the chat clients' requests, so memory and load time match real use
+            for record in client.stream_payload("/generate", payload):
+                if "error" in record:
+                    raise RuntimeError(record["error"])
+                text.append(record.get("response", ""))
+        except Exception as e:
+            error = str(e)[:200]
+        timings = client.last_timings
+        if error is None and timings is None:
+            error = "stream ended without a final record"
+
+        if error:
+            run.errors += 1
+            samples.append((index, None, None, None, None, error))
+            progress(f"  {model}: prompt {index + 1}/{len(prompts)} failed: {error}")
+            continue
+        if index == 0:
+            run.load_ms = timings.load_duration / 1e6
+        reply = "".join(text).lower()
+        is_correct = any(answer.lower() in reply for answer in answers)
+        correct += is_correct
+        ttft_ms = timings.first_token * 1000 if timings.first_token is not None else timings.wall * 1000
+        ttfts.append(ttft_ms)
+        rates.append(timings.eval_tokens_per_sec)
+        samples.append((index, ttft_ms, timings.eval_tokens_per_sec, timings.eval_count, int(is_correct), None))
+        progress(f"  {model}: prompt {index + 1}/{len(prompts)} TTFT {ttft_ms:.0f} ms, "
+                 f"{timings.eval_tokens_per_sec:.1f} tok/s{'' if is_correct else ' (wrong)'}")
+
+    # The first request includes the cold load; keep it out of the steady-state TTFT
+    steady = ttfts[1:] or ttfts
+    run.ttft_p50_ms = _percentile(steady, 50)
+    run.ttft_p95_ms = _percentile(steady, 95)
+    run.tokens_per_sec = statistics.median(rates) if rates else 0.0
+    run.quality = correct / len(prompts) if prompts else 0.0
+    return run, samples
+
+
+def run_benchmarks(models: List[str], concurrent: bool = False, prompts=STANDARD_PROMPTS,
+                   num_predict: int = None, api_base: str = None, store: 'BenchmarkStore' = None,
+                   progress: Callable[[str], None] = print) -> List[BenchmarkRun]:
+    """Benchmark several models and persist the results"""
+    settings = config_loader.get_config()["benchmark"]
+    num_predict = num_predict or settings["num_predict"]
+    api_base = api_base or OllamaChatClient().api_base
+    mode = "concurrent" if concurrent else "sequential"
+    store = store or BenchmarkStore()
+    results = {}
+
+    def worker(model):
+        try:
+            results[model] = benchmark_model(model, prompts, num_predict, mode, api_base, progress)
+        except Exception as e:
+            # Keep the other models' results; this one is stored as failing every prompt
+            error = str(e)[:200] or type(e).__name__
+            progress(f"  {model}: benchmark failed: {error}")
+            run = BenchmarkRun(model=model, mode=mode, prompts=len(prompts), errors=len(prompts),
+                               started_at=datetime.now(timezone.utc).isoformat())
+            results[model] = run, [(index, None, None, None, None, error) for index in range(len(prompts))]
+
+    with MemoryPoller(api_base) as poller:
+        if concurrent:
+            threads = [threading.Thread(target=worker, args=(model,)) for model in models]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        else:
+            for model in models:
+                progress(f"Benchmarking {model}...")
+                worker(model)
+
+    runs = []
+    for model in models:
+        run, samples = results[model]
+        run.peak_rss_bytes, run.peak_vram_bytes = poller.peak.get(model, (0, 0))
+        store.save(run, samples, api_base)
+        runs.append(run)
+    return runs
+
+
+class BenchmarkStore:
+    """SQLite store of benchmark runs and per-prompt samples"""
+
+    def __init__(self, path: str = None):
+        path = path or config_loader.get_config()["benchmark"]["store"]
+        self.path = os.path.expanduser(path)
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def save(self, run: BenchmarkRun, samples: List[tuple], host: str) -> int:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO runs (started_at, host, model, mode, prompts, errors, load_ms, ttft_p50_ms, "
+                "ttft_p95_ms, tokens_per_sec, peak_rss_bytes, peak_vram_bytes, quality) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run.started_at, host, run.model, run.mode, run.prompts, run.errors, run.load_ms,
+                 run.ttft_p50_ms, run.ttft_p95_ms, run.tokens_per_sec, run.peak_rss_bytes,
+                 run.peak_vram_bytes, run.quality))
+            run_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO samples (run_id, prompt_index, ttft_ms, tokens_per_sec, eval_count, correct, error) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", [(run_id,) + sample for sample in samples])
+        return run_id
+
+    def latest(self, mode: Optional[str] = None) -> List[BenchmarkRun]:
+        """Most recent run of every model, fastest first"""
+        query = ("SELECT model, mode, prompts, errors, load_ms, ttft_p50_ms, ttft_p95_ms, tokens_per_sec, "
+                 "peak_rss_bytes, peak_vram_bytes, quality, started_at FROM runs WHERE id IN "
+                 "(SELECT MAX(id) FROM runs {} GROUP BY model) ORDER BY ttft_p50_ms")
+        with self._lock:
+            if mode:
+                rows = self._conn.execute(query.format("WHERE mode = ?"), (mode,)).fetchall()
+            else:
+                rows = self._conn.execute(query.format("")).fetchall()
+        return [BenchmarkRun(*row) for row in rows]
+
+    def close(self):
+        self._conn.close()
+
+
+def recommend(runs: List[BenchmarkRun], settings: Dict = None) -> Optional[BenchmarkRun]:
+    """Most accurate model within the latency targets; ties go to the lower TTFT"""
+    settings = settings or config_loader.get_config()["benchmark"]
+    candidates = [run for run in runs if run.meets(settings)]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda run: (-run.quality, run.ttft_p50_ms))
+
+
+def set_default_model(model: str):
+    """Persist ``model`` as default_model in the model config"""
+    config_loader.update_config_file({"default_model": model})
+    config_loader.get_loader().reload()
+
+
+def format_table(runs: List[BenchmarkRun]) -> str:
+    lines = [f"{'Model':<20s} {'Mode':<10s} {'Load ms':>8s} {'TTFT p50':>9s} {'TTFT p95':>9s} "
+             f"{'tok/s':>7s} {'Peak RSS':>9s} {'Quality':>8s} {'Errors':>6s}"]
+    for run in runs:
+        lines.append(f"{run.model:<20s} {run.mode:<10s} {run.load_ms:8.0f} {run.ttft_p50_ms:9.0f} "
+                     f"{run.ttft_p95_ms:9.0f} {run.tokens_per_sec:7.1f} "
+                     f"{run.peak_rss_bytes / 1024 ** 3:7.2f}GB {run.quality * 100:7.0f}% {run.errors:6d}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark and compare local models')
+    sub = parser.add_subparsers(dest='command')
+    run_parser = sub.add_parser('run', help='Benchmark models')
+    run_parser.add_argument('models', nargs='*', help='Models to benchmark (default: installed quick_models)')
+    run_parser.add_argument('--concurrent', action='store_true', help='Run all models at the same time')
+    run_parser.add_argument('--num-predict', type=int, help='Cap output tokens per prompt')
+    run_parser.add_argument('--set-default', action='store_true', help='Set default_model from the results')
+    sub.add_parser('compare', help='Show the latest stored result of every model')
+    recommend_parser = sub.add_parser('recommend', help='Recommend default_model from stored results')
+    recommend_parser.add_argument('--set-default', action='store_true', help='Write the recommendation to the config')
+    args = parser.parse_args(sys.argv[1:])
+
+    store = BenchmarkStore()
+    if args.command == 'run':
+        models = args.models
+        if not models:
+            from model_manager import OllamaModelManager
+            installed = {model.name for model in OllamaModelManager().list_models()}
+            models = [model for model in config_loader.get_quick_models() if model in installed]
+        if not models:
+            print("No models to benchmark; pass model names or install one of quick_models")
+            sys.exit(1)
+        runs = run_benchmarks(models, args.concurrent, num_predict=args.num_predict, store=store)
+        print("=" * 90)
+        print(format_table(runs))
+    elif args.command in (None, 'compare', 'recommend'):
+        runs = store.latest()
+        if not runs:
+            print(f"No benchmark results in {store.path}; run 'python model_benchmark.py run MODEL...' first")
+            return
+        print(format_table(runs))
+
+    if args.command in ('run', 'recommend'):
+        settings = config_loader.get_config()["benchmark"]
+        best = recommend(runs, settings)
+        print("=" * 90)
+        if best is None:
+            print(f"No model meets the targets (TTFT p50 <= {settings['target_ttft_ms']} ms, "
+                  f">= {settings['min_tokens_per_sec']} tok/s, quality >= {settings['min_quality'] * 100:.0f}%)")
+            return
+        print(f"Recommended default model: {best.model}")
+        if args.set_default:
+            set_default_model(best.model)
+            print(f"✓ default_model set to {best.model}")
+
+
+if __name__ == "__main__":
+    main()
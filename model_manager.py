@@ -9,31 +9,36 @@ import sys
 import time
 import requests
 import json
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
+
+import config_loader
+from circuit_breaker import CircuitOpenError, health, is_backend_failure
+from ndjson_reader import iter_response
+from registry_cache import resolve_pull_name
+from result_types import ModelInfo, PullProgress
 
 OLLAMA_HOST = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
 OLLAMA_API_BASE = f"{OLLAMA_HOST}/api"
 
-# Load model configuration from models/model_config.json
-MODEL_CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'models', 'model_config.json')
-MODEL_CONFIG = {}
-
-try:
-    with open(MODEL_CONFIG_PATH, 'r', encoding='utf-8') as f:
-        MODEL_CONFIG = json.load(f)
-except FileNotFoundError:
-    # Default config if file doesn't exist
-    MODEL_CONFIG = {
-        "default_model": "qwen3:0.6b",
-        "available_models": ["qwen3:0.6b"],
-        "download_settings": {"use_mirror": True}
-    }
-
 def get_default_model():
-    return MODEL_CONFIG.get("default_model", "qwen3:0.6b")
+    return config_loader.get_default_model()
 
 def get_available_models():
-    return MODEL_CONFIG.get("available_models", ["qwen3:0.6b"])
+    return config_loader.get_available_models()
+
+def parse_context_length(info: Optional[Dict]) -> Optional[int]:
+    """Context length from an /api/show response, if the model reports one"""
+    # Keys are prefixed with the architecture, e.g. "qwen3.context_length"
+    for key, value in ((info or {}).get("model_info") or {}).items():
+        if key.endswith(".context_length") and isinstance(value, int):
+            return value
+    return None
+
+def endpoint_timeout(endpoint: str) -> tuple:
+    """(connect, read) timeout for an API endpoint from the endpoint_timeouts config"""
+    settings = config_loader.get_config()
+    timeouts = settings["endpoint_timeouts"]
+    return (settings["client_settings"]["connect_timeout"], timeouts.get(endpoint, timeouts["default"]))
 
 class OllamaModelManager:
     def __init__(self, host: str = None):
@@ -41,32 +46,57 @@ class OllamaModelManager:
         self.api_base = f"{self.host}/api"
     
     def _make_request(self, method: str, endpoint: str, data: dict = None) -> dict:
-        """Make a request to the Ollama API"""
+        """Make a request to the Ollama API
+        
+        Fails immediately while the host's circuit breaker is open.
+        """
         url = f"{self.api_base}{endpoint}"
+        breaker = health.breaker(self.host)
+        # Nothing to record until the breaker lets the request through
+        recorded = True
         
         try:
+            if not breaker.allow():
+                raise CircuitOpenError(f"{self.host} is down, retrying in {breaker.retry_in():.1f}s")
+            recorded = False
+            timeout = endpoint_timeout(endpoint)
             if method.upper() == 'GET':
-                response = requests.get(url)
+                response = requests.get(url, timeout=timeout)
             elif method.upper() == 'POST':
-                response = requests.post(url, json=data)
+                response = requests.post(url, json=data, timeout=timeout)
             elif method.upper() == 'DELETE':
-                response = requests.delete(url)
+                response = requests.delete(url, json=data, timeout=timeout)
             else:
                 raise ValueError(f"Unsupported HTTP method: {method}")
             
             response.raise_for_status()
-            return response.json()
+            health.record_success(self.host)
+            recorded = True
+            # /api/copy and /api/delete answer with an empty body
+            return response.json() if response.content else {}
+        except CircuitOpenError as e:
+            print(f"Error making request to {url}: {e}")
+            return None
         except requests.exceptions.RequestException as e:
+            if is_backend_failure(e):
+                health.record_failure(self.host, e)
+            else:
+                health.record_success(self.host)
+            recorded = True
             print(f"Error making request to {url}: {e}")
             return None
+        finally:
+            if not recorded:
+                # Interrupted or failed unexpectedly; never leave a half-open trial unresolved
+                health.record_failure(self.host, f"{method} {endpoint} ended without a response")
     
-    def list_models(self) -> List[Dict]:
+    def list_models(self) -> List[ModelInfo]:
         """List all available models"""
         result = self._make_request('GET', '/tags')
         if result and 'models' in result:
-            return result['models']
+            return [ModelInfo.from_payload(model) for model in result['models']]
         elif result and isinstance(result, list):
-            return result
+            return [ModelInfo.from_payload(model) for model in result]
         return []
     
     def show_model_info(self, model_name: str) -> Dict:
@@ -74,37 +104,87 @@ class OllamaModelManager:
         data = {"name": model_name}
         return self._make_request('POST', '/show', data)
     
-    def pull_model(self, model_name: str, stream: bool = True) -> bool:
-        """Download/pull a model from Ollama registry"""
+    def get_context_length(self, model_name: str) -> Optional[int]:
+        """Maximum context length the model was trained for, from /api/show"""
+        return parse_context_length(self.show_model_info(model_name))
+    
+    def pull_model(self, model_name: str, stream: bool = True,
+                   on_progress: Optional[Callable[[PullProgress], None]] = None) -> bool:
+        """Download/pull a model from Ollama registry
+
+        ``on_progress`` receives every progress record instead of them being
+        printed; an exception raised from it aborts the pull.
+        """
         print(f"Pulling model: {model_name}")
         
+        pull_name, insecure = resolve_pull_name(model_name)
+        if pull_name != model_name:
+            print(f"Using mirror: {pull_name}")
+        
         data = {
-            "name": model_name,
+            "name": pull_name,
             "stream": stream
         }
+        if insecure:
+            data["insecure"] = True
         
+        breaker = health.breaker(self.host)
+        if not breaker.allow():
+            print(f"Failed to pull model {model_name}: {self.host} is down, retrying in {breaker.retry_in():.1f}s")
+            return False
+        
+        recorded = False
         try:
-            response = requests.post(f"{self.api_base}/pull", json=data, stream=True)
-            response.raise_for_status()
-            
-            # Process the streaming response
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        progress = json.loads(line.decode('utf-8'))
-                        if 'status' in progress:
-                            print(f"Status: {progress['status']}")
-                        if 'completed' in progress and 'total' in progress:
-                            percent = (progress['completed'] / progress['total']) * 100 if progress['total'] > 0 else 0
-                            print(f"Progress: {percent:.1f}%")
-                    except json.JSONDecodeError:
+            settings = config_loader.get_config()
+            timeout = (settings["client_settings"]["connect_timeout"],
+                       settings["download_settings"]["timeout"])
+            # Closing the response on the way out cancels the pull server-side
+            with requests.post(f"{self.api_base}/pull", json=data, stream=True, timeout=timeout) as response:
+                response.raise_for_status()
+                health.record_success(self.host)
+                recorded = True
+                
+                # Process the streaming response
+                for record in iter_response(response):
+                    if 'error' in record:
+                        print(f"Failed to pull model {model_name}: {record['error']}")
+                        return False
+                    progress = PullProgress.from_payload(record)
+                    if on_progress is not None:
+                        on_progress(progress)
                         continue
+                    if progress.status:
+                        print(f"Status: {progress.status}")
+                    if progress.has_progress:
+                        print(f"Progress: {progress.percent:.1f}%")
+            
+            if pull_name != model_name and not self.alias_mirrored_model(pull_name, model_name):
+                return False
             
             print(f"Successfully pulled model: {model_name}")
             return True
         except requests.exceptions.RequestException as e:
+            if is_backend_failure(e):
+                health.record_failure(self.host, e)
+            elif not recorded:
+                # The host answered, just not with a pull
+                health.record_success(self.host)
+            recorded = True
             print(f"Failed to pull model {model_name}: {e}")
             return False
+        finally:
+            if not recorded:
+                # Interrupted before the host answered; never leave a half-open trial unresolved
+                health.record_failure(self.host, f"pull of {model_name} ended without a response")
+    
+    def alias_mirrored_model(self, pull_name: str, model_name: str) -> bool:
+        """Rename a model pulled through the mirror to its canonical name"""
+        if self._make_request('POST', '/copy', {"source": pull_name, "destination": model_name}) is None:
+            print(f"Failed to copy {pull_name} to {model_name}")
+            return False
+        # Only the mirror-qualified manifest is removed; the blobs are shared
+        self.delete_model(pull_name)
+        return True
     
     def delete_model(self, model_name: str) -> bool:
         """Delete a model from local storage"""
@@ -112,13 +192,59 @@ class OllamaModelManager:
         result = self._make_request('DELETE', '/delete', data)
         return result is not None
     
+    def run_job(self, kind: str, model_name: str) -> Optional[bool]:
+        """Run a pull or delete through the job manager and poll it to completion
+        
+        Returns None when no job manager is running so the caller can run
+        the operation directly. Interrupting the wait leaves the job running.
+        """
+        # job_manager imports this module
+        from job_manager import JobClient, format_job
+        
+        client = JobClient()
+        if not client.available():
+            return None
+        job = client.enqueue(kind, model_name)
+        if job is None:
+            return None
+        print(f"Queued job #{job.id} ({kind} {model_name}) with the job manager at {client.base_url}")
+        try:
+            job = client.wait(job.id, on_update=lambda update: print(format_job(update)))
+        except KeyboardInterrupt:
+            print(f"\nStopped waiting; job #{job.id} keeps running. Check it with: python job_manager.py status {job.id}")
+            return False
+        return job is not None and job.status == "succeeded"
+    
+    def pull_or_enqueue(self, model_name: str) -> bool:
+        """Pull through the job manager when it is running, otherwise directly"""
+        result = self.run_job("pull", model_name)
+        return self.pull_model(model_name) if result is None else result
+    
+    def delete_or_enqueue(self, model_name: str) -> bool:
+        """Delete through the job manager when it is running, otherwise directly"""
+        result = self.run_job("delete", model_name)
+        return self.delete_model(model_name) if result is None else result
+    
     def check_connection(self) -> bool:
-        """Check if the Ollama service is accessible"""
+        """Check if the Ollama service is accessible
+        
+        Answers from the shared health state while the host is known to be down.
+        """
+        if not health.breaker(self.host).allow():
+            return False
         try:
-            response = requests.get(f"{self.api_base}/tags", timeout=10)
-            return response.status_code == 200
-        except requests.exceptions.RequestException:
+            response = requests.get(f"{self.api_base}/tags", timeout=endpoint_timeout('/tags'))
+        except BaseException as e:
+            # Including interruptions, so a half-open trial is always resolved
+            health.record_failure(self.host, e)
+            if not isinstance(e, requests.exceptions.RequestException):
+                raise
             return False
+        if response.status_code >= 500:
+            health.record_failure(self.host, f"HTTP {response.status_code}")
+        else:
+            health.record_success(self.host)
+        return response.status_code == 200
 
 def main():
     """Main function to demonstrate the model manager"""
@@ -143,7 +269,7 @@ def main():
         models = manager.list_models()
         if models:
             for model in models:
-                print(f"  - {model.get('name', 'Unknown')}")
+                print(f"  - {model.name}")
         else:
             print("  No models currently available")
         
@@ -153,11 +279,11 @@ def main():
         default_model = get_default_model()
         
         # Default: pull default model if not already present
-        model_exists = any(model.get('name') == default_model for model in models)
+        model_exists = any(model.name == default_model for model in models)
         
         if not model_exists:
             print(f"Default model {default_model} not found. Pulling now...")
-            success = manager.pull_model(default_model)
+            success = manager.pull_or_enqueue(default_model)
             if success:
                 print(f"Successfully downloaded {default_model}")
             else:
@@ -174,13 +300,13 @@ def main():
         models = manager.list_models()
         if models:
             for model in models:
-                print(f"  - {model.get('name', 'Unknown')}")
+                print(f"  - {model.name}")
         else:
             print("  No models available")
     
     elif command == 'pull' and len(sys.argv) > 2:
         model_name = sys.argv[2]
-        success = manager.pull_model(model_name)
+        success = manager.pull_or_enqueue(model_name)
         if success:
             print(f"Successfully pulled model: {model_name}")
         else:
@@ -188,7 +314,7 @@ def main():
     
     elif command == 'delete' and len(sys.argv) > 2:
         model_name = sys.argv[2]
-        success = manager.delete_model(model_name)
+        success = manager.delete_or_enqueue(model_name)
         if success:
             print(f"Successfully deleted model: {model_name}")
         else:
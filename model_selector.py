@@ -2,37 +2,23 @@
 """
 Interactive Model Selector for Ollama
 Allows users to select from popular models or enter custom model names
-Downloads models using domestic mirror for faster speed
+Downloads models through the configured mirror (e.g. the registry cache) when one is set
+
+Usage: python model_selector.py [benchmark MODEL... [--concurrent] [--set-default] | compare | recommend]
 """
 
 import os
 import subprocess
 import sys
 import time
-from typing import List, Optional
+from typing import Dict, List, Tuple
+
+import config_loader
+from registry_cache import resolve_pull_name
 
-# Popular models list
-POPULAR_MODELS = [
-    "qwen3:0.6b",
-    "qwen2.5:0.5b",
-    "qwen2.5:7b",
-    "qwen3:latest",
-    "qwen3:1.7b",
-    "qwen3:4b",
-    "qwen3:14b",
-    "qwen3:32b",
-    "qwen3:235b",
-    "llama3:8b",
-    "llama3:70b",
-    "gemma2:2b",
-    "gemma2:9b",
-    "mistral:7b",
-    "mixtral:8x7b",
-    "phi3:3.8b",
-    "command-r:35b",
-    "yi:9b",
-    "dbrx:132b"
-]
+def get_popular_models() -> List[str]:
+    """Popular models list, read from the live model config"""
+    return config_loader.get_available_models()
 
 def check_ollama_running() -> bool:
     """Check if Ollama service is running"""
@@ -59,20 +45,38 @@ def start_ollama_service():
         print(f"✗ Error starting Ollama service: {e}")
         sys.exit(1)
 
-def display_model_menu():
-    """Display available models for selection"""
+def load_benchmark_results() -> Dict[str, 'BenchmarkRun']:
+    """Latest stored benchmark result per model, if any"""
+    from model_benchmark import BenchmarkStore
+    try:
+        store = BenchmarkStore()
+    except Exception:
+        return {}
+    try:
+        return {run.model: run for run in store.latest()}
+    finally:
+        store.close()
+
+def display_model_menu(models: List[str], results: Dict[str, 'BenchmarkRun'] = None):
+    """Display available models for selection, with measured latency where known"""
+    results = results or {}
     print("\nAvailable models:")
     print("=" * 50)
-    for i, model in enumerate(POPULAR_MODELS, 1):
-        print(f"{i:2d}. {model}")
+    for i, model in enumerate(models, 1):
+        run = results.get(model)
+        if run:
+            print(f"{i:2d}. {model:<20s} TTFT {run.ttft_p50_ms:.0f} ms, {run.tokens_per_sec:.1f} tok/s, "
+                  f"quality {run.quality * 100:.0f}%")
+        else:
+            print(f"{i:2d}. {model}")
     print(f"{'0':>2s}. Enter custom model name")
     print("=" * 50)
 
-def get_user_selection() -> str:
+def get_user_selection(models: List[str]) -> str:
     """Get model selection from user"""
     while True:
         try:
-            choice = input(f"\nSelect a model (1-{len(POPULAR_MODELS)}) or 0 for custom: ").strip()
+            choice = input(f"\nSelect a model (1-{len(models)}) or 0 for custom: ").strip()
             choice_num = int(choice)
             
             if choice_num == 0:
@@ -82,29 +86,53 @@ def get_user_selection() -> str:
                 else:
                     print("Invalid input. Please enter a model name.")
                     continue
-            elif 1 <= choice_num <= len(POPULAR_MODELS):
-                return POPULAR_MODELS[choice_num - 1]
+            elif 1 <= choice_num <= len(models):
+                return models[choice_num - 1]
             else:
-                print(f"Please enter a number between 0 and {len(POPULAR_MODELS)}")
+                print(f"Please enter a number between 0 and {len(models)}")
         except ValueError:
             print("Please enter a valid number")
         except KeyboardInterrupt:
             print("\nOperation cancelled by user")
             sys.exit(0)
 
+def ollama_pull_command(model_name: str) -> Tuple[List[str], str]:
+    """Build the `ollama pull` command honoring download_settings.mirror_url
+
+    Returns the command and the (possibly mirror-qualified) name it pulls.
+    """
+    pull_name, insecure = resolve_pull_name(model_name)
+    cmd = ["ollama", "pull"]
+    if insecure:
+        cmd.append("--insecure")
+    cmd.append(pull_name)
+    return cmd, pull_name
+
+def alias_mirrored_model(pull_name: str, model_name: str, env=None) -> bool:
+    """Rename a model pulled through the mirror to its canonical name"""
+    if pull_name == model_name:
+        return True
+    result = subprocess.run(["ollama", "cp", pull_name, model_name], capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        print(f"✗ Failed to copy {pull_name} to {model_name}: {result.stderr.strip()}")
+        return False
+    # Only the mirror-qualified manifest is removed; the blobs are shared
+    subprocess.run(["ollama", "rm", pull_name], capture_output=True, text=True, env=env)
+    return True
+
 def pull_model_with_mirror(model_name: str):
-    """Pull model using domestic mirror for faster download"""
+    """Pull model through the configured mirror (download_settings.mirror_url)"""
     print(f"\nDownloading model: {model_name}")
-    print("Using domestic mirror for faster download...")
     
-    # Set Ollama mirror environment variables for faster download in China
     env = os.environ.copy()
     env["OLLAMA_HOST"] = os.environ.get("OLLAMA_HOST", "127.0.0.1:11434")
     
     # Use subprocess to pull the model with timeout
     try:
         # Command to pull model
-        cmd = ["ollama", "pull", model_name]
+        cmd, pull_name = ollama_pull_command(model_name)
+        if pull_name != model_name:
+            print(f"Using mirror: {pull_name}")
         
         print(f"Executing: {' '.join(cmd)}")
         process = subprocess.Popen(
@@ -125,7 +153,7 @@ def pull_model_with_mirror(model_name: str):
         
         return_code = process.poll()
         
-        if return_code == 0:
+        if return_code == 0 and alias_mirrored_model(pull_name, model_name, env):
             print(f"\n✓ Successfully downloaded {model_name}")
             return True
         else:
@@ -140,6 +168,14 @@ def pull_model_with_mirror(model_name: str):
         return False
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] in ("benchmark", "compare", "recommend"):
+        # Benchmark subcommands: benchmark MODEL... [--concurrent] [--set-default] | compare | recommend
+        import model_benchmark
+        command = "run" if sys.argv[1] == "benchmark" else sys.argv[1]
+        sys.argv = [sys.argv[0], command] + sys.argv[2:]
+        model_benchmark.main()
+        return
+    
     print("Ollama Model Selector")
     print("=====================")
     
@@ -156,8 +192,9 @@ def main():
         print("✓ Ollama service is running")
     
     # Display model menu and get user selection
-    display_model_menu()
-    selected_model = get_user_selection()
+    models = get_popular_models()
+    display_model_menu(models, load_benchmark_results())
+    selected_model = get_user_selection(models)
     
     print(f"\nSelected model: {selected_model}")
     
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Managed swap of the default model
+Switches default_model without a restart: the new model is pulled if
+needed and loaded the way the clients will request it while the old one
+keeps serving, and default_model is changed atomically once the new model
+is resident. After the other processes' config poll interval the old model
+is unloaded; Ollama keeps it until the requests it is running have
+finished, and the swap waits for it to leave /api/ps. A probe sends small
+requests to whichever model is the default throughout, so the latency
+impact of each phase is reported.
+
+Usage: python model_swap.py NEW_MODEL [--host URL] [--no-probe] [--json]
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, Optional
+
+import requests
+
+import config_loader
+from chat_with_default_model import OllamaChatClient, build_generate_payload
+from latency_histogram import LatencyHistogram
+from model_manager import OllamaModelManager
+from token_budget import TokenBudget, context_lengths
+
+PHASES = ("before", "warming", "draining", "after")
+PROBE_PROMPT = "Reply with the single word: ready"
+PROBE_TOKENS = 8
+# A probe whose model load took longer than this hit a cold model
+COLD_LOAD_MS = 100
+
+
+@dataclass(slots=True)
+class SwapReport:
+    """Outcome and timings of one default model swap"""
+    old_model: str
+    new_model: str
+    ok: bool = False
+    error: Optional[str] = None
+    pulled: bool = False
+    pull_s: float = 0.0
+    warm_s: float = 0.0
+    load_s: float = 0.0
+    drain_s: float = 0.0
+    # Unload requested, and Ollama let go of the old model within drain_timeout
+    unloaded: bool = False
+    drained: bool = False
+    phases: Dict[str, Dict] = field(default_factory=dict)
+
+
+class LatencyProbe:
+    """Background requests to the current default model, recorded per swap phase"""
+
+    def __init__(self, api_base: str, interval: float):
+        self.client = OllamaChatClient()
+        self.client.api_base = api_base
+        self.interval = interval
+        self.phase = PHASES[0]
+        self._stats = {phase: {"histogram": LatencyHistogram(), "cold": LatencyHistogram(), "errors": 0,
+                               "models": set()} for phase in PHASES}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="swap-probe", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            phase = self.phase
+            stats = self._stats[phase]
+            # Resolved from the live config on every probe
+            payload = build_generate_payload(self.client.model_name, PROBE_PROMPT)
+            payload["options"] = {"num_predict": PROBE_TOKENS}
+            start = time.perf_counter()
+            try:
+                result = self.client.send_payload("/generate", payload)
+            except Exception:
+                stats["errors"] += 1
+            else:
+                # Cold loads are kept apart so one load does not mask the warm latency
+                cold = result.load_duration / 1e6 > COLD_LOAD_MS
+                stats["cold" if cold else "histogram"].record(int((time.perf_counter() - start) * 1e6))
+                stats["models"].add(payload["model"])
+            self._stop.wait(self.interval)
+
+    def summary(self) -> Dict[str, Dict]:
+        def ms(value):
+            return round(value / 1000, 1)
+
+        return {phase: {"requests": stats["histogram"].count + stats["cold"].count, "errors": stats["errors"],
+                        "cold": stats["cold"].count, "cold_max_ms": ms(stats["cold"].max),
+                        "models": sorted(stats["models"]),
+                        "p50_ms": ms(stats["histogram"].percentile(50)),
+                        "p99_ms": ms(stats["histogram"].percentile(99)),
+                        "max_ms": ms(stats["histogram"].max)}
+                for phase, stats in self._stats.items()}
+
+
+def tagged(model: str) -> str:
+    """Model name with its tag, as /api/ps reports it"""
+    return model if ":" in model.rsplit("/", 1)[-1] else f"{model}:latest"
+
+
+def warm_model(manager: OllamaModelManager, model: str, timeout: float) -> float:
+    """Load ``model`` with the options clients will send; returns the reported load time in seconds"""
+    # A prompt-less generate only loads the model
+    payload = {"model": model}
+    budget = TokenBudget()
+    context_length = context_lengths.get(manager.api_base, model)
+    if budget.settings["enabled"] and context_length:
+        # Same as TokenBudget.apply; a different num_ctx would make Ollama load the model again
+        payload["options"] = {"num_ctx": budget.num_ctx(context_length)}
+    response = requests.post(f"{manager.api_base}/generate", json=payload,
+                             timeout=(config_loader.get_client_settings()["connect_timeout"], timeout))
+    response.raise_for_status()
+    return response.json().get("load_duration", 0) / 1e9
+
+
+def wait_resident(manager: OllamaModelManager, model: str, timeout: float, resident: bool = True,
+                  interval: float = 0.5) -> bool:
+    """Wait until ``model`` is listed by /api/ps, or with ``resident=False`` until it is not"""
+    deadline = time.monotonic() + timeout
+    while True:
+        running = manager._make_request('GET', '/ps')
+        if running is not None:
+            names = {tagged(entry.get("name") or entry.get("model") or "") for entry in running.get("models", [])}
+            if (tagged(model) in names) == resident:
+                return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(interval)
+
+
+def swap_default_model(new_model: str, manager: OllamaModelManager = None, settings: Dict = None,
+                       probe: bool = True, progress: Callable[[str], None] = print) -> SwapReport:
+    """Pull, warm and switch to ``new_model``, then unload the old default once Ollama has drained it"""
+    manager = manager or OllamaModelManager()
+    settings = settings or config_loader.get_config()["model_swap"]
+    loader = config_loader.get_loader()
+    old_model = loader.get()["default_model"]
+    report = SwapReport(old_model, new_model)
+    if tagged(new_model) == tagged(old_model):
+        report.error = f"{new_model} is already the default model"
+        return report
+
+    latency = LatencyProbe(manager.api_base, settings["probe_interval"]) if probe else None
+    if latency:
+        latency.start()
+        # Baseline on the old model
+        time.sleep(settings["observe_seconds"])
+        latency.phase = "warming"
+    try:
+        if tagged(new_model) not in [tagged(model.name) for model in manager.list_models()]:
+            progress(f"Pulling {new_model}...")
+            start = time.perf_counter()
+            if not manager.pull_or_enqueue(new_model):
+                report.error = f"could not pull {new_model}"
+                return report
+            report.pulled, report.pull_s = True, time.perf_counter() - start
+
+        progress(f"Loading {new_model} while {old_model} keeps serving...")
+        start = time.perf_counter()
+        try:
+            report.load_s = warm_model(manager, new_model, settings["warm_timeout"])
+        except requests.exceptions.RequestException as e:
+            report.error = f"could not load {new_model}: {e}"
+            return report
+        if not wait_resident(manager, new_model, settings["warm_timeout"]):
+            report.error = f"{new_model} did not become resident"
+            return report
+        report.warm_s = time.perf_counter() - start
+
+        # Atomic rename; loaders in other processes see it within their poll interval
+        config_loader.update_config_file({"default_model": new_model}, loader.path)
+        loader.reload()
+        progress(f"default_model is now {new_model}; draining {old_model}...")
+        if latency:
+            latency.phase = "draining"
+
+        start = time.perf_counter()
+        # Processes polling the config at the same interval have switched by now
+        time.sleep(loader.poll_interval)
+        report.unloaded = manager._make_request('POST', '/generate', {"model": old_model, "keep_alive": 0}) is not None
+        # Ollama unloads only once the requests it is still running have finished
+        report.drained = report.unloaded and wait_resident(
+            manager, old_model, max(settings["drain_timeout"] - loader.poll_interval, 0), resident=False,
+            interval=0.2)
+        report.drain_s = time.perf_counter() - start
+        if report.unloaded and not report.drained:
+            progress(f"{old_model} is still loaded after {settings['drain_timeout']}s")
+        report.ok = True
+
+        if latency:
+            latency.phase = "after"
+            time.sleep(settings["observe_seconds"])
+        return report
+    finally:
+        if latency:
+            latency.stop()
+            report.phases = latency.summary()
+
+
+def format_report(report: SwapReport) -> str:
+    if not report.ok:
+        return f"Swap from {report.old_model} to {report.new_model} failed: {report.error}"
+    lines = [f"Swapped default model {report.old_model} -> {report.new_model}"]
+    if report.pulled:
+        lines.append(f"  pull   {report.pull_s:8.1f}s")
+    lines.append(f"  warm   {report.warm_s:8.1f}s (model load {report.load_s:.1f}s)")
+    if not report.unloaded:
+        state = "unload request failed"
+    else:
+        state = "unloaded" if report.drained else "still loaded at drain_timeout"
+    lines.append(f"  drain  {report.drain_s:8.1f}s ({report.old_model} {state})")
+    if report.phases:
+        lines.append(f"{'phase':<10} {'requests':>9} {'errors':>7} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9} "
+                     f"{'cold':>5} {'cold ms':>9}  models")
+        for phase, row in report.phases.items():
+            lines.append(f"{phase:<10} {row['requests']:>9d} {row['errors']:>7d} {row['p50_ms']:>9.1f} "
+                         f"{row['p99_ms']:>9.1f} {row['max_ms']:>9.1f} {row['cold']:>5d} {row['cold_max_ms']:>9.1f}  "
+                         f"{', '.join(row['models'])}")
+        before, after = report.phases["before"], report.phases["after"]
+        if before["requests"] > before["cold"] and after["requests"] > after["cold"]:
+            lines.append(f"p50 change after the swap: {after['p50_ms'] - before['p50_ms']:+.1f} ms")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Switch default_model with pre-loading and unloading')
+    parser.add_argument('model', help='New default model')
+    parser.add_argument('--host', default=None, help='Ollama host (default: OLLAMA_HOST)')
+    parser.add_argument('--no-probe', action='store_true', help='Do not send latency probe requests')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args(sys.argv[1:])
+
+    manager = OllamaModelManager(args.host)
+    if not manager.check_connection():
+        print("Error: Cannot connect to Ollama service")
+        sys.exit(1)
+    report = swap_default_model(args.model, manager, probe=not args.no_probe,
+                                progress=(lambda message: None) if args.json else print)
+    print(json.dumps(asdict(report), indent=2) if args.json else format_report(report))
+    if not report.ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
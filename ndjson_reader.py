@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Incremental NDJSON reader for Ollama streaming responses
+Buffers raw chunks in a bytearray and decodes each completed region of lines
+in one pass with JSONDecoder.raw_decode instead of re-splitting every chunk
+"""
+
+import json
+import re
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Iterator, List, Optional
+
+# Network chunk size used when reading streamed HTTP bodies
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_NEWLINE = 0x0A
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class NDJSONReader:
+    """Incremental NDJSON parser working on a single reusable buffer"""
+
+    __slots__ = ("_buffer", "_decoder", "skipped")
+
+    def __init__(self, decoder: json.JSONDecoder = None):
+        self._buffer = bytearray()
+        self._decoder = decoder or json.JSONDecoder()
+        self.skipped = 0
+
+    @property
+    def pending(self) -> int:
+        """Number of buffered bytes that do not yet form a complete line"""
+        return len(self._buffer)
+
+    def feed(self, chunk: bytes) -> Iterator[Any]:
+        """Append a chunk and return an iterator over the records it completes"""
+        buffer = self._buffer
+        scan_from = len(buffer)
+        buffer += chunk
+        # The buffered tail never holds a newline, so only the new bytes are searched
+        end = buffer.rfind(_NEWLINE, scan_from) + 1
+        if not end:
+            return iter(())
+        # Decode the completed lines straight from the buffer, then drop them;
+        # only the unterminated tail stays behind
+        with memoryview(buffer) as view:
+            text = str(view[:end], "utf-8", "replace")
+        del buffer[:end]
+        return self._decode(text)
+
+    def _decode(self, text: str) -> Iterator[Any]:
+        raw_decode = self._decoder.raw_decode
+        skip = _WHITESPACE.match
+        idx = skip(text, 0).end()
+        size = len(text)
+        while idx < size:
+            try:
+                record, idx = raw_decode(text, idx)
+            except ValueError:
+                # Drop the rest of a malformed line and carry on with the next
+                self.skipped += 1
+                idx = text.find("\n", idx) + 1 or size
+            else:
+                yield record
+            idx = skip(text, idx).end()
+
+    def feed_all(self, chunk: bytes) -> List[Any]:
+        """Append a chunk and return the completed records as a list"""
+        return list(self.feed(chunk))
+
+    def close(self) -> Iterator[Any]:
+        """Flush a trailing record that was not terminated by a newline"""
+        if self._buffer:
+            return self.feed(b"\n")
+        return iter(())
+
+
+def iter_ndjson(chunks: Iterable[bytes], reader: NDJSONReader = None) -> Iterator[Any]:
+    """Yield parsed records from an iterable of raw byte chunks"""
+    reader = reader or NDJSONReader()
+    for chunk in chunks:
+        if chunk:
+            yield from reader.feed(chunk)
+    yield from reader.close()
+
+
+async def aiter_ndjson(chunks: AsyncIterable[bytes], reader: NDJSONReader = None) -> AsyncIterator[Any]:
+    """Yield parsed records from an async iterable of raw byte chunks"""
+    reader = reader or NDJSONReader()
+    async for chunk in chunks:
+        if chunk:
+            for record in reader.feed(chunk):
+                yield record
+    for record in reader.close():
+        yield record
+
+
+def iter_response(response, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Any]:
+    """Yield parsed records from a streamed ``requests`` response"""
+    return iter_ndjson(response.iter_content(chunk_size=chunk_size))
+
+
+def aiter_response(response, chunk_size: Optional[int] = None) -> AsyncIterator[Any]:
+    """Yield parsed records from a streamed ``httpx`` async response
+
+    httpx holds bytes back until ``chunk_size`` have arrived, so the default
+    of None hands each network read over as soon as it lands.
+    """
+    return aiter_ndjson(response.aiter_bytes(chunk_size))
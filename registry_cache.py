@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+"""
+Pull-through registry cache for Ollama nodes
+Serves the registry API subset used by `ollama pull` (manifests and blobs)
+from a local content-addressed store, fetching from the upstream registry
+on a miss. Concurrent requests for the same blob share one upstream
+download and are served from the partially written file as it grows;
+cached blobs are sent with sendfile and evicted least-recently-used once
+the store exceeds its size limit.
+
+Point nodes at it with download_settings.mirror_url in models/model_config.json.
+
+Usage: python registry_cache.py [--port PORT] [--cache-dir DIR] [--max-size-gb N]
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import config_loader
+
+UPSTREAM_REGISTRY = "https://registry.ollama.ai"
+
+# Hosts that mean "the default registry", i.e. no mirror is configured
+DEFAULT_REGISTRY_HOSTS = {"registry.ollama.ai", "ollama.com"}
+
+MANIFEST_CONTENT_TYPE = "application/vnd.docker.distribution.manifest.v2+json"
+
+_ROUTE = re.compile(r'^/v2/(?P<name>.+)/(?P<kind>manifests|blobs)/(?P<ref>[^/]+)$')
+_NAME = re.compile(r'^[a-z0-9][a-z0-9._-]*(/[a-z0-9][a-z0-9._-]*)*$')
+_REFERENCE = re.compile(r'^[A-Za-z0-9_][A-Za-z0-9._:-]{0,127}$')
+_DIGEST = re.compile(r'^sha256:[0-9a-f]{64}$')
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Bytes written to disk between wake-ups of readers tailing a download
+_FETCH_CHUNK = 1024 * 1024
+
+
+def resolve_pull_name(model_name: str, settings: Dict = None) -> Tuple[str, bool]:
+    """Map a model name onto the configured mirror
+
+    Returns the name to pass to pull and whether the mirror must be
+    reached over plain HTTP (Ollama's ``insecure`` flag).
+    """
+    settings = settings or config_loader.get_download_settings()
+    mirror = urlparse(settings.get("mirror_url") or "")
+    if not settings.get("use_mirror") or not mirror.netloc or mirror.hostname in DEFAULT_REGISTRY_HOSTS:
+        return model_name, False
+    first = model_name.split('/', 1)[0]
+    if '/' in model_name and ('.' in first or ':' in first or first == 'localhost'):
+        # Already qualified with a registry host
+        return model_name, False
+    if '/' not in model_name:
+        model_name = f"library/{model_name}"
+    return f"{mirror.netloc}/{model_name}", mirror.scheme == "http"
+
+
+class BlobStore:
+    """Content-addressed blob files with LRU eviction by total size"""
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.blob_dir = os.path.join(root, 'blobs')
+        self.partial_dir = os.path.join(root, 'partial')
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.partial_dir, exist_ok=True)
+        self._index = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._scan()
+
+    def _scan(self):
+        entries = []
+        for name in os.listdir(self.blob_dir):
+            st = os.stat(os.path.join(self.blob_dir, name))
+            entries.append((st.st_atime, name.replace('-', ':', 1), st.st_size))
+        # Least recently used first, so eviction order survives restarts
+        for _, digest, size in sorted(entries):
+            self._index[digest] = size
+            self._size += size
+        # Leftovers of downloads interrupted by a restart
+        for name in os.listdir(self.partial_dir):
+            os.unlink(os.path.join(self.partial_dir, name))
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, digest.replace(':', '-', 1))
+
+    def partial_path(self, digest: str) -> str:
+        return os.path.join(self.partial_dir, digest.replace(':', '-', 1))
+
+    def lookup(self, digest: str) -> Optional[int]:
+        """Return the size of a cached blob and mark it recently used"""
+        with self._lock:
+            size = self._index.get(digest)
+            if size is not None:
+                self._index.move_to_end(digest)
+            return size
+
+    def discard(self, digest: str):
+        """Forget a blob whose file has disappeared"""
+        with self._lock:
+            size = self._index.pop(digest, None)
+            if size is not None:
+                self._size -= size
+
+    def commit(self, digest: str, size: int):
+        """Move a completed download into the store and evict if needed"""
+        os.replace(self.partial_path(digest), self.path(digest))
+        with self._lock:
+            self._index[digest] = size
+            self._index.move_to_end(digest)
+            self._size += size
+            # Never evict the blob that was just added
+            while self._size > self.max_bytes and len(self._index) > 1:
+                old_digest, old_size = self._index.popitem(last=False)
+                self._size -= old_size
+                try:
+                    # Readers holding the file open keep streaming the unlinked inode
+                    os.unlink(self.path(old_digest))
+                except FileNotFoundError:
+                    pass
+                print(f"Evicted {old_digest} ({old_size / 1e9:.2f} GB)")
+
+
+class BlobFetch:
+    """One upstream download shared by every request for the same blob"""
+
+    def __init__(self, digest: str):
+        self.digest = digest
+        self.total = None
+        self.written = 0
+        self.done = False
+        self.error = None
+        self.cond = threading.Condition()
+
+    def wait_for(self, predicate, stall_timeout: float) -> bool:
+        """Wait until ``predicate`` holds or the download fails
+
+        Gives up only once no byte has been written for ``stall_timeout``
+        seconds, so a slow but moving download is never cut off.
+        """
+        with self.cond:
+            while True:
+                written = self.written
+                if not self.cond.wait_for(lambda: self.error or predicate() or self.written != written,
+                                          stall_timeout):
+                    return False
+                if self.error or predicate():
+                    return True
+
+
+class RegistryCache:
+    def __init__(self, store: BlobStore, upstream: str = UPSTREAM_REGISTRY,
+                 manifest_ttl: float = 300, timeout: float = 3600):
+        # Imported here so that resolve_pull_name stays cheap for the pull clients
+        import requests
+        self.store = store
+        self.upstream = upstream.rstrip('/')
+        self.manifest_ttl = manifest_ttl
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.manifest_dir = os.path.join(store.root, 'manifests')
+        self._fetches = {}
+        self._lock = threading.Lock()
+
+    def get_manifest(self, name: str, reference: str) -> Optional[bytes]:
+        """Return a manifest, refreshing it from upstream after the TTL"""
+        path = os.path.join(self.manifest_dir, name, reference)
+        try:
+            fresh = time.time() - os.path.getmtime(path) < self.manifest_ttl
+        except OSError:
+            fresh = False
+        if not fresh:
+            try:
+                response = self.session.get(f"{self.upstream}/v2/{name}/manifests/{reference}",
+                                            headers={"Accept": MANIFEST_CONTENT_TYPE},
+                                            timeout=self.timeout)
+                if response.status_code == 404:
+                    return None
+                response.raise_for_status()
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # A unique temp file, so concurrent refreshes never write into each other's
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f".{reference}.")
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        f.write(response.content)
+                    os.replace(tmp_path, path)
+                except BaseException:
+                    os.unlink(tmp_path)
+                    raise
+                return response.content
+            except Exception as e:
+                # Serve a stale manifest rather than failing the pull
+                print(f"Error refreshing manifest {name}:{reference}: {e}")
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def get_blob(self, name: str, digest: str):
+        """Return ("cached", size) or ("fetch", BlobFetch) for a blob"""
+        size = self.store.lookup(digest)
+        if size is not None:
+            return "cached", size
+        with self._lock:
+            fetch = self._fetches.get(digest)
+            if fetch is None:
+                # Re-check under the lock: a fetch may have committed meanwhile
+                size = self.store.lookup(digest)
+                if size is not None:
+                    return "cached", size
+                fetch = BlobFetch(digest)
+                open(self.store.partial_path(digest), 'wb').close()
+                self._fetches[digest] = fetch
+                threading.Thread(target=self._download, args=(name, fetch), daemon=True).start()
+        return "fetch", fetch
+
+    def blob_size(self, name: str, digest: str) -> Optional[int]:
+        """Size of a blob without downloading it, or None if upstream does not have it"""
+        size = self.store.lookup(digest)
+        if size is not None:
+            return size
+        with self._lock:
+            fetch = self._fetches.get(digest)
+        if fetch is not None and fetch.total is not None:
+            return fetch.total
+        # Blob URLs usually redirect to a CDN, which answers the HEAD with the size
+        response = self.session.head(f"{self.upstream}/v2/{name}/blobs/{digest}",
+                                     allow_redirects=True, timeout=self.timeout)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return int(response.headers.get("Content-Length", 0)) or None
+
+    def _download(self, name: str, fetch: BlobFetch):
+        digest = fetch.digest
+        hasher = hashlib.sha256()
+        try:
+            with self.session.get(f"{self.upstream}/v2/{name}/blobs/{digest}",
+                                  stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+                total = int(response.headers.get("Content-Length", 0)) or None
+                with fetch.cond:
+                    fetch.total = total
+                    fetch.cond.notify_all()
+                with open(self.store.partial_path(digest), 'r+b') as f:
+                    for chunk in response.iter_content(chunk_size=_FETCH_CHUNK):
+                        f.write(chunk)
+                        f.flush()
+                        hasher.update(chunk)
+                        with fetch.cond:
+                            fetch.written += len(chunk)
+                            fetch.cond.notify_all()
+            if f"sha256:{hasher.hexdigest()}" != digest:
+                raise ValueError("digest mismatch")
+            with fetch.cond:
+                self.store.commit(digest, fetch.written)
+                fetch.total = fetch.written
+                fetch.done = True
+                fetch.cond.notify_all()
+            print(f"Cached {digest} ({fetch.written / 1e9:.2f} GB)")
+        except Exception as e:
+            print(f"Error fetching {digest}: {e}")
+            with fetch.cond:
+                fetch.error = e
+                fetch.cond.notify_all()
+            try:
+                os.unlink(self.store.partial_path(digest))
+            except FileNotFoundError:
+                pass
+        finally:
+            with self._lock:
+                self._fetches.pop(digest, None)
+
+    def open_fetch_file(self, fetch: BlobFetch):
+        """Open the file behind a download, wherever it currently lives"""
+        with fetch.cond:
+            if fetch.error:
+                raise fetch.error
+            path = self.store.path(fetch.digest) if fetch.done else self.store.partial_path(fetch.digest)
+            return open(path, 'rb')
+
+
+class RegistryCacheHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    cache = None
+
+    # Seconds without upstream progress after which a reader gives up
+    stall_timeout = 60
+
+    def do_GET(self):
+        self._handle(send_body=True)
+
+    def do_HEAD(self):
+        self._handle(send_body=False)
+
+    def log_message(self, format, *args):
+        print(f"{self.address_string()} - {format % args}")
+
+    def _send_empty(self, status: int):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _handle(self, send_body: bool):
+        if self.path.rstrip('/') == '/v2':
+            self._send_empty(200)
+            return
+        match = _ROUTE.match(self.path)
+        if not match:
+            self._send_empty(404)
+            return
+        name, kind, ref = match.group('name', 'kind', 'ref')
+        # Names and references become cache paths, so reject anything unusual
+        if not _NAME.match(name) or not _REFERENCE.match(ref):
+            self._send_empty(400)
+        elif kind == 'manifests':
+            self._send_manifest(name, ref, send_body)
+        elif not _DIGEST.match(ref):
+            self._send_empty(400)
+        elif send_body:
+            self._send_blob(name, ref)
+        else:
+            self._send_blob_head(name, ref)
+
+    def _send_manifest(self, name: str, reference: str, send_body: bool):
+        body = self.cache.get_manifest(name, reference)
+        if body is None:
+            self._send_empty(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", MANIFEST_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Docker-Content-Digest", f"sha256:{hashlib.sha256(body).hexdigest()}")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _parse_range(self, total: int) -> Optional[Tuple[int, int]]:
+        header = self.headers.get("Range")
+        if not header:
+            return 0, total - 1
+        match = _RANGE.match(header.strip())
+        if not match or not any(match.groups()):
+            return None
+        first, last = match.groups()
+        if not first:
+            # Suffix range: the last N bytes
+            start, end = max(total - int(last), 0), total - 1
+        else:
+            start, end = int(first), min(int(last), total - 1) if last else total - 1
+        if start > end or start >= total:
+            return None
+        return start, end
+
+    def _send_blob_head(self, name: str, digest: str):
+        """Answer HEAD from the store or upstream metadata without starting a download"""
+        try:
+            size = self.cache.blob_size(name, digest)
+        except Exception as e:
+            print(f"Error checking {digest} upstream: {e}")
+            self._send_empty(502)
+            return
+        if size is None:
+            self._send_empty(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(size))
+        self.send_header("Docker-Content-Digest", digest)
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+
+    def _send_blob(self, name: str, digest: str):
+        state, value = self.cache.get_blob(name, digest)
+        f = None
+        if state == "cached":
+            try:
+                f = open(self.cache.store.path(digest), 'rb')
+            except FileNotFoundError:
+                # Evicted after the lookup: fetch it from upstream again
+                self.cache.store.discard(digest)
+                state, value = self.cache.get_blob(name, digest)
+        fetch = value if state == "fetch" else None
+        if fetch is not None:
+            if not fetch.wait_for(lambda: fetch.total is not None, self.stall_timeout) or fetch.error:
+                self._send_empty(502)
+                return
+            total = fetch.total
+        else:
+            total = value
+
+        byte_range = self._parse_range(total)
+        if byte_range is None:
+            if f is not None:
+                f.close()
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{total}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        start, end = byte_range
+
+        try:
+            if fetch is not None:
+                f = self.cache.open_fetch_file(fetch)
+            elif f is None:
+                f = open(self.cache.store.path(digest), 'rb')
+        except Exception:
+            self._send_empty(502 if fetch else 404)
+            return
+
+        with f:
+            partial = "Range" in self.headers
+            self.send_response(206 if partial else 200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(end - start + 1))
+            self.send_header("Docker-Content-Digest", digest)
+            self.send_header("Accept-Ranges", "bytes")
+            if partial:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{total}")
+            self.end_headers()
+            self._sendfile(f, start, end + 1, fetch)
+
+    def _sendfile(self, f, position: int, stop: int, fetch: Optional[BlobFetch]):
+        while position < stop:
+            available = stop
+            if fetch is not None and not fetch.done:
+                # Tail the download: wait until more of the range is on disk
+                pos = position
+                if not fetch.wait_for(lambda: fetch.done or fetch.written > pos, self.stall_timeout):
+                    self.close_connection = True
+                    return
+                if fetch.error:
+                    self.close_connection = True
+                    return
+                if not fetch.done:
+                    available = min(stop, fetch.written)
+            sent = self.connection.sendfile(f, offset=position, count=available - position)
+            if not sent:
+                self.close_connection = True
+                return
+            position += sent
+
+
+def create_server(cache: RegistryCache, host: str = "0.0.0.0", port: int = 5000) -> ThreadingHTTPServer:
+    handler = type("BoundRegistryCacheHandler", (RegistryCacheHandler,), {"cache": cache})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    settings = config_loader.get_config()
+    cache_settings = settings["registry_cache"]
+    parser = argparse.ArgumentParser(description='Pull-through registry cache for Ollama')
+    parser.add_argument('--host', default=cache_settings["host"], help='Listen address')
+    parser.add_argument('--port', type=int, default=cache_settings["port"], help='Listen port')
+    parser.add_argument('--cache-dir', default=cache_settings["cache_dir"], help='Blob store directory')
+    parser.add_argument('--max-size-gb', type=float, default=cache_settings["max_size_gb"],
+                        help='Evict least recently used blobs above this size')
+    parser.add_argument('--upstream', default=cache_settings["upstream"], help='Upstream registry URL')
+    args = parser.parse_args(sys.argv[1:])
+
+    store = BlobStore(os.path.expanduser(args.cache_dir), int(args.max_size_gb * 1e9))
+    cache = RegistryCache(store, args.upstream, cache_settings["manifest_ttl"],
+                          settings["download_settings"]["timeout"])
+    server = create_server(cache, args.host, args.port)
+    print(f"Registry cache listening on http://{args.host}:{args.port}")
+    print(f"Upstream: {args.upstream}, store: {store.root} ({store.size / 1e9:.2f} GB cached)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping registry cache")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
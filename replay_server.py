@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Replay server for recorded Ollama traffic
+Serves a log written by traffic_recorder.py back over the Ollama API with
+the recorded time to headers and gaps between response records, optionally
+scaled, so client-side changes can be benchmarked offline against real
+response shapes and timing. A request is answered with the recorded
+exchange for the identical payload, or else with the next exchange recorded
+for the same endpoint and streaming mode; repeated requests cycle through the matches in
+recorded order, so runs are deterministic.
+
+Usage: python replay_server.py LOG.ndjson.gz [--port PORT] [--scale 1.0]
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Optional
+
+from traffic_recorder import read_log
+
+
+def request_key(endpoint: str, payload: Dict) -> str:
+    return endpoint + json.dumps(payload, sort_keys=True, separators=(",", ":"))
+
+
+class ReplayLog:
+    """Recorded exchanges indexed by exact request and by (endpoint, streaming)"""
+
+    def __init__(self, entries: Iterable[Dict]):
+        self._exact = {}
+        self._by_endpoint = {}
+        self.context_lengths = {}
+        self.lock = threading.Lock()
+        self.served = 0
+        self.exact_hits = 0
+        self.misses = 0
+        for entry in entries:
+            self._exact.setdefault(request_key(entry["endpoint"], entry["request"]), deque()).append(entry)
+            self._by_endpoint.setdefault((entry["endpoint"], entry["stream"]), deque()).append(entry)
+            model = entry["request"].get("model")
+            if model and entry.get("context_length"):
+                self.context_lengths[model] = entry["context_length"]
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._by_endpoint.values())
+
+    @property
+    def models(self) -> list:
+        return sorted({entry["request"].get("model") for entries in self._by_endpoint.values()
+                       for entry in entries if entry["request"].get("model")})
+
+    def match(self, endpoint: str, payload: Dict) -> Optional[Dict]:
+        with self.lock:
+            queue = self._exact.get(request_key(endpoint, payload))
+            exact = queue is not None
+            if not exact:
+                # Ollama streams unless told otherwise
+                queue = self._by_endpoint.get((endpoint, payload.get("stream", True) is not False))
+            if not queue:
+                self.misses += 1
+                return None
+            entry = queue.popleft()
+            queue.append(entry)
+            self.served += 1
+            self.exact_hits += exact
+            return entry
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    log = None
+    scale = 1.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": name, "model": name, "size": 0, "digest": "0" * 64,
+                                         "details": {"family": name.split(":")[0]}} for name in self.log.models]})
+        elif self.path == "/api/ps":
+            self._send_json({"models": []})
+        elif self.path == "/api/version":
+            self._send_json({"version": "0.0.0-replay"})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length)) if length else {}
+        except ValueError:
+            self._send_json({"error": "invalid JSON"}, 400)
+            return
+        endpoint = self.path[len("/api"):] if self.path.startswith("/api/") else self.path
+        if endpoint == "/show":
+            length = self.log.context_lengths.get(payload.get("name") or payload.get("model"))
+            self._send_json({"details": {"family": "replay"}, "parameters": "",
+                             "model_info": {"replay.context_length": length} if length else {}})
+            return
+        entry = self.log.match(endpoint, payload)
+        if entry is None:
+            self._send_json({"error": f"no recorded exchange for {endpoint}"}, 404)
+            return
+        try:
+            self._replay(entry)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def _replay(self, entry: Dict):
+        """Send the recorded response, keeping to the recorded schedule"""
+        due = time.perf_counter()
+
+        def wait(delay_ms: float):
+            nonlocal due
+            # Sleep to a cumulative deadline so per-record overhead does not add up
+            due += (delay_ms or 0.0) * self.scale / 1000.0
+            remaining = due - time.perf_counter()
+            if remaining > 0:
+                time.sleep(remaining)
+
+        status = entry.get("status") or 502
+        if not entry["stream"] or status >= 400:
+            wait(entry.get("headers_ms"))
+            for delay, _ in entry["chunks"]:
+                wait(delay)
+            if status >= 400 or not entry["chunks"]:
+                self._send_json({"error": entry.get("error") or f"recorded HTTP {status}"}, status)
+            else:
+                self._send_json(entry["chunks"][0][1])
+            return
+
+        wait(entry.get("headers_ms"))
+        self.send_response(status)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for delay, record in entry["chunks"]:
+            wait(delay)
+            self._write_chunk(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+        self._write_chunk(b"")
+
+
+class ReplayHTTPServer(ThreadingHTTPServer):
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def create_server(log: ReplayLog, host: str = "127.0.0.1", port: int = 11434,
+                  scale: float = 1.0) -> ThreadingHTTPServer:
+    """``scale`` multiplies every recorded delay: 0.5 replays twice as fast, 0 without waiting"""
+    handler = type("BoundReplayHandler", (ReplayHandler,), {"log": log, "scale": scale})
+    return ReplayHTTPServer((host, port), handler)
+
+
+def start_replay_server(path: str, scale: float = 1.0, host: str = "127.0.0.1", port: int = 0):
+    """Start a replay server on a background thread; returns (server, base URL)"""
+    server = create_server(ReplayLog(read_log(path)), host, port, scale)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay recorded Ollama traffic with its original timing')
+    parser.add_argument('log', help='Log written with OLLAMA_RECORD')
+    parser.add_argument('--host', default='127.0.0.1', help='Listen address')
+    parser.add_argument('--port', type=int, default=11434, help='Listen port')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Multiply recorded delays (0.5 = twice as fast, 0 = no delays)')
+    args = parser.parse_args(sys.argv[1:])
+    if args.scale < 0:
+        print("Error: --scale must not be negative")
+        sys.exit(1)
+
+    log = ReplayLog(read_log(args.log))
+    if not len(log):
+        print(f"Error: no exchanges in {args.log}")
+        sys.exit(1)
+    server = create_server(log, args.host, args.port, args.scale)
+    print(f"Replaying {len(log)} exchanges for {', '.join(log.models) or 'no model'} "
+          f"on http://{args.host}:{args.port} at {args.scale}x recorded delays")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nServed {log.served} requests ({log.exact_hits} exact matches, {log.misses} unmatched)")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Per-request timing capture and slow-request log
+Combines Ollama's server-side counters (load, prompt eval, decode) with
+client-side pool wait, connect, time to headers and transfer, so tail
+latency can be attributed to a phase. Requests slower than the configured
+threshold are appended, sampled, to a JSON-lines slow-request log.
+
+Usage: python request_timing.py [--path PATH] [--top N]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+import config_loader
+from result_types import RequestTimings
+
+_local = threading.local()
+
+
+class RequestTimer:
+    """Collects client-side timestamps for one request"""
+
+    __slots__ = ("endpoint", "start", "pool_wait", "connect", "headers", "first_token", "_acquired", "_connect_start")
+
+    def __init__(self, endpoint: str = ""):
+        self.endpoint = endpoint
+        self.start = time.perf_counter()
+        self.pool_wait = 0.0
+        self.connect = 0.0
+        self.headers = None
+        self.first_token = None
+        self._acquired = None
+        self._connect_start = None
+
+    def mark_headers(self, response=None):
+        """Response headers received; picks up the connection timings set by TimingAdapter"""
+        self.headers = time.perf_counter()
+        if response is not None:
+            self.pool_wait = getattr(response, "pool_wait", self.pool_wait)
+            self.connect = getattr(response, "connect_time", self.connect)
+
+    def mark_first_token(self):
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+
+    async def trace(self, name: str, info: Dict):
+        """httpx ``trace`` extension callback recording pool wait and connect time"""
+        now = time.perf_counter()
+        if self._acquired is None and (name == "connection.connect_tcp.started"
+                                       or name.endswith(".send_request_headers.started")):
+            # The first event after a connection is handed out ends the pool wait
+            self._acquired = now
+            self.pool_wait = now - self.start
+        if name == "connection.connect_tcp.started":
+            self._connect_start = now
+        elif name in ("connection.connect_tcp.complete", "connection.start_tls.complete") and self._connect_start:
+            self.connect = now - self._connect_start
+
+    def finish(self, payload: Dict) -> RequestTimings:
+        """Combine the client timestamps with the server counters of the final record"""
+        end = time.perf_counter()
+        headers = self.headers or end
+        return RequestTimings.from_payload(
+            payload,
+            endpoint=self.endpoint,
+            wall=end - self.start,
+            pool_wait=self.pool_wait,
+            connect=self.connect,
+            ttfb=headers - self.start,
+            first_token=None if self.first_token is None else self.first_token - self.start,
+            transfer=end - headers,
+        )
+
+
+class _ConnectTimer:
+    """Connection mixin accumulating connect (TCP + TLS) time on the calling thread"""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _local.connect = getattr(_local, "connect", 0.0) + time.perf_counter() - start
+
+
+class _AcquireTimer:
+    """Pool mixin accumulating the time spent waiting for a free connection"""
+
+    def _get_conn(self, timeout=None):
+        start = time.perf_counter()
+        try:
+            return super()._get_conn(timeout)
+        finally:
+            _local.pool_wait = getattr(_local, "pool_wait", 0.0) + time.perf_counter() - start
+
+
+class TimedHTTPConnection(_ConnectTimer, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_ConnectTimer, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(_AcquireTimer, HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(_AcquireTimer, HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimingAdapter(HTTPAdapter):
+    """Transport adapter whose responses carry ``pool_wait`` and ``connect_time``"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+    def send(self, request, *args, **kwargs):
+        # urllib3 acquires and opens connections on the calling thread
+        _local.pool_wait = _local.connect = 0.0
+        response = super().send(request, *args, **kwargs)
+        response.pool_wait = _local.pool_wait
+        response.connect_time = _local.connect
+        return response
+
+
+def timed_session() -> requests.Session:
+    """requests.Session mounted with TimingAdapter for http and https"""
+    session = requests.Session()
+    adapter = TimingAdapter()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class SlowRequestLog:
+    """Appends sampled slow (and a baseline of normal) requests as JSON lines"""
+
+    def __init__(self, settings_source=None, rng: random.Random = None):
+        self._settings_source = settings_source or (lambda: config_loader.get_config()["slow_request_log"])
+        self._random = (rng or random.Random()).random
+        self._lock = threading.Lock()
+
+    def record(self, timings: RequestTimings) -> bool:
+        """Log the request if it is selected by the slow or baseline sampling; returns whether it was written"""
+        settings = self._settings_source()
+        slow = timings.wall * 1000 >= settings["threshold_ms"]
+        rate = settings["sample_rate"] if slow else settings["baseline_sample_rate"]
+        if not rate or self._random() >= rate:
+            return False
+
+        entry = {"ts": datetime.now(timezone.utc).isoformat(), "slow": slow,
+                 "threshold_ms": settings["threshold_ms"], "sample_rate": rate}
+        entry.update(timings.to_dict())
+        path = os.path.expanduser(settings["path"])
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        try:
+            with self._lock:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+        except OSError as e:
+            print(f"Error writing slow request log {path}: {e}")
+            return False
+        return True
+
+
+_slow_log = SlowRequestLog()
+
+
+def record(timings: RequestTimings) -> RequestTimings:
+    """Feed a finished request to the process-wide slow-request log"""
+    _slow_log.record(timings)
+    return timings
+
+
+def summarize(path: str, top: int = 10) -> Optional[Dict]:
+    """Aggregate a slow-request log by dominant phase"""
+    by_phase = {}
+    slowest = []
+    try:
+        with open(os.path.expanduser(path), 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if not entry.get("slow"):
+                    continue
+                phase = entry.get("dominant_phase", "unknown")
+                by_phase[phase] = by_phase.get(phase, 0) + 1
+                slowest.append(entry)
+    except FileNotFoundError:
+        return None
+    slowest.sort(key=lambda e: e.get("wall_ms", 0), reverse=True)
+    return {"by_phase": by_phase, "slowest": slowest[:top]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize the slow-request log')
+    parser.add_argument('--path', help='Log file (default: slow_request_log.path from config)')
+    parser.add_argument('--top', type=int, default=10, help='Number of slowest requests to show')
+    args = parser.parse_args(sys.argv[1:])
+
+    path = args.path or config_loader.get_config()["slow_request_log"]["path"]
+    summary = summarize(path, args.top)
+    if summary is None:
+        print(f"No slow request log at {path}")
+        return
+
+    total = sum(summary["by_phase"].values())
+    print(f"Slow requests in {path}: {total}")
+    print("=" * 50)
+    for phase, count in sorted(summary["by_phase"].items(), key=lambda item: -item[1]):
+        print(f"  {phase:<12s} {count:6d}  ({count / total * 100:.1f}%)")
+    print(f"\nSlowest {len(summary['slowest'])}:")
+    for entry in summary["slowest"]:
+        phases = " ".join(f"{k}={v:.0f}" for k, v in entry["phases_ms"].items() if v)
+        endpoint = entry.get("endpoint") or ""
+        model = entry.get("model") or ""
+        print(f"  {entry['ts']}  {endpoint:<10s} {model:<16s} {entry['wall_ms']:9.0f} ms  {phases}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Typed result objects for Ollama API responses
+Slotted, frozen dataclasses replace the ad-hoc dicts returned by the clients.
+The original JSON payload is kept in its compact serialized form and only
+parsed again when ``raw`` is accessed.
+"""
+
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple, Union
+
+RawPayload = Union[bytes, str, Dict[str, Any], None]
+
+
+def _load_raw(result, raw: RawPayload) -> Optional[Dict[str, Any]]:
+    if isinstance(raw, (bytes, str)):
+        raw = json.loads(raw)
+        # Cache the parsed payload; frozen dataclasses need object.__setattr__
+        object.__setattr__(result, '_raw', raw)
+    return raw
+
+
+@dataclass(frozen=True, slots=True)
+class ChatResult:
+    """Result of a non-streaming /api/chat call"""
+    response: str
+    context: Tuple[int, ...] = ()
+    total_duration: int = 0
+    load_duration: int = 0
+    prompt_eval_count: int = 0
+    prompt_eval_duration: int = 0
+    eval_count: int = 0
+    eval_duration: int = 0
+    model: str = ""
+    done: bool = True
+    timings: Optional['RequestTimings'] = field(default=None, compare=False)
+    _raw: RawPayload = field(default=None, repr=False, compare=False)
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any], raw: RawPayload = None,
+                     timings: Optional['RequestTimings'] = None) -> 'ChatResult':
+        return cls(
+            response=payload.get("message", {}).get("content", ""),
+            context=tuple(payload.get("context") or ()),
+            total_duration=payload.get("total_duration", 0),
+            load_duration=payload.get("load_duration", 0),
+            prompt_eval_count=payload.get("prompt_eval_count", 0),
+            prompt_eval_duration=payload.get("prompt_eval_duration", 0),
+            eval_count=payload.get("eval_count", 0),
+            eval_duration=payload.get("eval_duration", 0),
+            model=payload.get("model", ""),
+            done=payload.get("done", True),
+            timings=timings,
+            _raw=raw,
+        )
+
+    @property
+    def raw(self) -> Optional[Dict[str, Any]]:
+        """Full response payload, parsed on first access"""
+        return _load_raw(self, self._raw)
+
+
+@dataclass(frozen=True, slots=True)
+class GenerateResult:
+    """Result of a non-streaming /api/generate call"""
+    response: str
+    context: Tuple[int, ...] = ()
+    total_duration: int = 0
+    load_duration: int = 0
+    prompt_eval_count: int = 0
+    prompt_eval_duration: int = 0
+    eval_count: int = 0
+    eval_duration: int = 0
+    model: str = ""
+    done: bool = True
+    timings: Optional['RequestTimings'] = field(default=None, compare=False)
+    _raw: RawPayload = field(default=None, repr=False, compare=False)
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any], raw: RawPayload = None,
+                     timings: Optional['RequestTimings'] = None) -> 'GenerateResult':
+        return cls(
+            response=payload.get("response", ""),
+            context=tuple(payload.get("context") or ()),
+            total_duration=payload.get("total_duration", 0),
+            load_duration=payload.get("load_duration", 0),
+            prompt_eval_count=payload.get("prompt_eval_count", 0),
+            prompt_eval_duration=payload.get("prompt_eval_duration", 0),
+            eval_count=payload.get("eval_count", 0),
+            eval_duration=payload.get("eval_duration", 0),
+            model=payload.get("model", ""),
+            done=payload.get("done", True),
+            timings=timings,
+            _raw=raw,
+        )
+
+    @property
+    def raw(self) -> Optional[Dict[str, Any]]:
+        """Full response payload, parsed on first access"""
+        return _load_raw(self, self._raw)
+
+
+@dataclass(frozen=True, slots=True)
+class RequestTimings:
+    """Where the time of one request went
+
+    Server fields are Ollama's own nanosecond counters from the final
+    record; client fields are wall-clock seconds measured around the call.
+    """
+    endpoint: str = ""
+    model: str = ""
+    wall: float = 0.0
+    pool_wait: float = 0.0
+    connect: float = 0.0
+    ttfb: float = 0.0
+    first_token: Optional[float] = None
+    transfer: float = 0.0
+    total_duration: int = 0
+    load_duration: int = 0
+    prompt_eval_count: int = 0
+    prompt_eval_duration: int = 0
+    eval_count: int = 0
+    eval_duration: int = 0
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any], **client: Any) -> 'RequestTimings':
+        return cls(
+            model=payload.get("model", ""),
+            total_duration=payload.get("total_duration", 0),
+            load_duration=payload.get("load_duration", 0),
+            prompt_eval_count=payload.get("prompt_eval_count", 0),
+            prompt_eval_duration=payload.get("prompt_eval_duration", 0),
+            eval_count=payload.get("eval_count", 0),
+            eval_duration=payload.get("eval_duration", 0),
+            **client,
+        )
+
+    @property
+    def server(self) -> float:
+        return self.total_duration / 1e9
+
+    @property
+    def server_queue(self) -> float:
+        """Server time not spent loading, evaluating the prompt or decoding"""
+        busy = self.load_duration + self.prompt_eval_duration + self.eval_duration
+        return max(self.total_duration - busy, 0) / 1e9
+
+    @property
+    def network(self) -> float:
+        """Client wall time outside the server's own accounting"""
+        if not self.total_duration:
+            return 0.0
+        return max(self.wall - self.server - self.pool_wait - self.connect, 0.0)
+
+    @property
+    def prompt_tokens_per_sec(self) -> float:
+        return self.prompt_eval_count / (self.prompt_eval_duration / 1e9) if self.prompt_eval_duration else 0.0
+
+    @property
+    def eval_tokens_per_sec(self) -> float:
+        return self.eval_count / (self.eval_duration / 1e9) if self.eval_duration else 0.0
+
+    def breakdown(self) -> Dict[str, float]:
+        """Seconds per phase; the phases add up to roughly ``wall``"""
+        return {
+            "pool_wait": self.pool_wait,
+            "connect": self.connect,
+            "network": self.network,
+            "load": self.load_duration / 1e9,
+            "queue": self.server_queue,
+            "prompt_eval": self.prompt_eval_duration / 1e9,
+            "decode": self.eval_duration / 1e9,
+        }
+
+    @property
+    def dominant_phase(self) -> str:
+        phases = self.breakdown()
+        return max(phases, key=phases.get)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "endpoint": self.endpoint,
+            "model": self.model,
+            "wall_ms": round(self.wall * 1000, 2),
+            "ttfb_ms": round(self.ttfb * 1000, 2),
+            "first_token_ms": None if self.first_token is None else round(self.first_token * 1000, 2),
+            "transfer_ms": round(self.transfer * 1000, 2),
+            "phases_ms": {name: round(value * 1000, 2) for name, value in self.breakdown().items()},
+            "dominant_phase": self.dominant_phase,
+            "prompt_eval_count": self.prompt_eval_count,
+            "eval_count": self.eval_count,
+            "prompt_tokens_per_sec": round(self.prompt_tokens_per_sec, 2),
+            "eval_tokens_per_sec": round(self.eval_tokens_per_sec, 2),
+        }
+
+    def summary_line(self) -> str:
+        phases = " ".join(f"{name}={value * 1000:.0f}ms" for name, value in self.breakdown().items() if value)
+        return (f"{self.wall * 1000:.0f}ms total ({phases}); "
+                f"{self.prompt_eval_count} prompt tokens at {self.prompt_tokens_per_sec:.1f}/s, "
+                f"{self.eval_count} output tokens at {self.eval_tokens_per_sec:.1f}/s")
+
+
+@dataclass(frozen=True, slots=True)
+class BudgetReport:
+    """How a request was fitted into the model's context window"""
+    model: str = ""
+    num_ctx: int = 0
+    context_length: int = 0
+    limit: int = 0
+    original_tokens: int = 0
+    prompt_tokens: int = 0
+    dropped_messages: int = 0
+    summarized: bool = False
+    truncated: bool = False
+
+    @property
+    def saved_tokens(self) -> int:
+        return max(self.original_tokens - self.prompt_tokens, 0)
+
+    @property
+    def trimmed(self) -> bool:
+        return bool(self.dropped_messages or self.truncated)
+
+
+@dataclass(frozen=True, slots=True)
+class StructuredResult:
+    """Outcome of a schema-constrained generation with early abort and retry"""
+    value: Any = None
+    valid: bool = False
+    attempts: int = 0
+    aborted: int = 0
+    generated_tokens: int = 0
+    saved_tokens: int = 0
+    error: Optional[str] = None
+    result: Union[ChatResult, GenerateResult, None] = field(default=None, compare=False)
+
+
+@dataclass(frozen=True, slots=True)
+class ModelInfo:
+    """A locally available model as listed by /api/tags"""
+    name: str
+    size: int = 0
+    digest: str = ""
+    modified_at: str = ""
+    family: str = ""
+    parameter_size: str = ""
+    quantization_level: str = ""
+    _raw: RawPayload = field(default=None, repr=False, compare=False)
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any], raw: RawPayload = None) -> 'ModelInfo':
+        details = payload.get("details") or {}
+        return cls(
+            name=payload.get("name") or payload.get("model", "Unknown"),
+            size=payload.get("size", 0),
+            digest=payload.get("digest", ""),
+            modified_at=payload.get("modified_at", ""),
+            family=details.get("family", ""),
+            parameter_size=details.get("parameter_size", ""),
+            quantization_level=details.get("quantization_level", ""),
+            _raw=payload if raw is None else raw,
+        )
+
+    @property
+    def raw(self) -> Optional[Dict[str, Any]]:
+        """Full model entry, parsed on first access"""
+        return _load_raw(self, self._raw)
+
+
+@dataclass(frozen=True, slots=True)
+class PullProgress:
+    """One progress record streamed by /api/pull"""
+    status: str = ""
+    digest: str = ""
+    total: int = 0
+    completed: int = 0
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> 'PullProgress':
+        return cls(
+            status=payload.get("status", ""),
+            digest=payload.get("digest", ""),
+            total=payload.get("total", 0),
+            completed=payload.get("completed", 0),
+        )
+
+    @property
+    def has_progress(self) -> bool:
+        return self.total > 0
+
+    @property
+    def percent(self) -> float:
+        return (self.completed / self.total) * 100 if self.total > 0 else 0
+
+
+@dataclass(frozen=True, slots=True)
+class Job:
+    """A queued pull or delete as reported by the job manager"""
+    id: int
+    kind: str
+    model: str
+    status: str = "queued"
+    message: str = ""
+    completed: int = 0
+    total: int = 0
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: str = ""
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> 'Job':
+        return cls(**{name: payload[name] for name in cls.__dataclass_fields__ if name in payload})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__dataclass_fields__}
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed", "cancelled")
+
+    @property
+    def percent(self) -> float:
+        return (self.completed / self.total) * 100 if self.total > 0 else 0
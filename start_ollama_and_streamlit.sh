@@ -31,10 +31,26 @@ if [ $attempt -gt $max_attempts ]; then
   exit 1
 fi
 
-# Download the default model
-echo "Downloading qwen3:0.6b model..."
-ollama pull qwen3:0.6b || echo "Warning: Model download failed"
-echo "Model setup completed"
+# Download the default model from models/model_config.json
+DEFAULT_MODEL=$(python3 config_loader.py get default_model 2>/dev/null || echo "qwen3:0.6b")
+JOB_MANAGER_PORT=$(python3 config_loader.py get job_manager.port 2>/dev/null || echo 11500)
+
+# Start the job manager; the download is queued there and shown on the Models page
+echo "Starting job manager..."
+python3 job_manager.py serve > /var/log/job_manager.log 2>&1 &
+attempt=1
+while [ $attempt -le 10 ] && ! curl -sf "http://127.0.0.1:$JOB_MANAGER_PORT/health" > /dev/null 2>&1; do
+  sleep 1
+  ((attempt++))
+done
+
+if python3 job_manager.py pull "$DEFAULT_MODEL"; then
+  echo "Queued download of $DEFAULT_MODEL"
+else
+  echo "Downloading $DEFAULT_MODEL model..."
+  ollama pull "$DEFAULT_MODEL" || echo "Warning: Model download failed"
+  echo "Model setup completed"
+fi
 
 # Start Streamlit interface in background
 echo "Starting Streamlit interface on port 8501..."
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """
 Streamlit-based Model Selector for Ollama
-Provides a web interface for users to select and download models
+Provides a web interface for users to select and download models, and a
+chat playground to try them with streamed responses
 """
 
 import streamlit as st
@@ -9,38 +10,18 @@ import subprocess
 import os
 import sys
 import time
-import json
+import uuid
 from typing import Dict, List
 
-# Set page config
-st.set_page_config(
-    page_title="Ollama Model Selector",
-    page_icon="🤖",
-    layout="wide"
-)
-
-# Popular models list
-POPULAR_MODELS = [
-    "qwen3:0.6b",
-    "qwen2.5:0.5b",
-    "qwen2.5:7b",
-    "qwen3:latest",
-    "qwen3:1.7b",
-    "qwen3:4b",
-    "qwen3:14b",
-    "qwen3:32b",
-    "qwen3:235b",
-    "llama3:8b",
-    "llama3:70b",
-    "gemma2:2b",
-    "gemma2:9b",
-    "mistral:7b",
-    "mixtral:8x7b",
-    "phi3:3.8b",
-    "command-r:35b",
-    "yi:9b",
-    "dbrx:132b"
-]
+import config_loader
+from chat_with_default_model import OllamaChatClient
+from job_manager import JobClient
+from model_benchmark import BenchmarkStore, recommend, run_benchmarks, set_default_model
+from model_manager import OllamaModelManager
+from model_selector import alias_mirrored_model, ollama_pull_command
+
+# Redraw the live TTFT / tokens-per-second line at most this often (seconds)
+METRICS_REFRESH = 0.25
 
 def check_ollama_running() -> bool:
     """Check if Ollama service is running"""
@@ -107,8 +88,8 @@ def pull_model(model_name: str):
             status_text.text("Starting download...")
             progress_bar.progress(10)
             
-            # Command to pull model
-            cmd = ["ollama", "pull", model_name]
+            # Command to pull model, through the configured mirror if any
+            cmd, pull_name = ollama_pull_command(model_name)
             process = subprocess.Popen(
                 cmd,
                 stdout=subprocess.PIPE,
@@ -126,7 +107,7 @@ def pull_model(model_name: str):
             
             return_code = process.wait()
             
-            if return_code == 0:
+            if return_code == 0 and alias_mirrored_model(pull_name, model_name):
                 progress_bar.progress(100)
                 st.success(f"✓ Successfully downloaded {model_name}")
                 return True
@@ -139,6 +120,37 @@ def pull_model(model_name: str):
             st.error(f"✗ Error downloading {model_name}: {e}")
             return False
 
+def download_model(model_name: str) -> bool:
+    """Queue the pull with the job manager, or pull in the foreground if it is not running
+    
+    Returns True only when the model was pulled in the foreground.
+    """
+    client = JobClient()
+    if client.available():
+        job = client.enqueue("pull", model_name)
+        if job is not None:
+            st.info(f"Queued download of {model_name} as job #{job.id}; progress is shown under Downloads")
+            return False
+    return pull_model(model_name)
+
+@st.experimental_fragment(run_every=2)
+def jobs_panel(client: JobClient):
+    """Recent pull and delete jobs, refreshed every two seconds without rerunning the page"""
+    jobs = client.list(limit=10)
+    if not jobs:
+        st.caption("No downloads queued")
+        return
+    for job in jobs:
+        label = f"#{job.id} {job.kind} {job.model}: {job.status}"
+        if job.status == "running" and job.total:
+            st.progress(min(job.percent / 100, 1.0), text=f"{label} ({job.percent:.1f}%, {job.message})")
+        elif job.error:
+            st.text(f"{label} ({job.error})")
+        else:
+            st.text(label)
+        if not job.done and st.button("Cancel", key=f"cancel_job_{job.id}"):
+            client.cancel(job.id)
+
 def list_models():
     """List currently available models"""
     try:
@@ -165,7 +177,153 @@ def list_models():
         st.error(f"Error listing models: {e}")
         return []
 
-def main():
+@st.cache_resource(max_entries=64, ttl=3600, show_spinner=False)
+def get_chat_client(session_id: str) -> OllamaChatClient:
+    """One client, and so one keep-alive connection pool, per browser session"""
+    return OllamaChatClient()
+
+@st.cache_data(ttl=10, show_spinner=False)
+def installed_model_names() -> List[str]:
+    """Models the Ollama API reports as installed, cached briefly across reruns"""
+    return [model.name for model in OllamaModelManager().list_models()]
+
+def stream_reply(client: OllamaChatClient, prompt: str, history: List[Dict], metrics, stats: Dict):
+    """Yield reply text as it arrives while updating the TTFT and tokens/sec line"""
+    start = time.perf_counter()
+    last_refresh = 0.0
+    for record in client.stream_chat(prompt, history=history):
+        content = (record.get("message") or {}).get("content", "")
+        if record.get("done"):
+            stats["done"] = True
+        if not content:
+            continue
+        now = time.perf_counter()
+        if stats["ttft"] is None:
+            stats["ttft"] = now - start
+        stats["tokens"] += 1
+        if now - last_refresh >= METRICS_REFRESH:
+            decode = now - start - stats["ttft"]
+            rate = (stats["tokens"] - 1) / decode if decode > 0 else 0.0
+            metrics.caption(f"TTFT {stats['ttft'] * 1000:.0f} ms · {rate:.1f} tokens/s · {stats['tokens']} tokens")
+            last_refresh = now
+        yield content
+
+def chat_page():
+    st.title("💬 Chat Playground")
+    
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+        st.session_state.chat_history = []
+    client = get_chat_client(st.session_state.session_id)
+    
+    with st.sidebar:
+        models = installed_model_names()
+        default_model = config_loader.get_default_model()
+        if default_model not in models:
+            models = [default_model] + models
+        client.model_name = st.selectbox("Model", options=models, index=models.index(client.model_name)
+                                         if client.model_name in models else 0)
+        system_prompt = st.text_area("System prompt", value="")
+        if st.button("🗑️ Clear conversation"):
+            st.session_state.chat_history = []
+    
+    history = st.session_state.chat_history
+    for message in history:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+    
+    prompt = st.chat_input(f"Message {client.model_name}")
+    if not prompt:
+        return
+    
+    with st.chat_message("user"):
+        st.markdown(prompt)
+    
+    with st.chat_message("assistant"):
+        metrics = st.empty()
+        stats = {"ttft": None, "tokens": 0, "done": False}
+        context = ([{"role": "system", "content": system_prompt}] if system_prompt else []) + history
+        reply = st.write_stream(stream_reply(client, prompt, context, metrics, stats))
+        
+        if not stats["done"]:
+            st.error("✗ The model did not finish its reply; check that Ollama is running and the model is installed")
+            return
+        timings = client.last_timings
+        budget = client.last_budget
+        caption = f"TTFT {stats['ttft'] * 1000:.0f} ms" if stats["ttft"] is not None else "No tokens"
+        if timings:
+            caption += f" · {timings.eval_tokens_per_sec:.1f} tokens/s · {timings.eval_count} tokens · {timings.wall:.1f}s total"
+        if budget and budget.trimmed:
+            caption += f" · history trimmed, {budget.saved_tokens} prompt tokens saved"
+        metrics.caption(caption)
+    
+    history.append({"role": "user", "content": prompt})
+    history.append({"role": "assistant", "content": reply if isinstance(reply, str) else "".join(map(str, reply))})
+
+def benchmark_page():
+    st.title("📊 Compare Models")
+    st.markdown("Run the standard prompt set against installed models and compare measured latency")
+    
+    models = installed_model_names()
+    if not models:
+        st.info("No models installed yet; download one on the Models page first")
+        return
+    
+    selected = st.multiselect("Models to benchmark", options=models, default=models[:3])
+    concurrent = st.checkbox("Run models at the same time", value=False,
+                             help="Side by side shows behaviour under contention; one after another isolates each model")
+    
+    if st.button("▶️ Run benchmark", disabled=not selected):
+        log = st.empty()
+        lines = []
+        
+        def progress(message):
+            lines.append(message)
+            log.code("\n".join(lines[-12:]))
+        
+        with st.spinner(f"Benchmarking {len(selected)} model(s)..."):
+            run_benchmarks(selected, concurrent=concurrent, progress=progress)
+        st.success("✓ Benchmark finished")
+    
+    store = BenchmarkStore()
+    try:
+        runs = store.latest()
+    finally:
+        store.close()
+    if not runs:
+        st.info("No benchmark results yet")
+        return
+    
+    st.subheader("Latest results")
+    st.dataframe([{
+        "Model": run.model,
+        "Mode": run.mode,
+        "Load (ms)": round(run.load_ms),
+        "TTFT p50 (ms)": round(run.ttft_p50_ms),
+        "TTFT p95 (ms)": round(run.ttft_p95_ms),
+        "Tokens/s": round(run.tokens_per_sec, 1),
+        "Peak RSS (GB)": round(run.peak_rss_bytes / 1024 ** 3, 2),
+        "Quality (%)": round(run.quality * 100),
+        "Errors": run.errors,
+        "Measured": run.started_at[:19].replace("T", " "),
+    } for run in runs], hide_index=True, use_container_width=True)
+    
+    settings = config_loader.get_config()["benchmark"]
+    best = recommend(runs, settings)
+    if best is None:
+        st.warning(f"No model meets the targets: TTFT p50 ≤ {settings['target_ttft_ms']} ms, "
+                   f"≥ {settings['min_tokens_per_sec']} tokens/s, quality ≥ {settings['min_quality'] * 100:.0f}%")
+        return
+    default_model = config_loader.get_default_model()
+    if best.model == default_model:
+        st.success(f"✓ The default model {default_model} is the best fit for the configured targets")
+    else:
+        st.info(f"Recommended default model: **{best.model}** (currently {default_model})")
+        if st.button(f"Set {best.model} as default model"):
+            set_default_model(best.model)
+            st.success(f"✓ default_model set to {best.model}")
+
+def models_page():
     st.title("🤖 Ollama Model Selector")
     st.markdown("Select and download models for your Ollama service")
     
@@ -193,7 +351,11 @@ def main():
     col1, col2 = st.columns(2)
     
     with col1:
-        selected_model = st.selectbox("Choose from popular models:", options=POPULAR_MODELS)
+        # Re-read on every rerun so config edits show up without a restart
+        popular_models = config_loader.get_available_models()
+        default_model = config_loader.get_default_model()
+        default_index = popular_models.index(default_model) if default_model in popular_models else 0
+        selected_model = st.selectbox("Choose from popular models:", options=popular_models, index=default_index)
     
     with col2:
         custom_model = st.text_input("Or enter custom model name (e.g., 'llama3:8b'):")
@@ -204,7 +366,7 @@ def main():
     # Download button
     if st.button("📥 Download Selected Model", disabled=not model_to_download):
         if model_to_download:
-            success = pull_model(model_to_download)
+            success = download_model(model_to_download)
             if success:
                 st.balloons()
         else:
@@ -212,16 +374,22 @@ def main():
     
     # Quick download buttons for common models
     st.subheader("⚡ Quick Download")
-    cols = st.columns(3)
-    quick_models = ["qwen3:0.6b", "qwen2.5:0.5b", "llama3:8b"]
+    quick_models = config_loader.get_quick_models()
+    cols = st.columns(max(len(quick_models), 1))
     
     for i, model in enumerate(quick_models):
         with cols[i]:
             if st.button(f"Download {model}", key=f"quick_{model}"):
-                success = pull_model(model)
+                success = download_model(model)
                 if success:
                     st.rerun()  # Refresh the page to update model list
     
+    # Background downloads run by the job manager
+    job_client = JobClient()
+    if job_client.available():
+        st.subheader("⏳ Downloads")
+        jobs_panel(job_client)
+    
     # Instructions
     st.subheader("ℹ️ Instructions")
     st.markdown("""
@@ -240,5 +408,21 @@ def main():
     - **Other Models**: `mistral:7b`, `mixtral:8x7b`, `phi3:3.8b`, `command-r:35b`, `yi:9b`, `dbrx:132b`
     """)
 
+def main():
+    # Set page config
+    st.set_page_config(
+        page_title="Ollama Model Selector",
+        page_icon="🤖",
+        layout="wide"
+    )
+    
+    page = st.sidebar.radio("Page", ["📦 Models", "💬 Chat", "📊 Compare"], label_visibility="collapsed")
+    if page == "💬 Chat":
+        chat_page()
+    elif page == "📊 Compare":
+        benchmark_page()
+    else:
+        models_page()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
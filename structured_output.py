@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Incremental JSON Schema validation for structured output
+Checks a JSON document as it streams in, one token at a time, and reports
+the first character after which no continuation can produce a document
+matching the schema, so a generation that has gone off the rails can be
+aborted immediately instead of being validated after the fact.
+
+Supported keywords: type, enum, const, properties, required,
+additionalProperties, items, minItems, maxItems, minLength, maxLength,
+pattern, minimum, maximum, exclusiveMinimum, exclusiveMaximum. Other
+keywords are accepted without being checked.
+
+Usage: python structured_output.py SCHEMA_FILE [DOCUMENT_FILE]
+"""
+
+import argparse
+import json
+import re
+import sys
+from typing import Any, Dict, Optional
+
+WHITESPACE = " \t\r\n"
+NUMBER_CHARS = "0123456789+-.eE"
+HEX_DIGITS = "0123456789abcdefABCDEF"
+ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+LITERALS = {'t': ("true", True), 'f': ("false", False), 'n': ("null", None)}
+NUMBER_PATTERN = re.compile(r'-?(0|[1-9][0-9]*)(\.[0-9]+)?([eE][+-]?[0-9]+)?')
+
+
+class SchemaMismatch(ValueError):
+    """The output can no longer be completed into a document matching the schema"""
+
+
+def _json_type(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    return "array" if isinstance(value, list) else "object"
+
+
+def _enum(schema: Dict) -> Optional[list]:
+    if "enum" in schema:
+        return schema["enum"]
+    if "const" in schema:
+        return [schema["const"]]
+    return None
+
+
+def _types(schema: Dict) -> Optional[set]:
+    types = schema.get("type")
+    if types is None:
+        return None
+    return {types} if isinstance(types, str) else set(types)
+
+
+class _Frame:
+    """One open JSON value on the parser stack"""
+
+    __slots__ = ("kind", "schema", "state", "buffer", "keys", "key", "count", "escape")
+
+    def __init__(self, kind: str, schema: Dict, state: str = "", buffer: str = "", count: int = 0):
+        self.kind = kind
+        self.schema = schema
+        self.state = state
+        self.buffer = buffer
+        self.keys = set()
+        self.key = None
+        self.count = count
+        self.escape = None
+
+
+class IncrementalValidator:
+    """Push-down JSON parser that checks each value against its schema as it is read"""
+
+    def __init__(self, schema: Dict = None):
+        self.schema = schema or {}
+        self._stack = [_Frame("value", self.schema)]
+        self.done = False
+        self.error = None
+        self.consumed = 0
+
+    def feed(self, text: str) -> bool:
+        """Consume more output; False once it can no longer match the schema"""
+        if self.error:
+            return False
+        for ch in text:
+            try:
+                self._step(ch)
+            except SchemaMismatch as e:
+                self.error = f"{e} (at character {self.consumed})"
+                return False
+            self.consumed += 1
+        return True
+
+    def finish(self) -> bool:
+        """End of output: True if it formed one complete, matching document"""
+        if self.error:
+            return False
+        try:
+            # A top-level number has no closing delimiter
+            if self._stack and self._stack[-1].kind == "number":
+                self._end_number(self._stack.pop())
+            if not self.done:
+                raise SchemaMismatch("output ended before the JSON value was complete")
+        except SchemaMismatch as e:
+            self.error = str(e)
+            return False
+        return True
+
+    def _step(self, ch: str):
+        if self.done:
+            if ch not in WHITESPACE:
+                raise SchemaMismatch("unexpected data after the JSON value")
+            return
+        frame = self._stack[-1]
+        kind = frame.kind
+        if kind in ("string", "key"):
+            self._string_char(frame, ch)
+        elif kind == "number":
+            if ch in NUMBER_CHARS:
+                if ch in ".eE" and _types(frame.schema) == {"integer"}:
+                    raise SchemaMismatch("expected an integer")
+                frame.buffer += ch
+                return
+            self._end_number(self._stack.pop())
+            # The delimiter belongs to the enclosing value
+            self._step(ch)
+        elif kind == "literal":
+            if ch != frame.buffer[frame.count]:
+                raise SchemaMismatch(f"invalid literal, expected {frame.buffer!r}")
+            frame.count += 1
+            if frame.count == len(frame.buffer):
+                self._stack.pop()
+                self._check_enum(frame.schema, LITERALS[frame.buffer[0]][1])
+                self._value_done()
+        elif ch in WHITESPACE:
+            return
+        elif kind == "value":
+            self._stack.pop()
+            self._start_value(frame.schema, ch)
+        elif kind == "object":
+            self._object_char(frame, ch)
+        else:
+            self._array_char(frame, ch)
+
+    def _start_value(self, schema: Dict, ch: str):
+        if ch == '{':
+            json_type, frame = "object", _Frame("object", schema, "key_or_end")
+        elif ch == '[':
+            json_type, frame = "array", _Frame("array", schema, "value_or_end")
+        elif ch == '"':
+            json_type, frame = "string", _Frame("string", schema)
+        elif ch == '-' or ch in "0123456789":
+            json_type, frame = "number", _Frame("number", schema, buffer=ch)
+        elif ch in LITERALS:
+            text, value = LITERALS[ch]
+            json_type, frame = _json_type(value), _Frame("literal", schema, buffer=text, count=1)
+        else:
+            raise SchemaMismatch(f"unexpected character {ch!r}")
+
+        types = _types(schema)
+        if types is not None and json_type not in types and not (json_type == "number" and "integer" in types):
+            raise SchemaMismatch(f"expected {' or '.join(sorted(types))}, got {json_type}")
+        enum = _enum(schema)
+        if enum is not None and json_type not in {_json_type(value) for value in enum}:
+            raise SchemaMismatch(f"{json_type} cannot be one of {enum}")
+        self._stack.append(frame)
+
+    def _value_done(self):
+        if not self._stack:
+            self.done = True
+            return
+        parent = self._stack[-1]
+        if parent.kind in ("object", "array"):
+            parent.state = "comma_or_end"
+
+    def _check_enum(self, schema: Dict, value: Any):
+        enum = _enum(schema)
+        if enum is not None and value not in enum:
+            raise SchemaMismatch(f"{value!r} is not one of {enum}")
+
+    def _object_char(self, frame: _Frame, ch: str):
+        if frame.state in ("key_or_end", "key"):
+            if ch == '"':
+                frame.state = "colon"
+                self._stack.append(_Frame("key", frame.schema))
+            elif ch == '}' and frame.state == "key_or_end":
+                self._stack.pop()
+                self._end_object(frame)
+            else:
+                raise SchemaMismatch("expected a property name")
+        elif frame.state == "colon":
+            if ch != ':':
+                raise SchemaMismatch("expected ':'")
+            properties = frame.schema.get("properties") or {}
+            additional = frame.schema.get("additionalProperties")
+            if frame.key in properties:
+                schema = properties[frame.key]
+            else:
+                schema = additional if isinstance(additional, dict) else {}
+            self._stack.append(_Frame("value", schema))
+        elif ch == ',':
+            frame.state = "key"
+        elif ch == '}':
+            self._stack.pop()
+            self._end_object(frame)
+        else:
+            raise SchemaMismatch("expected ',' or '}'")
+
+    def _end_object(self, frame: _Frame):
+        missing = [name for name in frame.schema.get("required", ()) if name not in frame.keys]
+        if missing:
+            raise SchemaMismatch(f"missing required properties {missing}")
+        self._value_done()
+
+    def _array_char(self, frame: _Frame, ch: str):
+        if ch == ']' and frame.state in ("value_or_end", "comma_or_end"):
+            self._stack.pop()
+            if frame.count < frame.schema.get("minItems", 0):
+                raise SchemaMismatch(f"expected at least {frame.schema['minItems']} items")
+            self._value_done()
+        elif frame.state == "comma_or_end":
+            if ch != ',':
+                raise SchemaMismatch("expected ',' or ']'")
+            frame.state = "value"
+        else:
+            frame.count += 1
+            if frame.count > frame.schema.get("maxItems", frame.count):
+                raise SchemaMismatch(f"more than {frame.schema['maxItems']} items")
+            items = frame.schema.get("items")
+            self._start_value(items if isinstance(items, dict) else {}, ch)
+
+    def _string_char(self, frame: _Frame, ch: str):
+        if frame.escape is not None:
+            if frame.escape == "":
+                if ch == 'u':
+                    frame.escape = "u"
+                    return
+                if ch not in ESCAPES:
+                    raise SchemaMismatch(f"invalid escape '\\{ch}'")
+                frame.escape = None
+                self._append(frame, ESCAPES[ch])
+                return
+            if ch not in HEX_DIGITS:
+                raise SchemaMismatch("invalid \\u escape")
+            frame.escape += ch
+            if len(frame.escape) == 5:
+                code = frame.escape[1:]
+                frame.escape = None
+                self._append(frame, chr(int(code, 16)))
+            return
+        if ch == '\\':
+            frame.escape = ""
+        elif ch == '"':
+            self._stack.pop()
+            self._end_string(frame)
+        elif ch < ' ':
+            raise SchemaMismatch("control character in string")
+        else:
+            self._append(frame, ch)
+
+    def _append(self, frame: _Frame, text: str):
+        frame.buffer += text
+        value = frame.buffer
+        schema = frame.schema
+        if frame.kind == "key":
+            # With additionalProperties false a key must be a prefix of a declared property
+            properties = schema.get("properties")
+            if schema.get("additionalProperties") is False and properties is not None \
+                    and not any(name.startswith(value) for name in properties):
+                raise SchemaMismatch(f"unexpected property {value!r}")
+            return
+        if len(value) > schema.get("maxLength", len(value)):
+            raise SchemaMismatch(f"string longer than {schema['maxLength']} characters")
+        enum = _enum(schema)
+        if enum is not None and not any(isinstance(e, str) and e.startswith(value) for e in enum):
+            raise SchemaMismatch(f"{value!r} is not a prefix of any of {enum}")
+
+    def _end_string(self, frame: _Frame):
+        value = frame.buffer
+        schema = frame.schema
+        if frame.kind == "key":
+            parent = self._stack[-1]
+            if value in parent.keys:
+                raise SchemaMismatch(f"duplicate property {value!r}")
+            properties = schema.get("properties")
+            if schema.get("additionalProperties") is False and properties is not None and value not in properties:
+                raise SchemaMismatch(f"unexpected property {value!r}")
+            parent.keys.add(value)
+            parent.key = value
+            return
+        if len(value) < schema.get("minLength", 0):
+            raise SchemaMismatch(f"string shorter than {schema['minLength']} characters")
+        if "pattern" in schema and not re.search(schema["pattern"], value):
+            raise SchemaMismatch(f"{value!r} does not match {schema['pattern']!r}")
+        self._check_enum(schema, value)
+        self._value_done()
+
+    def _end_number(self, frame: _Frame):
+        text = frame.buffer
+        if not NUMBER_PATTERN.fullmatch(text):
+            raise SchemaMismatch(f"invalid number {text!r}")
+        value = float(text) if any(c in text for c in ".eE") else int(text)
+        schema = frame.schema
+        if "minimum" in schema and value < schema["minimum"]:
+            raise SchemaMismatch(f"{value} is below the minimum {schema['minimum']}")
+        if "maximum" in schema and value > schema["maximum"]:
+            raise SchemaMismatch(f"{value} is above the maximum {schema['maximum']}")
+        if "exclusiveMinimum" in schema and value <= schema["exclusiveMinimum"]:
+            raise SchemaMismatch(f"{value} is not above {schema['exclusiveMinimum']}")
+        if "exclusiveMaximum" in schema and value >= schema["exclusiveMaximum"]:
+            raise SchemaMismatch(f"{value} is not below {schema['exclusiveMaximum']}")
+        self._check_enum(schema, value)
+        self._value_done()
+
+
+def validate(text: str, schema: Dict = None) -> Optional[str]:
+    """Validate a complete document; returns the first error or None"""
+    validator = IncrementalValidator(schema)
+    if validator.feed(text) and validator.finish():
+        return None
+    return validator.error
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Validate a JSON document against a schema incrementally')
+    parser.add_argument('schema', help='JSON Schema file')
+    parser.add_argument('document', nargs='?', help='Document file (default: stdin)')
+    args = parser.parse_args(sys.argv[1:])
+
+    with open(args.schema, 'r', encoding='utf-8') as f:
+        schema = json.load(f)
+    if args.document:
+        with open(args.document, 'r', encoding='utf-8') as f:
+            text = f.read()
+    else:
+        text = sys.stdin.read()
+
+    validator = IncrementalValidator(schema)
+    if validator.feed(text) and validator.finish():
+        print("✓ Document matches the schema")
+        return
+    print(f"✗ {validator.error}")
+    if validator.consumed < len(text):
+        print(f"  A streaming client would have stopped after {validator.consumed} of {len(text)} characters")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+"""
+Stub Ollama server for offline testing and load generation
+Emulates the parts of the Ollama API the clients use (/api/generate,
+/api/chat, /api/tags, /api/ps, /api/show, /api/version, /api/pull,
+/api/delete, /api/blobs, /api/create) with configurable time to first token, decode speed, model
+load time, pull duration, parallel slots, error rate and injected faults,
+so client-side behaviour can be measured without a GPU. Requests with a ``format`` get a
+JSON document built from the schema.
+
+Usage: python stub_server.py [--port PORT] [--ttft-ms N] [--tokens-per-sec N] ...
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_MODELS = ["qwen3:0.6b", "qwen2.5:0.5b", "llama3:8b"]
+
+
+@dataclass
+class StubBehavior:
+    """Timing and failure knobs of the stub server"""
+    ttft_ms: float = 50.0
+    tokens_per_sec: float = 100.0
+    output_tokens: int = 64
+    load_ms: float = 0.0
+    parallel: int = 4
+    error_rate: float = 0.0
+    context_length: int = 4096
+    pull_ms: float = 0.0
+    # The first N structured (``format``) responses ignore the format and start with prose
+    malformed_outputs: int = 0
+    # The first N blob uploads drop the connection halfway through the body
+    upload_failures: int = 0
+    # "error" answers 500, "hang" never answers, "reset" drops the connection; can be changed while running
+    fault: str = ""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def example_value(schema: dict):
+    """Small value matching a simple JSON schema"""
+    if schema.get("enum"):
+        return schema["enum"][0]
+    if "const" in schema:
+        return schema["const"]
+    types = schema.get("type", "object")
+    json_type = types if isinstance(types, str) else types[0]
+    if json_type == "object":
+        return {name: example_value(sub) for name, sub in (schema.get("properties") or {}).items()}
+    if json_type == "array":
+        return [example_value(schema.get("items") or {"type": "string"}) for _ in range(schema.get("minItems", 1))]
+    if json_type == "string":
+        return "stub".ljust(schema.get("minLength", 0), "-")
+    if json_type == "integer":
+        return int(schema.get("minimum", 1))
+    if json_type == "number":
+        return float(schema.get("minimum", 1.5))
+    return True if json_type == "boolean" else None
+
+
+def _structured_pieces(schema, malformed: bool, tokens: int) -> list:
+    """Token-sized pieces of a JSON answer; a malformed one opens with prose like a model ignoring the format"""
+    document = json.dumps(example_value(schema) if isinstance(schema, dict) else {"response": "stub"})
+    pieces = [document[i:i + 4] for i in range(0, len(document), 4)]
+    if malformed:
+        prose = ["Sure", "!", " Here", " is", " the", " JSON", ":\n", "```", "json", "\n"]
+        pieces = prose + pieces + ["\n```"] + [f" tok{i}" for i in range(tokens)]
+    return pieces
+
+
+class StubState:
+    """Shared state: loaded models and the slots emulating OLLAMA_NUM_PARALLEL"""
+
+    def __init__(self, behavior: StubBehavior):
+        self.behavior = behavior
+        self.slots = threading.BoundedSemaphore(max(behavior.parallel, 1))
+        self.loaded = set()
+        self.running = Counter()
+        self.unload_pending = set()
+        self.installed = list(STUB_MODELS)
+        self.blobs = set()
+        self.uploads = 0
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.malformed = 0
+        self.cancelled = 0
+        self.faults = 0
+
+    def load(self, model: str) -> float:
+        """Return the load time in seconds paid by this request"""
+        with self.lock:
+            self.requests += 1
+            self.unload_pending.discard(model)
+            if model in self.loaded:
+                return 0.0
+            self.loaded.add(model)
+        return self.behavior.load_ms / 1000.0
+
+    def unload(self, model: str):
+        with self.lock:
+            # Like Ollama, a model is unloaded once the requests running on it have finished
+            if self.running[model]:
+                self.unload_pending.add(model)
+            else:
+                self.loaded.discard(model)
+
+    @contextmanager
+    def serving(self, model: str):
+        with self.lock:
+            self.running[model] += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.running[model] -= 1
+                if not self.running[model] and model in self.unload_pending:
+                    self.unload_pending.discard(model)
+                    self.loaded.discard(model)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY the
+    # second one waits for the client's delayed ACK (~40 ms)
+    disable_nagle_algorithm = True
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(body) if body else {}
+        except ValueError:
+            return {}
+
+    def _send_json(self, payload, status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _inject_fault(self) -> bool:
+        """Apply the configured fault; returns True if the request was consumed by it"""
+        fault = self.state.behavior.fault
+        if not fault:
+            return False
+        with self.state.lock:
+            self.state.faults += 1
+        if fault == "error":
+            self._send_json({"error": "injected fault"}, 500)
+        elif fault == "hang":
+            # Hold the request until the fault is cleared, then drop it unanswered
+            deadline = time.monotonic() + 60
+            while self.state.behavior.fault == "hang" and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.close_connection = True
+        elif fault == "reset":
+            self.close_connection = True
+        return True
+
+    def do_GET(self):
+        if self._inject_fault():
+            return
+        if self.path == "/api/tags":
+            with self.state.lock:
+                installed = list(self.state.installed)
+            self._send_json({"models": [
+                {"name": name, "model": name, "size": 500_000_000, "digest": "0" * 64,
+                 "modified_at": _now(), "details": {"family": name.split(":")[0]}}
+                for name in installed]})
+        elif self.path == "/api/ps":
+            with self.state.lock:
+                loaded = sorted(self.state.loaded)
+            self._send_json({"models": [
+                {"name": name, "model": name, "size": 800_000_000, "size_vram": 800_000_000}
+                for name in loaded]})
+        elif self.path == "/api/version":
+            self._send_json({"version": "0.0.0-stub"})
+        elif self.path in ("/", "/api"):
+            body = b"Ollama is running"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_HEAD(self):
+        if self.path.startswith("/api/blobs/"):
+            with self.state.lock:
+                found = self.path[len("/api/blobs/"):] in self.state.blobs
+            self.send_response(200 if found else 404)
+        else:
+            self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        if self.path.startswith("/api/blobs/"):
+            self._upload_blob(self.path[len("/api/blobs/"):])
+            return
+        payload = self._read_json()
+        if self._inject_fault():
+            return
+        if self.path == "/api/show":
+            self._send_json({"details": {"family": "stub"}, "parameters": "",
+                             "model_info": {"stub.context_length": self.state.behavior.context_length}})
+        elif self.path in ("/api/generate", "/api/chat"):
+            self._generate(payload, chat=self.path == "/api/chat")
+        elif self.path == "/api/pull":
+            self._pull(payload.get("name") or payload.get("model") or "")
+        elif self.path == "/api/create":
+            self._create(payload)
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_DELETE(self):
+        payload = self._read_json()
+        if self._inject_fault():
+            return
+        if self.path != "/api/delete":
+            self._send_json({"error": "not found"}, 404)
+            return
+        name = payload.get("name") or payload.get("model") or ""
+        with self.state.lock:
+            found = name in self.state.installed
+            if found:
+                self.state.installed.remove(name)
+                self.state.loaded.discard(name)
+        if found:
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        else:
+            self._send_json({"error": f"model '{name}' not found"}, 404)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+    def _pull(self, name: str):
+        """Stream pull progress over ``pull_ms``; names starting with "missing" fail"""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        steps = 10
+        total = 500_000_000
+        try:
+            self._write_chunk(b'{"status":"pulling manifest"}\n')
+            if name.startswith("missing"):
+                self._write_chunk(b'{"error":"pull model manifest: file does not exist"}\n')
+            else:
+                for i in range(1, steps + 1):
+                    time.sleep(self.state.behavior.pull_ms / 1000.0 / steps)
+                    record = {"status": f"pulling {'0' * 12}", "digest": "sha256:" + "0" * 64,
+                              "total": total, "completed": total * i // steps}
+                    self._write_chunk(json.dumps(record).encode("utf-8") + b"\n")
+                with self.state.lock:
+                    if name not in self.state.installed:
+                        self.state.installed.append(name)
+                self._write_chunk(b'{"status":"success"}\n')
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client cancelled the pull
+            self.close_connection = True
+
+    def _upload_blob(self, digest: str):
+        length = int(self.headers.get("Content-Length", 0))
+        with self.state.lock:
+            self.state.uploads += 1
+            fail = self.state.uploads <= self.state.behavior.upload_failures
+        if fail:
+            self.rfile.read(length // 2)
+            self.close_connection = True
+            return
+        body = self.rfile.read(length)
+        if f"sha256:{hashlib.sha256(body).hexdigest()}" != digest:
+            self._send_json({"error": "digest mismatch"}, 400)
+            return
+        with self.state.lock:
+            self.state.blobs.add(digest)
+        self.send_response(201)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _create(self, payload: dict):
+        """Stream create progress; every file must have been uploaded as a blob first"""
+        name = payload.get("model") or payload.get("name") or ""
+        with self.state.lock:
+            missing = [digest for digest in (payload.get("files") or {}).values() if digest not in self.state.blobs]
+        if not name or missing:
+            self._send_json({"error": f"missing blob {missing[0]}" if missing else "model name is required"}, 400)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for status in ("parsing GGUF", "writing manifest", "success"):
+            self._write_chunk(json.dumps({"status": status}).encode("utf-8") + b"\n")
+        self._write_chunk(b"")
+        with self.state.lock:
+            if name not in self.state.installed:
+                self.state.installed.append(name)
+
+    def _generate(self, payload: dict, chat: bool):
+        behavior = self.state.behavior
+        model = payload.get("model") or STUB_MODELS[0]
+        if random.random() < behavior.error_rate:
+            self._send_json({"error": "stub: injected failure"}, 500)
+            return
+
+        if not (payload.get("messages") or payload.get("prompt")):
+            # Like Ollama, an empty request only loads or (keep_alive 0) unloads the model
+            if payload.get("keep_alive") in (0, "0", "0s"):
+                self.state.unload(model)
+                self._send_json({"model": model, "created_at": _now(), "response": "",
+                                 "done": True, "done_reason": "unload"})
+            else:
+                load = self.state.load(model)
+                time.sleep(load)
+                self._send_json({"model": model, "created_at": _now(), "response": "",
+                                 "done": True, "done_reason": "load", "load_duration": int(load * 1e9)})
+            return
+
+        start = time.perf_counter()
+        with self.state.slots, self.state.serving(model):
+            queued = time.perf_counter() - start
+            load = self.state.load(model)
+            time.sleep(load)
+            prompt = json.dumps(payload.get("messages") or payload.get("prompt") or "")
+            prompt_tokens = max(len(prompt) // 4, 1)
+            time.sleep(behavior.ttft_ms / 1000.0)
+
+            num_predict = (payload.get("options") or {}).get("num_predict")
+            tokens = min(num_predict, behavior.output_tokens) if num_predict else behavior.output_tokens
+            if payload.get("format"):
+                with self.state.lock:
+                    malformed = self.state.malformed < behavior.malformed_outputs
+                    self.state.malformed += malformed
+                texts = _structured_pieces(payload["format"], malformed, tokens)
+                tokens = len(texts)
+            else:
+                texts = [f"tok{i} " for i in range(tokens)]
+            interval = 1.0 / behavior.tokens_per_sec if behavior.tokens_per_sec > 0 else 0.0
+            stream = payload.get("stream", True)
+
+            def record(text, done):
+                base = {"model": model, "created_at": _now(), "done": done}
+                if chat:
+                    base["message"] = {"role": "assistant", "content": text}
+                else:
+                    base["response"] = text
+                return base
+
+            if stream:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+            decode_start = time.perf_counter()
+            for i, piece in enumerate(texts):
+                if i:
+                    time.sleep(interval)
+                if stream:
+                    try:
+                        self._write_chunk(json.dumps(record(piece, False)).encode("utf-8") + b"\n")
+                    except (BrokenPipeError, ConnectionResetError):
+                        # The client went away; stop generating like Ollama does
+                        with self.state.lock:
+                            self.state.cancelled += 1
+                        self.close_connection = True
+                        return
+            decode = time.perf_counter() - decode_start
+
+        final = record("" if stream else "".join(texts), True)
+        final.update({
+            "done_reason": "stop",
+            "total_duration": int((time.perf_counter() - start) * 1e9),
+            "load_duration": int(load * 1e9),
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(behavior.ttft_ms * 1e6),
+            "eval_count": tokens,
+            "eval_duration": int(decode * 1e9),
+            "stub_queue_duration": int(queued * 1e9),
+        })
+        if stream:
+            self._write_chunk(json.dumps(final).encode("utf-8") + b"\n")
+            self._write_chunk(b"")
+        else:
+            self._send_json(final)
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    # The default backlog of 5 resets connections when a client opens many at once
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def start_stub_server(behavior: StubBehavior = None, host: str = "127.0.0.1", port: int = 0):
+    """Start a stub server on a background thread; returns (server, base URL)"""
+    state = StubState(behavior or StubBehavior())
+    handler = type("BoundStubHandler", (StubHandler,), {"state": state})
+    server = StubHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+def add_behavior_arguments(parser: argparse.ArgumentParser):
+    defaults = StubBehavior()
+    parser.add_argument('--ttft-ms', type=float, default=defaults.ttft_ms, help='Stub time to first token')
+    parser.add_argument('--tokens-per-sec', type=float, default=defaults.tokens_per_sec, help='Stub decode speed')
+    parser.add_argument('--output-tokens', type=int, default=defaults.output_tokens, help='Stub tokens per response')
+    parser.add_argument('--load-ms', type=float, default=defaults.load_ms, help='Stub first-use model load time')
+    parser.add_argument('--parallel', type=int, default=defaults.parallel, help='Stub parallel request slots')
+    parser.add_argument('--error-rate', type=float, default=defaults.error_rate, help='Stub fraction of failed requests')
+    parser.add_argument('--pull-ms', type=float, default=defaults.pull_ms, help='Stub duration of a model pull')
+    parser.add_argument('--malformed-outputs', type=int, default=defaults.malformed_outputs,
+                        help='Number of structured responses that ignore the format')
+    parser.add_argument('--fault', choices=('', 'error', 'hang', 'reset'), default=defaults.fault,
+                        help='Fail every request: 500 errors, hang without answering, or drop the connection')
+
+
+def behavior_from_args(args) -> StubBehavior:
+    return StubBehavior(ttft_ms=args.ttft_ms, tokens_per_sec=args.tokens_per_sec,
+                        output_tokens=args.output_tokens, load_ms=args.load_ms,
+                        parallel=args.parallel, error_rate=args.error_rate, pull_ms=args.pull_ms,
+                        malformed_outputs=args.malformed_outputs, fault=args.fault)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stub Ollama server')
+    parser.add_argument('--host', default='127.0.0.1', help='Listen address')
+    parser.add_argument('--port', type=int, default=11434, help='Listen port')
+    add_behavior_arguments(parser)
+    args = parser.parse_args(sys.argv[1:])
+
+    server, url = start_stub_server(behavior_from_args(args), args.host, args.port)
+    print(f"Stub Ollama server listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("\nStopping stub server")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Tests for the multi-process batch runner against the stub Ollama server
+"""
+
+import asyncio
+import io
+import json
+
+from batch_runner import init_worker, postprocess_chunk, read_records, run_batch, score
+from stub_server import StubBehavior, start_stub_server
+
+
+def test_score_methods():
+    assert score("The answer is Paris.", "paris", "contains") == 1.0
+    assert score(" Paris ", "paris", "exact") == 1.0
+    assert 0 < score("tok0 tok1", "tok0 tok2", "similarity") < 1
+    assert score("", {"a": 1, "b": 2}, "json", {"a": 1, "b": 3}) == 0.5
+    assert score("anything", None, "exact") is None
+
+
+def test_run_batch_in_process_and_with_workers(tmp_path):
+    path = tmp_path / "input.jsonl"
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(20):
+            f.write(json.dumps({"id": f"r{i}", "vars": {"topic": f"item {i}"}, "expected": "tok1"}) + "\n")
+        f.write("\n")
+        f.write(json.dumps({"topic": "no id"}) + "\n")
+
+    server, url = start_stub_server(StubBehavior(ttft_ms=1, tokens_per_sec=1000, output_tokens=3))
+    try:
+        for workers in (0, 2):
+            out = io.BytesIO()
+            stats = asyncio.run(run_batch(read_records(str(path)), out, "qwen3:0.6b", "Describe $topic",
+                                          scoring="contains", workers=workers, concurrency=4, chunk_size=6,
+                                          api_base=f"{url}/api"))
+            rows = [json.loads(line) for line in out.getvalue().splitlines()]
+
+            assert stats.records == 21 and stats.errors == 0
+            assert stats.scored == 20 and stats.mean_score == 1.0
+            assert stats.output_tokens == 63
+            assert sorted(row["id"] for row in rows) == sorted([f"r{i}" for i in range(20)] + ["22"])
+            assert all(row["response"] == "tok0 tok1 tok2 " for row in rows)
+    finally:
+        server.shutdown()
+
+
+def test_unparseable_records_and_responses_become_error_rows(tmp_path):
+    path = tmp_path / "input.jsonl"
+    path.write_text(json.dumps({"id": "ok", "prompt": "Hi"}) + '\n{"id": "cut", "prompt": "Hi\n[1, 2]\n')
+
+    server, url = start_stub_server(StubBehavior(ttft_ms=1, tokens_per_sec=1000, output_tokens=3))
+    try:
+        out = io.BytesIO()
+        stats = asyncio.run(run_batch(read_records(str(path)), out, "qwen3:0.6b", workers=0,
+                                      api_base=f"{url}/api"))
+    finally:
+        server.shutdown()
+    rows = {row["id"]: row for row in map(json.loads, out.getvalue().splitlines())}
+    assert stats.records == 3 and stats.errors == 2
+    assert rows["ok"]["response"] == "tok0 tok1 tok2 " and "error" not in rows["ok"]
+    assert rows["2"]["error"].startswith("invalid input record")
+    assert rows["3"]["error"] == "invalid input record: not a JSON object"
+
+    init_worker("qwen3:0.6b", None, None, "none", {"enabled": False}, None, None)
+    (line, row_score, tokens, ok), = postprocess_chunk([("r1", b'{"response": "tru', None, None, 0.5)])
+    assert not ok and (row_score, tokens) == (None, 0)
+    assert json.loads(line)["error"].startswith("invalid response")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Tests for uploading local model files and creating a model from them, against the stub Ollama server
+"""
+
+from blob_upload import BlobUploader, _ProgressPrinter, sha256_file
+from stub_server import StubBehavior, start_stub_server
+
+
+def _write(path, data: bytes) -> str:
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_push_local_skips_stored_blobs_and_creates_model(tmp_path):
+    weights = _write(tmp_path / "model.gguf", b"GGUF" + bytes(range(256)) * 64)
+    projector = _write(tmp_path / "mmproj.gguf", b"GGUF projector")
+    stub, url = start_stub_server()
+    state = stub.RequestHandlerClass.state
+    try:
+        uploader = BlobUploader(url)
+        projector_digest = sha256_file(projector)
+        assert not uploader.has_blob(projector_digest)
+        assert uploader.push_blob(projector, projector_digest)
+        assert uploader.has_blob(projector_digest)
+
+        assert uploader.push_local("local-model:q4", [weights, projector], parameters={"num_ctx": 4096})
+        # Only the blob the server did not have yet was sent
+        assert state.uploads == 2
+        assert state.blobs == {sha256_file(weights), projector_digest}
+        assert "local-model:q4" in state.installed
+
+        # /api/create refuses files that were never uploaded
+        assert not uploader.create_model("broken", {"other.gguf": "sha256:" + "0" * 64})
+        assert "broken" not in state.installed
+    finally:
+        stub.shutdown()
+
+
+def test_push_blob_retries_dropped_upload_and_restarts_progress(tmp_path, capsys):
+    path = _write(tmp_path / "model.gguf", b"GGUF" * 4096)
+    stub, url = start_stub_server(StubBehavior(upload_failures=1))
+    try:
+        uploader = BlobUploader(url)
+        digest = sha256_file(path)
+        assert uploader.push_blob(path, digest, progress=_ProgressPrinter("Uploading model.gguf"))
+        assert stub.RequestHandlerClass.state.uploads == 2
+        assert uploader.has_blob(digest)
+    finally:
+        stub.shutdown()
+
+    lines = capsys.readouterr().out.splitlines()
+    assert any("failed (attempt 1/3)" in line for line in lines)
+    progress = [line for line in lines if line.startswith("Uploading model.gguf")]
+    # The retry reports its own progress from 0% instead of staying silent at the old 100%
+    assert progress == ["Uploading model.gguf: 0.0%", "Uploading model.gguf: 100.0%"] * 2
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tests for the circuit breaker, against fault-injecting stub servers
+"""
+
+import socket
+import time
+
+import pytest
+
+import circuit_breaker
+import model_manager
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from model_manager import OllamaModelManager
+from stub_server import StubBehavior, start_stub_server
+
+FAST = {"failure_threshold": 3, "reset_timeout": 30, "probe_interval": 0.05, "probe_timeout": 0.5}
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_breaker_opens_and_admits_one_half_open_trial():
+    now = [0.0]
+    breaker = CircuitBreaker("http://x", lambda: {"failure_threshold": 2, "reset_timeout": 10}, clock=lambda: now[0])
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    assert breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+    now[0] = 10.0
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    # A failed trial reopens the circuit for another reset_timeout
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.retry_in() == 10.0
+
+    now[0] = 20.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.failures == 0 and breaker.allow()
+
+
+def test_errors_open_circuit_and_prober_restores_it(monkeypatch):
+    monkeypatch.setattr(circuit_breaker.health, "_settings_source", lambda: FAST)
+    stub, url = start_stub_server(StubBehavior(fault="error"))
+    behavior = stub.RequestHandlerClass.state.behavior
+    manager = OllamaModelManager(url)
+    try:
+        for _ in range(3):
+            assert manager.list_models() == []
+        assert not circuit_breaker.health.is_healthy(url)
+        assert not manager.check_connection()
+
+        faults = stub.RequestHandlerClass.state.faults
+        start = time.perf_counter()
+        for _ in range(100):
+            assert manager.show_model_info("qwen3:0.6b") is None
+        # Fails without touching the network while the host is known to be down
+        assert (time.perf_counter() - start) / 100 < 0.001
+        assert stub.RequestHandlerClass.state.faults == faults
+
+        behavior.fault = ""
+        assert _wait_for(lambda: circuit_breaker.health.is_healthy(url))
+        assert manager.check_connection()
+        assert "qwen3:0.6b" in [model.name for model in manager.list_models()]
+    finally:
+        behavior.fault = ""
+        stub.shutdown()
+        circuit_breaker.health.reset()
+
+
+def test_hang_is_cut_off_by_endpoint_timeout(monkeypatch):
+    monkeypatch.setattr(circuit_breaker.health, "_settings_source", lambda: FAST)
+    monkeypatch.setattr(model_manager, "endpoint_timeout", lambda endpoint: (0.5, 0.2))
+    stub, url = start_stub_server(StubBehavior(fault="hang"))
+    behavior = stub.RequestHandlerClass.state.behavior
+    manager = OllamaModelManager(url)
+    try:
+        start = time.perf_counter()
+        for _ in range(3):
+            assert manager.list_models() == []
+        assert time.perf_counter() - start < 3
+        assert circuit_breaker.health.breaker(url).state == OPEN
+        # Dropped connections count as failures too
+        circuit_breaker.health.reset()
+        behavior.fault = "reset"
+        for _ in range(3):
+            assert not manager.check_connection()
+        assert circuit_breaker.health.breaker(url).state == OPEN
+    finally:
+        behavior.fault = ""
+        stub.shutdown()
+        circuit_breaker.health.reset()
+
+
+def test_refused_connections_fail_fast(monkeypatch):
+    monkeypatch.setattr(circuit_breaker.health, "_settings_source", lambda: FAST)
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        url = f"http://127.0.0.1:{s.getsockname()[1]}"
+    manager = OllamaModelManager(url)
+    try:
+        for _ in range(3):
+            assert not manager.check_connection()
+        assert circuit_breaker.health.status()[url]["state"] == OPEN
+        assert not manager.pull_model("qwen3:0.6b")
+        assert manager.delete_model("qwen3:0.6b") is False
+    finally:
+        circuit_breaker.health.reset()
+
+
+def test_interrupted_half_open_trial_is_released(monkeypatch):
+    monkeypatch.setattr(circuit_breaker.health, "_settings_source",
+                        lambda: dict(FAST, failure_threshold=1, reset_timeout=0))
+
+    def interrupted(*args, **kwargs):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(model_manager.requests, "get", interrupted)
+    monkeypatch.setattr(model_manager.requests, "post", interrupted)
+    manager = OllamaModelManager("http://127.0.0.1:9")
+    breaker = circuit_breaker.health.breaker(manager.host)
+    try:
+        for call in (manager.list_models, manager.check_connection, lambda: manager.pull_model("qwen3:0.6b")):
+            breaker.record_failure()
+            with pytest.raises(KeyboardInterrupt):
+                call()
+            # The trial counted as a failure instead of holding the slot forever
+            assert breaker.state == OPEN and breaker.allow()
+            breaker.record_success()
+    finally:
+        circuit_breaker.health.reset()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tests for the model configuration loader
+"""
+
+import json
+import os
+import threading
+
+import pytest
+
+from config_loader import ConfigError, ConfigLoader, update_config_file, validate_config
+
+
+def write_config(path, config):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+    # Make sure the change is visible even on filesystems with coarse mtimes
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_defaults_are_merged_into_partial_config():
+    config = validate_config({"default_model": "llama3:8b", "download_settings": {"timeout": 60}})
+    assert config["default_model"] == "llama3:8b"
+    assert config["download_settings"]["timeout"] == 60
+    assert config["download_settings"]["use_mirror"] is True
+    assert config["client_settings"]["request_timeout"] > 0
+    # A zero safety margin trusts the token estimate as is
+    assert validate_config({"token_budget": {"safety_margin": 0}})["token_budget"]["safety_margin"] == 0
+
+
+@pytest.mark.parametrize("config", [
+    [],
+    {"default_model": 1},
+    {"default_model": ""},
+    {"available_models": "qwen3:0.6b"},
+    {"download_settings": {"timeout": True}},
+    {"client_settings": {"request_timeout": 0}},
+    {"slow_request_log": {"sample_rate": 1.5}},
+    {"slow_request_log": {"threshold_ms": 0}},
+    {"circuit_breaker": {"failure_threshold": 0}},
+    {"token_budget": {"safety_margin": -0.1}},
+    {"token_budget": {"safety_margin": 1}},
+    {"endpoint_timeouts": {"/tags": "5"}},
+    {"server_log": {"windows": 0}},
+    {"model_swap": {"drain_timeout": -1}},
+])
+def test_invalid_config_is_rejected(config):
+    with pytest.raises(ConfigError):
+        validate_config(config)
+
+
+def test_reloads_when_file_changes(tmp_path):
+    path = tmp_path / "model_config.json"
+    write_config(path, {"default_model": "qwen3:0.6b"})
+    loader = ConfigLoader(str(path), poll_interval=0)
+    assert loader.get()["default_model"] == "qwen3:0.6b"
+
+    write_config(path, {"default_model": "llama3:8b"})
+    assert loader.get()["default_model"] == "llama3:8b"
+    assert loader.version == 2
+
+
+def test_invalid_edit_keeps_last_good_config(tmp_path):
+    path = tmp_path / "model_config.json"
+    write_config(path, {"default_model": "qwen3:0.6b"})
+    loader = ConfigLoader(str(path), poll_interval=0)
+    loader.get()
+
+    path.write_text("{not json", encoding='utf-8')
+    assert loader.get()["default_model"] == "qwen3:0.6b"
+
+
+def test_missing_file_uses_defaults(tmp_path):
+    loader = ConfigLoader(str(tmp_path / "missing.json"))
+    assert loader.get()["default_model"] == "qwen3:0.6b"
+
+
+def test_update_config_file_validates_and_replaces(tmp_path):
+    path = tmp_path / "model_config.json"
+    path.write_text(json.dumps({"default_model": "a", "available_models": ["a", "b"]}))
+
+    update_config_file({"default_model": "b"}, str(path))
+    assert json.loads(path.read_text()) == {"default_model": "b", "available_models": ["a", "b"]}
+
+    with pytest.raises(ConfigError):
+        update_config_file({"default_model": ""}, str(path))
+    assert json.loads(path.read_text())["default_model"] == "b"
+
+
+def test_concurrent_updates_never_corrupt_the_file(tmp_path):
+    path = tmp_path / "model_config.json"
+    path.write_text(json.dumps({"default_model": "a"}))
+    os.chmod(path, 0o644)
+
+    def update(model):
+        for _ in range(20):
+            update_config_file({"default_model": model}, str(path))
+
+    threads = [threading.Thread(target=update, args=(f"model-{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert json.loads(path.read_text())["default_model"].startswith("model-")
+    assert os.listdir(tmp_path) == ["model_config.json"]
+    assert os.stat(path).st_mode & 0o777 == 0o644
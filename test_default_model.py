@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 """
-Test script for the default model (qwen3:0.6b)
+Test script for the default model (from models/model_config.json, qwen3:0.6b by default)
 """
 
 import requests
@@ -9,6 +9,9 @@ import os
 import sys
 import time
 
+import config_loader
+import request_timing
+
 OLLAMA_HOST = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
 OLLAMA_API_BASE = f"{OLLAMA_HOST}/api"
 
@@ -23,12 +26,13 @@ def test_model_availability():
         
         print(f"Available models: {available_models}")
         
-        # Check for the new default model
-        if "qwen3:0.6b" in available_models:
-            print("✓ qwen3:0.6b model is available")
+        # Check for the configured default model
+        model_name = config_loader.get_default_model()
+        if model_name in available_models:
+            print(f"✓ {model_name} model is available")
             return True
         else:
-            print("✗ qwen3:0.6b model is NOT available")
+            print(f"✗ {model_name} model is NOT available")
             # Check for alternative qwen3 models
             qwen3_models = [model for model in available_models if "qwen3" in model]
             if qwen3_models:
@@ -40,7 +44,7 @@ def test_model_availability():
 
 def test_model_generation():
     """Test the generation functionality of the model"""
-    model_name = "qwen3:0.6b"
+    model_name = config_loader.get_default_model()
     
     # Test generation functionality
     payload = {
@@ -51,14 +55,18 @@ def test_model_generation():
     
     try:
         print(f"Testing {model_name} generation functionality...")
-        response = requests.post(f"{OLLAMA_API_BASE}/generate", json=payload, timeout=60)
+        timer = request_timing.RequestTimer("/generate")
+        response = request_timing.timed_session().post(f"{OLLAMA_API_BASE}/generate", json=payload, timeout=60)
+        timer.mark_headers(response)
         response.raise_for_status()
         
         result = response.json()
+        timings = request_timing.record(timer.finish(result))
         response_text = result.get("response", "")
         
         print(f"✓ Model generated response successfully")
         print(f"Response: {response_text[:200]}...")
+        print(f"Timing: {timings.summary_line()}")
         
         return True
     except Exception as e:
@@ -67,7 +75,7 @@ def test_model_generation():
 
 def test_model_chat():
     """Test the chat functionality of the model"""
-    model_name = "qwen3:0.6b"
+    model_name = config_loader.get_default_model()
     
     # Test chat functionality
     payload = {
@@ -83,14 +91,18 @@ def test_model_chat():
     
     try:
         print(f"Testing {model_name} chat functionality...")
-        response = requests.post(f"{OLLAMA_API_BASE}/chat", json=payload, timeout=60)
+        timer = request_timing.RequestTimer("/chat")
+        response = request_timing.timed_session().post(f"{OLLAMA_API_BASE}/chat", json=payload, timeout=60)
+        timer.mark_headers(response)
         response.raise_for_status()
         
         result = response.json()
+        timings = request_timing.record(timer.finish(result))
         assistant_response = result.get("message", {}).get("content", "")
         
         print(f"✓ Model responded successfully to chat request")
         print(f"Response: {assistant_response[:200]}...")
+        print(f"Timing: {timings.summary_line()}")
         
         return True
     except Exception as e:
@@ -98,7 +110,7 @@ def test_model_chat():
         return False
 
 def main():
-    print("Testing qwen3:0.6b model...")
+    print(f"Testing {config_loader.get_default_model()} model...")
     print("=" * 50)
     
     # Test model availability
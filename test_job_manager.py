@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for the background job manager against the stub Ollama server
+"""
+
+import threading
+import time
+
+from job_manager import JobClient, JobManager, JobStore, create_server
+from model_manager import OllamaModelManager
+from stub_server import StubBehavior, start_stub_server
+
+
+def _start(tmp_path, pull_ms):
+    stub, stub_url = start_stub_server(StubBehavior(pull_ms=pull_ms))
+    jobs = JobManager(JobStore(str(tmp_path / "jobs.sqlite3")), workers=2, poll_interval=0.05,
+                      manager_factory=lambda: OllamaModelManager(stub_url))
+    server = create_server(jobs, "127.0.0.1", 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    jobs.start()
+    client = JobClient(f"http://127.0.0.1:{server.server_port}")
+
+    def stop():
+        server.shutdown()
+        jobs.stop()
+        stub.shutdown()
+
+    return client, stub_url, stop
+
+
+def test_pull_and_delete_jobs_run_in_background(tmp_path):
+    client, stub_url, stop = _start(tmp_path, pull_ms=200)
+    try:
+        assert client.available()
+        job = client.enqueue("pull", "gemma2:2b")
+        assert job.status in ("queued", "running")
+        # A second request for the same pull joins the active job
+        assert client.enqueue("pull", "gemma2:2b").id == job.id
+
+        job = client.wait(job.id, interval=0.05)
+        assert job.status == "succeeded"
+        assert job.attempts == 1
+        assert "gemma2:2b" in [model.name for model in OllamaModelManager(stub_url).list_models()]
+
+        assert client.wait(client.enqueue("delete", "gemma2:2b").id, interval=0.05).status == "succeeded"
+        failed = client.wait(client.enqueue("pull", "missing:1b").id, interval=0.05)
+        assert failed.status == "failed" and failed.error
+        assert [j.kind for j in client.list()] == ["pull", "delete", "pull"]
+    finally:
+        stop()
+
+
+def test_cancel_running_and_queued_jobs(tmp_path):
+    client, _, stop = _start(tmp_path, pull_ms=2000)
+    try:
+        running = client.enqueue("pull", "llama3:70b")
+        # Queued behind the running pull of the same model
+        queued = client.enqueue("delete", "llama3:70b")
+        assert client.cancel(queued.id).status == "cancelled"
+
+        client.cancel(running.id)
+        assert client.wait(running.id, interval=0.05).status == "cancelled"
+        assert client.get(999) is None
+    finally:
+        stop()
+
+
+def test_stop_interrupts_running_pull_for_requeue(tmp_path):
+    client, stub_url, stop = _start(tmp_path, pull_ms=5000)
+    try:
+        job = client.enqueue("pull", "llama3:70b")
+        deadline = time.monotonic() + 5
+        while client.get(job.id).status != "running" and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        start = time.perf_counter()
+        stop()
+    # The pull is abandoned at its next progress record instead of running to the end
+    assert time.perf_counter() - start < 2
+
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    assert store.get(job.id).status == "running"
+    assert store.requeue_interrupted() == 1
+
+
+def test_interrupted_jobs_are_requeued(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job, created = store.enqueue("pull", "qwen3:4b")
+    assert created
+    assert store.claim().id == job.id
+    assert store.claim() is None
+    store.close()
+
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    assert store.requeue_interrupted() == 1
+    assert store.claim().attempts == 2
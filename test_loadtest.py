@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests for the latency histogram and the load generator
+"""
+
+import asyncio
+import random
+
+from latency_histogram import LatencyHistogram
+from loadtest import load_trace, run_load
+from stub_server import StubBehavior, start_stub_server
+
+
+def test_histogram_percentiles_within_precision():
+    rng = random.Random(7)
+    values = sorted(rng.randint(1, 10_000_000) for _ in range(10_000))
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+
+    assert histogram.count == len(values)
+    assert histogram.max == values[-1]
+    for p in (50, 90, 99, 99.9):
+        exact = values[int(len(values) * p / 100) - 1]
+        assert abs(histogram.percentile(p) - exact) <= exact / 64 + 1
+
+
+def test_histogram_merge():
+    a, b = LatencyHistogram(), LatencyHistogram()
+    a.record(100, count=3)
+    b.record(5000)
+    a.merge(b)
+
+    assert a.count == 4
+    assert a.min == 100
+    assert a.percentile(100) == 5000
+
+
+def test_load_trace_normalizes_and_speeds_up(tmp_path):
+    trace = tmp_path / "trace.csv"
+    trace.write_text("timestamp,prompt\n1000.0,hello\n1001.0,\n1003.0,bye\n")
+
+    assert load_trace(str(trace), speedup=2) == [(0.0, "hello"), (0.5, None), (1.5, "bye")]
+
+
+def test_run_load_against_stub():
+    server, url = start_stub_server(StubBehavior(ttft_ms=10, tokens_per_sec=1000, output_tokens=5))
+    try:
+        arrivals = [(i * 0.01, None) for i in range(10)]
+        report = asyncio.run(run_load(url, arrivals, ["hi"], "/generate", "qwen3:0.6b",
+                                      max_inflight=32, window=1.0, progress=False))
+    finally:
+        server.shutdown()
+
+    summary = report.summary()
+    assert summary["completed"] == 10
+    assert summary["errors"] == 0
+    assert report.ttft.count == 10
+    assert 10 <= summary["ttft_ms"]["p50"] <= summary["latency_ms"]["p50"]
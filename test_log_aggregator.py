@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Tests for the Ollama server log aggregator
+"""
+
+import os
+import time
+
+from log_aggregator import LogAggregator, LogEvent, WindowedStats, parse_duration, parse_line
+
+SETTINGS = {"path": "", "window_seconds": 60, "windows": 15, "max_routes": 16, "poll_interval": 1.0}
+
+
+def _gin(status=200, duration="1.5s", method="POST", path="/api/chat", stamp="2025/01/10 - 08:00:00"):
+    return f'[GIN] {stamp} | {status} | {duration:>12} |       127.0.0.1 | {method:<8} "{path}"\n'
+
+
+def test_parse_request_load_and_error_lines():
+    assert parse_duration("1m2.5s") == 62.5
+    assert abs(parse_duration("850µs") - 0.00085) < 1e-12
+    assert parse_duration("12.3ms ") == 0.0123
+    assert parse_duration("fast") is None
+
+    event = parse_line(_gin(503, "12.5ms", "GET", "/api/tags?verbose=1"))
+    assert (event.kind, event.status, event.method, event.path) == ("request", 503, "GET", "/api/tags")
+    assert abs(event.seconds - 0.0125) < 1e-12
+
+    load = parse_line('time=2025-01-10T08:00:01.000Z level=INFO source=server.go:619 '
+                      'msg="llama runner started in 2.51 seconds"')
+    assert (load.kind, load.seconds) == ("load", 2.51)
+    error = parse_line('time=2025-01-10T08:00:02.000Z level=ERROR source=sched.go:455 '
+                       'msg="error loading llama server" error="out of memory"')
+    assert (error.kind, error.message) == ("error", "error loading llama server: out of memory")
+    error = parse_line('time=2025-01-10T08:00:03.000Z level=ERROR source=server.go:1 msg=failed error=EOF')
+    assert error.message == "failed: EOF"
+    assert parse_line('time=2025-01-10T08:00:02.000Z level=INFO source=images.go:1 msg="total blobs: 5"') is None
+    assert parse_line("llama_model_loader: loaded meta data") is None
+
+
+def test_tailer_follows_appends_rotation_and_truncation(tmp_path):
+    path = str(tmp_path / "ollama.log")
+    with open(path, "w") as f:
+        f.write(_gin() + _gin(duration="500ms"))
+    aggregator = LogAggregator(path, SETTINGS, from_start=True)
+    assert aggregator.poll() == 2
+
+    with open(path, "a") as f:
+        f.write(_gin(404, "1ms", "GET", "/api/missing"))
+        f.write('[GIN] 2025/01/10 - 08:00:05 | 200 |')
+    assert aggregator.poll() == 1
+    with open(path, "a") as f:
+        f.write('      2s |       127.0.0.1 | POST     "/api/generate"\n')
+    assert aggregator.poll() == 1
+
+    # Rename rotation: the server writes a last line to the old inode before it reopens
+    os.rename(path, path + ".1")
+    with open(path + ".1", "a") as f:
+        f.write(_gin())
+    with open(path, "w") as f:
+        f.write(_gin(500, "3s", stamp="2025/01/10 - 08:01:00"))
+    assert aggregator.poll() == 2
+    assert aggregator.tailer.rotations == 1
+
+    # copytruncate rotation
+    with open(path, "w") as f:
+        f.write(_gin(method="GET", path="/api/ps", stamp="2025/01/10 - 08:01:30"))
+    assert aggregator.poll() == 1
+    assert aggregator.poll() == 0
+
+    snapshot = aggregator.stats.snapshot()
+    assert snapshot["requests"] == 7
+    chat = snapshot["routes"]["POST /api/chat"]
+    assert (chat["requests"], chat["5xx"]) == (4, 1)
+    assert 1400 <= chat["p50_ms"] <= 1600 and 2900 <= chat["max_ms"] <= 3100
+    assert snapshot["routes"]["GET /api/missing"]["4xx"] == 1
+    # Only the last minute
+    assert aggregator.stats.snapshot(60)["requests"] == 2
+    aggregator.tailer.close()
+
+
+def test_windows_expire_and_memory_stays_bounded():
+    stats = WindowedStats(window_seconds=10, windows=6, max_routes=3)
+    start = 1_700_000_000.0
+    for second in range(3600):
+        stats.add(LogEvent("request", start + second, 0.01 * (second % 7 + 1), 200, "POST", f"/api/r{second % 5}"))
+        if second % 100 == 50:
+            stats.add(LogEvent("error", start + second, message=f"error {second}"))
+    assert len(stats._ring) == 6
+    assert all(len(window.routes) <= 4 for window in stats._ring)
+    snapshot = stats.snapshot()
+    assert snapshot["requests"] == 60
+    assert "other" in snapshot["routes"]
+    assert snapshot["errors"] == 1
+
+    # Late events older than the ring are dropped instead of reopening a window
+    stats.add(LogEvent("request", start, 1.0, 200, "GET", "/api/tags"))
+    assert stats.dropped == 1
+    # Idle time ages everything out
+    assert stats.snapshot(now=time.time())["requests"] == 0
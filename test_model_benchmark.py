@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for the model benchmark, result store and recommendation
+"""
+
+import model_benchmark
+from model_benchmark import BenchmarkRun, BenchmarkStore, recommend, run_benchmarks
+from stub_server import StubBehavior, start_stub_server
+
+TARGETS = {"target_ttft_ms": 500, "min_tokens_per_sec": 10, "min_quality": 0.5}
+
+
+def test_recommend_prefers_quality_within_latency_target():
+    runs = [
+        BenchmarkRun("small", "sequential", ttft_p50_ms=80, tokens_per_sec=90, quality=0.5),
+        BenchmarkRun("medium", "sequential", ttft_p50_ms=300, tokens_per_sec=40, quality=0.8),
+        BenchmarkRun("large", "sequential", ttft_p50_ms=2000, tokens_per_sec=8, quality=1.0),
+        BenchmarkRun("broken", "sequential", ttft_p50_ms=10, tokens_per_sec=99, quality=1.0, errors=1),
+    ]
+
+    assert recommend(runs, TARGETS).model == "medium"
+    assert recommend(runs[2:], TARGETS) is None
+
+
+def test_run_benchmarks_against_stub_persists_results():
+    server, url = start_stub_server(StubBehavior(ttft_ms=10, tokens_per_sec=500, output_tokens=4, load_ms=50))
+    store = BenchmarkStore(":memory:")
+    prompts = [("Say tok0", ("tok0",)), ("Say hello", ("hello",))]
+    try:
+        runs = run_benchmarks(["qwen3:0.6b", "llama3:8b"], concurrent=True, prompts=prompts,
+                              num_predict=4, api_base=f"{url}/api", store=store, progress=lambda message: None)
+    finally:
+        server.shutdown()
+
+    assert [run.model for run in runs] == ["qwen3:0.6b", "llama3:8b"]
+    for run in runs:
+        assert run.errors == 0
+        assert run.load_ms >= 50
+        assert run.quality == 0.5
+        assert run.tokens_per_sec > 0
+        assert run.peak_rss_bytes > 0
+    assert {run.model for run in store.latest()} == {"qwen3:0.6b", "llama3:8b"}
+
+
+def test_failed_concurrent_model_is_recorded_with_the_others(monkeypatch):
+    def unload(client, model):
+        if model == "llama3:8b":
+            raise RuntimeError("worker crashed")
+
+    monkeypatch.setattr(model_benchmark, "unload_model", unload)
+    server, url = start_stub_server(StubBehavior(ttft_ms=10, tokens_per_sec=500, output_tokens=4))
+    store = BenchmarkStore(":memory:")
+    prompts = [("Say tok0", ("tok0",)), ("Say hello", ("hello",))]
+    try:
+        runs = run_benchmarks(["qwen3:0.6b", "llama3:8b"], concurrent=True, prompts=prompts,
+                              num_predict=4, api_base=f"{url}/api", store=store, progress=lambda message: None)
+    finally:
+        server.shutdown()
+
+    ok, failed = runs
+    assert ok.errors == 0 and ok.quality == 0.5
+    assert failed.model == "llama3:8b" and failed.errors == 2 and failed.quality == 0.0
+    assert {run.model: run.errors for run in store.latest()} == {"qwen3:0.6b": 0, "llama3:8b": 2}
+    assert recommend(store.latest(), {"min_quality": 0, "target_ttft_ms": 10_000,
+                                      "min_tokens_per_sec": 0}).model == "qwen3:0.6b"
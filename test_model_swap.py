@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for the managed default model swap against the stub Ollama server
+"""
+
+import json
+import threading
+
+import config_loader
+from chat_with_default_model import OllamaChatClient
+from config_loader import ConfigLoader
+from model_manager import OllamaModelManager
+from model_swap import format_report, swap_default_model, tagged
+from stub_server import StubBehavior, start_stub_server
+
+SETTINGS = {"warm_timeout": 5, "drain_timeout": 3, "probe_interval": 0.05, "observe_seconds": 0.4}
+
+
+def _setup(tmp_path, monkeypatch):
+    path = tmp_path / "model_config.json"
+    path.write_text(json.dumps({"default_model": "qwen3:0.6b"}))
+    monkeypatch.setattr(config_loader, "_loader", ConfigLoader(str(path), poll_interval=0.1))
+    stub, url = start_stub_server(StubBehavior(ttft_ms=5, tokens_per_sec=40, output_tokens=16, load_ms=300))
+    return path, stub, OllamaModelManager(url)
+
+
+def test_swap_pulls_warms_switches_and_unloads(tmp_path, monkeypatch):
+    path, stub, manager = _setup(tmp_path, monkeypatch)
+    try:
+        held = []
+
+        def hold():
+            client = OllamaChatClient("qwen3:0.6b")
+            client.api_base = manager.api_base
+            held.append(list(client.stream_generate("A long answer, please")))
+
+        def progress(message):
+            if message.startswith("default_model is now"):
+                # A request still running on the old model when the default changes (~0.4s)
+                thread = threading.Thread(target=hold)
+                thread.start()
+                held.append(thread)
+
+        report = swap_default_model("gemma2:2b", manager, SETTINGS, progress=progress)
+        assert report.ok, report.error
+        assert report.pulled and report.drained and report.unloaded
+        # Ollama kept the old model until the held request finished
+        assert report.drain_s >= 0.35
+        held[0].join()
+        assert held[1][-1]["done"]
+        assert 0.25 <= report.load_s <= 1.0
+        assert json.loads(path.read_text())["default_model"] == "gemma2:2b"
+        assert stub.RequestHandlerClass.state.loaded == {"gemma2:2b"}
+
+        phases = report.phases
+        assert phases["before"]["models"] == ["qwen3:0.6b"]
+        assert phases["after"]["models"] == ["gemma2:2b"]
+        # The new model was loaded before traffic reached it
+        assert phases["after"]["cold"] == 0 and phases["draining"]["cold"] == 0
+        assert all(row["errors"] == 0 for row in phases.values())
+        assert "gemma2:2b" in format_report(report)
+    finally:
+        stub.shutdown()
+
+
+def test_failed_swap_leaves_default_model(tmp_path, monkeypatch):
+    path, stub, manager = _setup(tmp_path, monkeypatch)
+    try:
+        report = swap_default_model("missing:1b", manager, SETTINGS, probe=False, progress=lambda message: None)
+        assert not report.ok and "could not pull" in report.error
+        assert json.loads(path.read_text())["default_model"] == "qwen3:0.6b"
+        assert not swap_default_model("qwen3:0.6b", manager, SETTINGS, probe=False).ok
+        # /api/ps always reports the tag
+        assert tagged("qwen3") == "qwen3:latest" and tagged("qwen3:0.6b") == "qwen3:0.6b"
+        assert tagged("localhost:5000/library/qwen3") == "localhost:5000/library/qwen3:latest"
+    finally:
+        stub.shutdown()
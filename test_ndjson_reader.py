@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Tests for the incremental NDJSON reader
+"""
+
+import asyncio
+
+from ndjson_reader import NDJSONReader, aiter_ndjson, iter_ndjson
+
+STREAM = (b'{"status": "pulling manifest"}\n'
+          b'\n'
+          b'{"response": "\xe4\xbd\xa0\xe5\xa5\xbd", "done": false}\r\n'
+          b'not json\n'
+          b'{"done": true}')
+
+
+def test_records_split_across_chunks():
+    reader = NDJSONReader()
+    records = []
+    for i in range(len(STREAM)):
+        records.extend(reader.feed(STREAM[i:i + 1]))
+    records.extend(reader.close())
+
+    assert records == [{"status": "pulling manifest"},
+                       {"response": "你好", "done": False},
+                       {"done": True}]
+    assert reader.skipped == 1
+    assert reader.pending == 0
+
+
+def test_buffer_keeps_only_unterminated_tail():
+    reader = NDJSONReader()
+    assert reader.feed_all(b'{"a": 1}\n{"b"') == [{"a": 1}]
+    assert reader.pending == len(b'{"b"')
+    assert reader.feed_all(b': 2}\n') == [{"b": 2}]
+    assert reader.pending == 0
+
+
+def test_iter_ndjson_matches_line_splitting():
+    chunks = [STREAM[:7], STREAM[7:40], STREAM[40:]]
+    assert list(iter_ndjson(chunks)) == list(iter_ndjson([STREAM]))
+
+
+def test_aiter_ndjson():
+    async def chunks():
+        for i in range(0, len(STREAM), 5):
+            yield STREAM[i:i + 5]
+
+    async def collect():
+        return [record async for record in aiter_ndjson(chunks())]
+
+    assert asyncio.run(collect()) == list(iter_ndjson([STREAM]))
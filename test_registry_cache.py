@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Tests for the pull-through registry cache, against a fake upstream registry
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from registry_cache import BlobStore, RegistryCache, create_server
+
+MiB = 1024 * 1024
+
+
+def _digest(data: bytes) -> str:
+    return f"sha256:{hashlib.sha256(data).hexdigest()}"
+
+
+class FakeUpstream(BaseHTTPRequestHandler):
+    """Serves blobs in slices, pausing ``delay`` seconds between them"""
+    protocol_version = "HTTP/1.1"
+    blobs = {}
+    calls = None
+    slice_size = MiB
+    delay = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _blob(self):
+        data = self.blobs.get(self.path.rsplit('/', 1)[-1])
+        self.calls[(self.command, self.path)] += 1
+        if data is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return None
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        return data
+
+    def do_HEAD(self):
+        self._blob()
+
+    def do_GET(self):
+        data = self._blob()
+        for offset in range(0, len(data or b""), self.slice_size):
+            if offset:
+                time.sleep(self.delay)
+            self.wfile.write(data[offset:offset + self.slice_size])
+            self.wfile.flush()
+
+
+def _start(tmp_path, blobs, delay=0.0, stall_timeout=60, max_bytes=1 << 30):
+    upstream_handler = type("BoundFakeUpstream", (FakeUpstream,),
+                            {"blobs": {_digest(data): data for data in blobs}, "calls": Counter(),
+                             "delay": delay})
+    upstream = ThreadingHTTPServer(("127.0.0.1", 0), upstream_handler)
+    upstream.daemon_threads = True
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+
+    cache = RegistryCache(BlobStore(str(tmp_path / "cache"), max_bytes),
+                          f"http://127.0.0.1:{upstream.server_port}", timeout=10)
+    server = create_server(cache, "127.0.0.1", 0)
+    server.RequestHandlerClass.stall_timeout = stall_timeout
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return upstream, server, f"http://127.0.0.1:{server.server_port}"
+
+
+def _wait_committed(store, digest):
+    """Downloads are committed just after the last byte is served"""
+    deadline = time.monotonic() + 5
+    while store.lookup(digest) is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return store.lookup(digest)
+
+
+def test_blob_store_evicts_least_recently_used(tmp_path):
+    store = BlobStore(str(tmp_path), max_bytes=250)
+    for digest in ("sha256:a", "sha256:b"):
+        with open(store.partial_path(digest), "wb") as f:
+            f.write(b"x" * 100)
+        store.commit(digest, 100)
+    # Touching "a" makes "b" the eviction candidate
+    assert store.lookup("sha256:a") == 100
+    with open(store.partial_path("sha256:c"), "wb") as f:
+        f.write(b"x" * 100)
+    store.commit("sha256:c", 100)
+    assert store.lookup("sha256:b") is None
+    assert store.size == 200
+
+    # The order survives a restart
+    assert BlobStore(str(tmp_path), max_bytes=250).size == 200
+
+
+def test_concurrent_requests_share_one_download_and_ranges(tmp_path):
+    data = bytes(range(256)) * (12 * 1024)
+    digest = _digest(data)
+    upstream, server, url = _start(tmp_path, [data], delay=0.05)
+    blob_url = f"{url}/v2/library/qwen3/blobs/{digest}"
+    try:
+        bodies = [None] * 4
+
+        def pull(index):
+            bodies[index] = requests.get(blob_url, timeout=10).content
+
+        threads = [threading.Thread(target=pull, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert bodies == [data] * 4
+        assert upstream.RequestHandlerClass.calls[("GET", f"/v2/library/qwen3/blobs/{digest}")] == 1
+
+        response = requests.get(blob_url, headers={"Range": "bytes=10-19"}, timeout=10)
+        assert response.status_code == 206 and response.content == data[10:20]
+        assert response.headers["Content-Range"] == f"bytes 10-19/{len(data)}"
+        # Suffix and open-ended ranges
+        assert requests.get(blob_url, headers={"Range": "bytes=-5"}, timeout=10).content == data[-5:]
+        assert requests.get(blob_url, headers={"Range": f"bytes={len(data) - 3}-"}, timeout=10).content == data[-3:]
+        response = requests.get(blob_url, headers={"Range": f"bytes={len(data)}-"}, timeout=10)
+        assert response.status_code == 416 and response.headers["Content-Range"] == f"bytes */{len(data)}"
+    finally:
+        server.shutdown()
+        upstream.shutdown()
+
+
+def test_head_does_not_start_a_download(tmp_path):
+    data = b"weights" * 1000
+    digest = _digest(data)
+    upstream, server, url = _start(tmp_path, [data])
+    try:
+        response = requests.head(f"{url}/v2/library/qwen3/blobs/{digest}", timeout=10)
+        assert response.status_code == 200 and int(response.headers["Content-Length"]) == len(data)
+        missing = requests.head(f"{url}/v2/library/qwen3/blobs/{_digest(b'missing')}", timeout=10)
+        assert missing.status_code == 404
+        calls = upstream.RequestHandlerClass.calls
+        assert sum(count for (method, _), count in calls.items() if method == "GET") == 0
+        assert server.RequestHandlerClass.cache.store.size == 0
+    finally:
+        server.shutdown()
+        upstream.shutdown()
+
+
+def test_slow_download_outlives_the_stall_timeout(tmp_path):
+    data = b"z" * (4 * MiB)
+    digest = _digest(data)
+    # Four slices 0.2s apart take longer than the stall timeout, but never stall for that long
+    upstream, server, url = _start(tmp_path, [data], delay=0.2, stall_timeout=0.4)
+    try:
+        start = time.perf_counter()
+        body = requests.get(f"{url}/v2/library/qwen3/blobs/{digest}", timeout=10).content
+        assert time.perf_counter() - start > 0.4
+        assert body == data
+        assert _wait_committed(server.RequestHandlerClass.cache.store, digest) == len(data)
+    finally:
+        server.shutdown()
+        upstream.shutdown()
+
+
+def test_blob_missing_after_lookup_is_fetched_again(tmp_path):
+    data = b"weights" * 1000
+    digest = _digest(data)
+    upstream, server, url = _start(tmp_path, [data])
+    blob_url = f"{url}/v2/library/qwen3/blobs/{digest}"
+    try:
+        assert requests.get(blob_url, timeout=10).content == data
+        store = server.RequestHandlerClass.cache.store
+        assert _wait_committed(store, digest) == len(data)
+        # Evicted between the store lookup and open()
+        os.unlink(store.path(digest))
+        assert requests.get(blob_url, timeout=10).content == data
+        assert upstream.RequestHandlerClass.calls[("GET", f"/v2/library/qwen3/blobs/{digest}")] == 2
+        assert _wait_committed(store, digest) == len(data) and store.size == len(data)
+    finally:
+        server.shutdown()
+        upstream.shutdown()
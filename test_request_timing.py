@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tests for per-request timing capture and the slow-request log
+"""
+
+import json
+import random
+import sys
+
+from request_timing import RequestTimer, SlowRequestLog, main, timed_session
+from result_types import RequestTimings
+from stub_server import StubBehavior, start_stub_server
+
+FINAL = {"model": "qwen3:0.6b", "total_duration": 900_000_000, "load_duration": 500_000_000,
+         "prompt_eval_count": 20, "prompt_eval_duration": 100_000_000,
+         "eval_count": 50, "eval_duration": 250_000_000}
+
+
+def test_breakdown_attributes_time_to_phases():
+    timings = RequestTimings.from_payload(FINAL, endpoint="/chat", wall=1.0, connect=0.02)
+
+    phases = timings.breakdown()
+    assert timings.dominant_phase == "load"
+    assert abs(phases["queue"] - 0.05) < 1e-9
+    assert abs(phases["network"] - 0.08) < 1e-9
+    assert abs(sum(phases.values()) - timings.wall) < 1e-9
+    assert timings.eval_tokens_per_sec == 200
+
+
+def test_slow_log_samples_slow_and_baseline_requests(tmp_path, monkeypatch, capsys):
+    path = tmp_path / "slow.jsonl"
+    settings = {"path": str(path), "threshold_ms": 500, "sample_rate": 1.0, "baseline_sample_rate": 0.0}
+    log = SlowRequestLog(lambda: settings, random.Random(1))
+
+    assert log.record(RequestTimings.from_payload(FINAL, endpoint="/chat", wall=1.0))
+    assert not log.record(RequestTimings.from_payload(FINAL, endpoint="/chat", wall=0.1))
+
+    entries = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(entries) == 1
+    assert entries[0]["slow"] is True
+    assert entries[0]["dominant_phase"] == "load"
+
+    # Entries without a model (a failed request) still summarize
+    entry = dict(entries[0], model=None)
+    del entry["endpoint"]
+    path.write_text(json.dumps(entry) + "\n")
+    monkeypatch.setattr(sys, "argv", ["request_timing.py", "--path", str(path)])
+    main()
+    assert "Slow requests in" in capsys.readouterr().out
+
+
+def test_timed_session_reports_connect_once_per_connection():
+    server, url = start_stub_server(StubBehavior(ttft_ms=5, output_tokens=2))
+    try:
+        session = timed_session()
+        measured = []
+        for _ in range(2):
+            timer = RequestTimer("/generate")
+            response = session.post(f"{url}/api/generate", json={"prompt": "hi", "stream": False})
+            timer.mark_headers(response)
+            measured.append(timer.finish(response.json()))
+    finally:
+        server.shutdown()
+
+    assert measured[0].connect > 0
+    assert measured[1].connect == 0
+    assert measured[1].eval_count == 2
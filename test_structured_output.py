@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests for incremental schema validation and structured-output retries
+"""
+
+import asyncio
+import json
+import time
+
+from chat_with_default_model import AsyncOllamaChatClient, OllamaChatClient
+from structured_output import IncrementalValidator, validate
+from stub_server import StubBehavior, start_stub_server
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"},
+        "age": {"type": "integer", "minimum": 0},
+        "tags": {"type": "array", "items": {"enum": ["a", "bb"]}, "maxItems": 2},
+    },
+    "required": ["name", "age"],
+    "additionalProperties": False,
+}
+
+
+def test_valid_document_passes_in_any_chunking():
+    document = json.dumps({"name": "Zoë \"Z\"", "age": 31, "tags": ["a", "bb"]}, ensure_ascii=True)
+    assert validate(document, SCHEMA) is None
+    validator = IncrementalValidator(SCHEMA)
+    assert all(validator.feed(ch) for ch in document)
+    assert validator.finish()
+
+
+def test_mismatch_is_reported_at_the_first_impossible_character():
+    cases = [
+        ('Sure! {"name": "x"}', 0),
+        ('{"name": "x", "agx": 1}', 17),
+        ('{"name": "x", "age": 3.5}', 22),
+        ('{"name": "x", "age": 1, "tags": ["c"]}', 34),
+        ('{"name": "x", "age": 1, "tags": ["a", "a", "a"]}', 43),
+        ('{"name": "x"}', 12),
+    ]
+    for text, position in cases:
+        validator = IncrementalValidator(SCHEMA)
+        assert not validator.feed(text), text
+        assert validator.consumed == position, (text, validator.error)
+
+
+def test_truncated_output_fails_only_at_finish():
+    validator = IncrementalValidator(SCHEMA)
+    assert validator.feed('{"name": "x", "age": 4')
+    assert not validator.finish()
+    assert validate('7', {"type": "integer"}) is None
+
+
+def test_structured_generation_aborts_and_retries():
+    server, url = start_stub_server(StubBehavior(ttft_ms=1, tokens_per_sec=200, output_tokens=40,
+                                                 malformed_outputs=1))
+    try:
+        client = OllamaChatClient("qwen3:0.6b")
+        client.api_base = f"{url}/api"
+        result = client.generate_structured("Extract the person", SCHEMA)
+
+        assert result.valid
+        assert result.value == {"name": "stub", "age": 0, "tags": ["a"]}
+        assert (result.attempts, result.aborted) == (2, 1)
+        assert result.saved_tokens == result.result.eval_count - 1
+        # The aborted request was cancelled rather than read to the end
+        deadline = time.monotonic() + 2
+        while server.RequestHandlerClass.state.cancelled == 0 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert server.RequestHandlerClass.state.cancelled == 1
+
+        async def run():
+            async with AsyncOllamaChatClient("qwen3:0.6b") as async_client:
+                async_client.api_base = f"{url}/api"
+                return await async_client.chat_structured("Extract the person", SCHEMA)
+
+        result = asyncio.run(run())
+        assert result.valid and result.attempts == 1 and result.saved_tokens == 0
+    finally:
+        server.shutdown()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for context-window-aware token budgeting
+"""
+
+from chat_with_default_model import OllamaChatClient
+from stub_server import StubBehavior, start_stub_server
+from token_budget import TokenBudget, context_lengths, estimate_message_tokens, estimate_tokens
+
+SETTINGS = {"enabled": True, "num_ctx": 8192, "reserve_output_tokens": 100,
+            "safety_margin": 0.0, "summarize_history": True, "summary_tokens": 40}
+
+
+def make_budget(**overrides):
+    settings = dict(SETTINGS, **overrides)
+    return TokenBudget(lambda: settings)
+
+
+def test_estimate_counts_cjk_per_character():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("a" * 400) == 101
+    assert estimate_tokens("你好" * 50) == 101
+
+
+def test_oldest_turns_are_dropped_and_summarized():
+    history = []
+    for i in range(20):
+        history.append({"role": "user", "content": f"Question {i}. " + "x" * 200})
+        history.append({"role": "assistant", "content": f"Answer {i}. " + "y" * 200})
+    messages = [{"role": "system", "content": "Be brief."}] + history + [{"role": "user", "content": "Last?"}]
+
+    fitted, dropped, summarized, truncated = make_budget().fit_messages(messages, 500)
+
+    assert estimate_message_tokens(fitted) <= 500
+    assert fitted[0]["content"] == "Be brief."
+    assert fitted[1]["content"].startswith("Summary of earlier conversation:")
+    assert fitted[2]["role"] == "user"
+    assert fitted[-1]["content"] == "Last?"
+    assert dropped > 0 and summarized and not truncated
+
+
+def test_long_prompt_is_truncated_and_num_ctx_set():
+    payload = {"model": "m", "prompt": "start " + "filler " * 20000 + "question?"}
+
+    report = make_budget().apply(payload, context_length=4096)
+
+    assert payload["options"]["num_ctx"] == 4096
+    assert payload["prompt"].startswith("start ") and payload["prompt"].endswith("question?")
+    assert report.truncated
+    assert report.prompt_tokens <= report.limit == 3996
+    assert report.saved_tokens == report.original_tokens - report.prompt_tokens > 30000
+
+
+def test_client_uses_model_context_length():
+    server, url = start_stub_server(StubBehavior(ttft_ms=1, output_tokens=1, context_length=1024))
+    try:
+        client = OllamaChatClient("qwen3:0.6b")
+        client.api_base = f"{url}/api"
+        history = [{"role": "user", "content": "z" * 4000}, {"role": "assistant", "content": "ok"}]
+        result = client.chat("hi", history=history)
+    finally:
+        server.shutdown()
+        context_lengths.clear()
+
+    assert result is not None
+    assert client.last_budget.num_ctx == 1024
+    assert client.last_budget.dropped_messages == 2
+    assert client.last_budget.saved_tokens > 900
+
+
+def test_unknown_context_length_leaves_payload_untrimmed():
+    import socket
+
+    import circuit_breaker
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        host = f"http://127.0.0.1:{s.getsockname()[1]}"
+    try:
+        assert context_lengths.get(f"{host}/api", "qwen3:0.6b") is None
+        # Charged to the host that was asked, not the default one
+        assert circuit_breaker.health.breaker(host).failures == 1
+        prompt = "filler " * 20000
+        payload = {"model": "m", "prompt": prompt}
+        assert make_budget().apply(payload, None) is None
+        assert payload == {"model": "m", "prompt": prompt}
+    finally:
+        context_lengths.clear()
+        circuit_breaker.health.reset()
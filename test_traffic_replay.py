@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Tests for recording client traffic and replaying it with the recorded timing
+"""
+
+import asyncio
+import json
+import time
+
+import traffic_recorder
+from chat_with_default_model import AsyncOllamaChatClient, OllamaChatClient, record_text
+from replay_server import start_replay_server
+from stub_server import StubBehavior, start_stub_server
+
+MODEL = "qwen3:0.6b"
+
+
+def _client(url: str) -> OllamaChatClient:
+    client = OllamaChatClient(MODEL)
+    client.api_base = f"{url}/api"
+    return client
+
+
+def _record(path) -> list:
+    stub, url = start_stub_server(StubBehavior(ttft_ms=150, tokens_per_sec=50, output_tokens=10))
+    traffic_recorder.start(str(path))
+    try:
+        client = _client(url)
+        streamed = list(client.stream_generate("Why is the sky blue?"))
+        assert client.generate("Name a color").response
+
+        async def chat():
+            async with AsyncOllamaChatClient(MODEL) as async_client:
+                async_client.api_base = f"{url}/api"
+                return [record async for record in async_client.stream_chat("Hello")]
+
+        assert asyncio.run(chat())
+    finally:
+        traffic_recorder.stop()
+        stub.shutdown()
+    return streamed
+
+
+def test_recorded_log_holds_requests_records_and_timings(tmp_path):
+    path = tmp_path / "traffic.ndjson.gz"
+    streamed = _record(path)
+
+    entries = list(traffic_recorder.read_log(str(path)))
+    assert [(e["endpoint"], e["stream"]) for e in entries] == [("/generate", True), ("/generate", False),
+                                                               ("/chat", True)]
+    first = entries[0]
+    assert first["request"]["prompt"] == "Why is the sky blue?"
+    assert first["status"] == 200 and first["context_length"] == 4096
+    assert [record for _, record in first["chunks"]] == streamed
+    assert first["headers_ms"] >= 100
+    # 10 tokens at 50 tokens/sec
+    assert sum(delay for delay, _ in first["chunks"]) >= 150
+    assert traffic_recorder.summarize(str(path))["/generate"]["requests"] == 2
+
+
+def test_replay_reproduces_responses_and_scales_timing(tmp_path):
+    path = tmp_path / "traffic.ndjson.gz"
+    streamed = _record(path)
+    recorded = next(traffic_recorder.read_log(str(path)))
+    recorded_ms = recorded["headers_ms"] + sum(delay for delay, _ in recorded["chunks"])
+
+    server, url = start_replay_server(str(path), scale=1.0)
+    try:
+        client = _client(url)
+        start = time.perf_counter()
+        replayed = list(client.stream_generate("Why is the sky blue?"))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        assert replayed == streamed
+        assert elapsed_ms >= recorded_ms * 0.9
+        assert server.RequestHandlerClass.log.exact_hits == 1
+
+        # Unrecorded prompts get the next exchange recorded for the endpoint
+        assert client.generate("Something else").response
+        assert "".join(record_text(r) for r in client.stream_chat("Hi there"))
+        assert server.RequestHandlerClass.log.misses == 0
+    finally:
+        server.shutdown()
+
+    server, url = start_replay_server(str(path), scale=0.0)
+    try:
+        start = time.perf_counter()
+        assert list(_client(url).stream_generate("Why is the sky blue?")) == streamed
+        assert (time.perf_counter() - start) * 1000 < recorded_ms / 2
+    finally:
+        server.shutdown()
+
+
+def test_early_close_after_done_and_raw_posts(tmp_path):
+    path = tmp_path / "traffic.ndjson.gz"
+    stub, url = start_stub_server(StubBehavior(ttft_ms=1, tokens_per_sec=1000, output_tokens=4))
+    traffic_recorder.start(str(path))
+    try:
+        client = _client(url)
+        for record in client.stream_generate("Stop at done"):
+            if record["done"]:
+                break
+        for record in client.stream_generate("Stop early"):
+            break
+
+        async def post_raw():
+            async with AsyncOllamaChatClient(MODEL) as async_client:
+                async_client.api_base = f"{url}/api"
+                return await async_client.post_raw("/generate", json.dumps(
+                    {"model": MODEL, "prompt": "Encoded", "stream": False}).encode("utf-8"))
+
+        raw = asyncio.run(post_raw())
+    finally:
+        traffic_recorder.stop()
+        stub.shutdown()
+
+    after_done, early, posted = traffic_recorder.read_log(str(path))
+    # Closing the stream once the done record arrived is a complete exchange
+    assert "error" not in after_done and after_done["chunks"][-1][1]["done"]
+    assert early["error"] == "GeneratorExit"
+    assert (posted["endpoint"], posted["stream"], posted["status"]) == ("/generate", False, 200)
+    assert posted["request"]["prompt"] == "Encoded"
+    assert posted["chunks"][0][1] == json.loads(raw)
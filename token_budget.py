@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Context-window-aware token budgeting
+Estimates prompt size without a tokenizer, caches each model's context
+length from /api/show, and fits chat history or a long prompt into a
+fixed ``num_ctx`` before the request is sent, instead of letting the
+server truncate it silently.
+
+Usage: python token_budget.py [--model MODEL] [FILE]
+"""
+
+import argparse
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import config_loader
+from result_types import BudgetReport
+
+# Average characters per token for Latin-script text
+CHARS_PER_TOKEN = 4.0
+
+# Role markers and separators added by chat templates
+MESSAGE_OVERHEAD = 4
+
+# Failed /api/show lookups are retried after this many seconds
+LOOKUP_RETRY = 60.0
+
+TRUNCATION_MARKER = "\n...[truncated]...\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count
+
+    Latin-script text averages about four characters per token while CJK
+    text is close to one token per character. Both counts come from C-level
+    len() calls: ASCII is one UTF-8 byte per character and CJK is three, so
+    the byte/character difference recovers the number of wide characters.
+    """
+    if not text:
+        return 0
+    chars = len(text)
+    if text.isascii():
+        return int(chars / CHARS_PER_TOKEN) + 1
+    wide = (len(text.encode('utf-8')) - chars) // 2
+    return wide + int((chars - wide) / CHARS_PER_TOKEN) + 1
+
+
+def estimate_message_tokens(messages: List[Dict]) -> int:
+    return sum(estimate_tokens(m.get("content") or "") + MESSAGE_OVERHEAD for m in messages)
+
+
+def truncate_text(text: str, max_tokens: int) -> str:
+    """Cut the middle out of ``text`` so that it fits in ``max_tokens``
+
+    The start (instructions) and the end (usually the actual question) are
+    kept in equal parts.
+    """
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    budget = max(max_tokens - estimate_tokens(TRUNCATION_MARKER), 1)
+    keep = int(len(text) * budget / tokens)
+    while True:
+        head = keep // 2
+        result = text[:head] + TRUNCATION_MARKER + text[len(text) - (keep - head):]
+        if estimate_tokens(result) <= max_tokens or keep <= 1:
+            return result
+        keep = int(keep * 0.9)
+
+
+def summarize_messages(messages: List[Dict], max_tokens: int) -> Optional[str]:
+    """Extractive summary of dropped turns: the first sentence of each, newest first"""
+    lines = []
+    used = estimate_tokens("Summary of earlier conversation:")
+    for message in reversed(messages):
+        content = (message.get("content") or "").strip()
+        if not content:
+            continue
+        first = content.split("\n", 1)[0]
+        for stop in (". ", "? ", "! ", "。", "？", "！"):
+            if stop in first:
+                first = first.split(stop, 1)[0] + stop.strip()
+                break
+        line = f"- {message.get('role', 'user')}: {first[:200]}"
+        cost = estimate_tokens(line) + 1
+        if used + cost > max_tokens:
+            break
+        lines.append(line)
+        used += cost
+    if not lines:
+        return None
+    return "Summary of earlier conversation:\n" + "\n".join(reversed(lines))
+
+
+class ContextLengthCache:
+    """Per-server, per-model context lengths looked up once via /api/show"""
+
+    def __init__(self):
+        self._lengths = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, key) -> Tuple[bool, Optional[int]]:
+        """(found, length); a failed lookup is remembered as unknown until it is retried"""
+        entry = self._lengths.get(key)
+        if entry is None:
+            return False, None
+        length, expires = entry
+        if expires is not None and time.monotonic() >= expires:
+            return False, None
+        return True, length
+
+    def _store(self, key, length: Optional[int]) -> Optional[int]:
+        with self._lock:
+            if length:
+                self._lengths[key] = (length, None)
+            else:
+                # Unknown, not guessed: the server may just be starting
+                self._lengths[key] = (None, time.monotonic() + LOOKUP_RETRY)
+        return length or None
+
+    def get(self, api_base: str, model: str) -> Optional[int]:
+        """Context length of ``model``, or None when the server did not report one"""
+        found, cached = self._cached((api_base, model))
+        if found:
+            return cached
+        from model_manager import OllamaModelManager
+        # Lookups go through the manager of this host, so failures count against its circuit breaker
+        manager = OllamaModelManager(api_base.removesuffix("/api"))
+        return self._store((api_base, model), manager.get_context_length(model))
+
+    async def aget(self, api_base: str, model: str, client) -> Optional[int]:
+        """Async lookup through an httpx.AsyncClient"""
+        found, cached = self._cached((api_base, model))
+        if found:
+            return cached
+        from model_manager import parse_context_length
+        length = None
+        try:
+            response = await client.post(f"{api_base}/show", json={"name": model})
+            response.raise_for_status()
+            length = parse_context_length(response.json())
+        except Exception as e:
+            print(f"Error looking up context length of {model}: {e}")
+        return self._store((api_base, model), length)
+
+    def clear(self):
+        with self._lock:
+            self._lengths.clear()
+
+
+context_lengths = ContextLengthCache()
+
+
+def _newest_that_fit(history: List[Dict], room: int) -> List[Dict]:
+    """Longest suffix of ``history`` within ``room`` tokens, not starting mid-exchange"""
+    start = len(history)
+    while start > 0:
+        cost = estimate_message_tokens([history[start - 1]])
+        if cost > room:
+            break
+        room -= cost
+        start -= 1
+    # An assistant reply without the question that prompted it only confuses the model
+    while start < len(history) and history[start].get("role") == "assistant":
+        start += 1
+    return history[start:]
+
+
+class TokenBudget:
+    """Fits chat and generate payloads into the model's context window"""
+
+    def __init__(self, settings_source: Callable[[], Dict] = None):
+        self._settings_source = settings_source or (lambda: config_loader.get_config()["token_budget"])
+
+    @property
+    def settings(self) -> Dict:
+        return self._settings_source()
+
+    def num_ctx(self, context_length: int) -> int:
+        """Window requested for a model: its context length, capped at ``token_budget.num_ctx``
+
+        The cap is deliberate. KV cache memory grows with num_ctx, and models
+        advertising 32k-128k windows would otherwise be loaded at that size;
+        raise ``token_budget.num_ctx`` to use more of a large model's window.
+        The value is fixed per model because Ollama reloads the model
+        whenever num_ctx changes.
+        """
+        return min(self.settings["num_ctx"], context_length)
+
+    def prompt_limit(self, num_ctx: int, num_predict: Optional[int] = None) -> int:
+        settings = self.settings
+        reserve = num_predict if num_predict and num_predict > 0 else settings["reserve_output_tokens"]
+        # Never give more than half of the window to the answer
+        reserve = min(reserve, num_ctx // 2)
+        return int((num_ctx - reserve) * (1 - settings["safety_margin"]))
+
+    def fit_messages(self, messages: List[Dict], limit: int) -> Tuple[List[Dict], int, bool, bool]:
+        """Drop the oldest turns (and summarize them) until the history fits
+
+        System messages and the latest message are always kept; the latest
+        message is truncated in the middle if it alone exceeds the limit.
+        Returns (messages, dropped count, summarized, truncated).
+        """
+        if estimate_message_tokens(messages) <= limit:
+            return messages, 0, False, False
+
+        system = [m for m in messages[:-1] if m.get("role") == "system"]
+        history = [m for m in messages[:-1] if m.get("role") != "system"]
+        last = messages[-1]
+        room = limit - estimate_message_tokens(system) - estimate_message_tokens([last])
+
+        kept = _newest_that_fit(history, room)
+        summary = None
+        if len(kept) < len(history) and self.settings["summarize_history"]:
+            # Make room for the summary first, then keep what still fits
+            summary_room = min(self.settings["summary_tokens"], room) - MESSAGE_OVERHEAD
+            if summary_room > 0:
+                kept = _newest_that_fit(history, room - summary_room - MESSAGE_OVERHEAD)
+                summary = summarize_messages(history[:len(history) - len(kept)], summary_room)
+        dropped = len(history) - len(kept)
+        fitted = system + ([{"role": "system", "content": summary}] if summary else []) + kept
+
+        truncated = False
+        available = limit - estimate_message_tokens(fitted) - MESSAGE_OVERHEAD
+        content = last.get("content") or ""
+        if estimate_tokens(content) > available:
+            last = dict(last, content=truncate_text(content, max(available, 1)))
+            truncated = True
+        return fitted + [last], dropped, summary is not None, truncated
+
+    def apply(self, payload: Dict, context_length: Optional[int]) -> Optional[BudgetReport]:
+        """Trim a /api/chat or /api/generate payload in place and set options.num_ctx
+
+        Without a known context length (and no num_ctx set by the caller) the
+        payload is left alone rather than trimmed to a guessed window.
+        """
+        if not self.settings["enabled"]:
+            return None
+        options = payload.get("options") or {}
+        if not context_length and not options.get("num_ctx"):
+            return None
+        options = payload.setdefault("options", {})
+        num_ctx = options.get("num_ctx") or self.num_ctx(context_length)
+        options["num_ctx"] = num_ctx
+        limit = self.prompt_limit(num_ctx, options.get("num_predict"))
+
+        dropped, summarized, truncated = 0, False, False
+        if "messages" in payload:
+            original = estimate_message_tokens(payload["messages"])
+            payload["messages"], dropped, summarized, truncated = self.fit_messages(payload["messages"], limit)
+            prompt_tokens = estimate_message_tokens(payload["messages"])
+        else:
+            prompt = payload.get("prompt") or ""
+            original = estimate_tokens(prompt) + estimate_tokens(payload.get("system") or "")
+            available = limit - estimate_tokens(payload.get("system") or "")
+            if estimate_tokens(prompt) > available:
+                payload["prompt"] = truncate_text(prompt, max(available, 1))
+                truncated = True
+            prompt_tokens = estimate_tokens(payload["prompt"]) + estimate_tokens(payload.get("system") or "")
+
+        return BudgetReport(model=payload.get("model", ""), num_ctx=num_ctx, context_length=context_length,
+                            limit=limit, original_tokens=original, prompt_tokens=prompt_tokens,
+                            dropped_messages=dropped, summarized=summarized, truncated=truncated)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Estimate tokens and show how a prompt would be fitted')
+    parser.add_argument('file', nargs='?', help='Prompt file (default: stdin)')
+    parser.add_argument('--model', help='Model (default: default_model from config)')
+    parser.add_argument('--host', default=None, help='Ollama host for the context length lookup')
+    args = parser.parse_args(sys.argv[1:])
+
+    if args.file:
+        with open(args.file, 'r', encoding='utf-8') as f:
+            text = f.read()
+    else:
+        text = sys.stdin.read()
+
+    from model_manager import OLLAMA_HOST
+    model = args.model or config_loader.get_default_model()
+    context_length = context_lengths.get(f"{args.host or OLLAMA_HOST}/api", model)
+    payload = {"model": model, "prompt": text}
+    report = TokenBudget().apply(payload, context_length)
+
+    print(f"Estimated tokens: {estimate_tokens(text)}")
+    if context_length is None:
+        print(f"{model}: context length unknown, the prompt would be sent untrimmed")
+        return
+    print(f"{model}: context length {context_length}")
+    if report:
+        print(f"num_ctx {report.num_ctx}, prompt budget {report.limit} tokens")
+        if report.truncated:
+            print(f"Prompt would be truncated to {report.prompt_tokens} tokens ({report.saved_tokens} saved)")
+        else:
+            print("Prompt fits without trimming")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Traffic recorder for the chat clients
+When OLLAMA_RECORD names a file, every /api/chat and /api/generate request
+made by OllamaChatClient and AsyncOllamaChatClient is appended to it with
+the response records and the time before the headers and between records.
+The log is gzip-compressed NDJSON, one exchange per line; ``{pid}`` in the
+path gives each process its own file. replay_server.py serves a log back
+with the recorded timing.
+
+Usage: python traffic_recorder.py LOG.ndjson.gz
+"""
+
+import atexit
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterator, Optional, Union
+
+RECORD_ENV = "OLLAMA_RECORD"
+
+
+class Recorder:
+    """Appends exchanges to a gzip NDJSON log; safe to share between threads"""
+
+    def __init__(self, path: str):
+        self.path = path.replace("{pid}", str(os.getpid()))
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Appending starts a new gzip member, which readers handle transparently
+        self._file = gzip.open(self.path, "ab")
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def write(self, entry: Dict):
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line)
+                self.count += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class Capture:
+    """One exchange in progress; delays are milliseconds since the previous event"""
+
+    __slots__ = ("recorder", "entry", "_last")
+
+    def __init__(self, recorder: Recorder, endpoint: str, payload: Dict, stream: bool):
+        self.recorder = recorder
+        self.entry = {"ts": time.time(), "endpoint": endpoint, "stream": stream, "request": payload,
+                      "status": None, "headers_ms": None, "chunks": []}
+        self._last = time.perf_counter()
+
+    def _elapsed(self) -> float:
+        now = time.perf_counter()
+        elapsed, self._last = (now - self._last) * 1000, now
+        return round(elapsed, 3)
+
+    def headers(self, status: int):
+        self.entry["status"] = status
+        self.entry["headers_ms"] = self._elapsed()
+
+    def chunk(self, record: Dict):
+        self.entry["chunks"].append([self._elapsed(), record])
+
+    def finish(self, error: Exception = None, context_length: Optional[int] = None):
+        if error is not None:
+            self.entry["error"] = str(error) or type(error).__name__
+        if context_length:
+            self.entry["context_length"] = context_length
+        self.recorder.write(self.entry)
+
+
+_recorder = None
+_lock = threading.Lock()
+
+
+def start(path: str) -> Recorder:
+    """Record to ``path`` from now on, replacing any active recorder"""
+    global _recorder
+    with _lock:
+        if _recorder is not None:
+            _recorder.close()
+        _recorder = Recorder(path)
+    return _recorder
+
+
+def stop():
+    global _recorder
+    with _lock:
+        if _recorder is not None:
+            _recorder.close()
+        _recorder = None
+
+
+def capture(endpoint: str, payload: Union[Dict, bytes], stream: bool = True) -> Optional[Capture]:
+    """A Capture for this exchange, or None when not recording
+
+    An already encoded request body is only decoded when recording.
+    """
+    recorder = _recorder
+    if recorder is None:
+        return None
+    if isinstance(payload, (bytes, bytearray)):
+        payload = json.loads(payload)
+    return Capture(recorder, endpoint, payload, stream)
+
+
+def read_log(path: str) -> Iterator[Dict]:
+    """Exchanges of a log in recorded order; a truncated last line is skipped"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        except (EOFError, ValueError):
+            return
+
+
+def summarize(path: str) -> Dict[str, Dict]:
+    """Per-endpoint exchange counts and timings of a log"""
+    summary = defaultdict(lambda: {"requests": 0, "errors": 0, "chunks": 0, "headers_ms": 0.0, "total_ms": 0.0})
+    for entry in read_log(path):
+        row = summary[entry["endpoint"]]
+        row["requests"] += 1
+        row["errors"] += "error" in entry
+        row["chunks"] += len(entry["chunks"])
+        row["headers_ms"] += entry["headers_ms"] or 0.0
+        row["total_ms"] += (entry["headers_ms"] or 0.0) + sum(delay for delay, _ in entry["chunks"])
+    return dict(summary)
+
+
+if os.getenv(RECORD_ENV):
+    start(os.environ[RECORD_ENV])
+atexit.register(stop)
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python traffic_recorder.py LOG.ndjson.gz")
+        sys.exit(1)
+    summary = summarize(sys.argv[1])
+    if not summary:
+        print(f"No exchanges in {sys.argv[1]}")
+        return
+    print(f"{'endpoint':<12} {'requests':>9} {'errors':>7} {'chunks':>8} {'headers ms':>11} {'total ms':>10}")
+    for endpoint, row in sorted(summary.items()):
+        n = row["requests"]
+        print(f"{endpoint:<12} {n:>9d} {row['errors']:>7d} {row['chunks']:>8d} "
+              f"{row['headers_ms'] / n:>11.1f} {row['total_ms'] / n:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()